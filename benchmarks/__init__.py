@@ -0,0 +1 @@
+"""Performance benchmarks for capability-agent (run with ``python -m benchmarks.run``)."""
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict
+
+import httpx
+import openai
+
+from capability_agent.llm import CapabilityItem, CapabilityResponse
+
+
+class _FakeBehavior:
+    """Shared latency/failure model and call counters for the fake clients.
+
+    Whether an attempt fails is derived from the seed, the prompt and the attempt number,
+    so the injected failures do not depend on how worker threads interleave.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0, items: int = 5, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.items = items
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._attempts: Dict[str, int] = {}
+        self.calls = 0
+        self.failures = 0
+
+    def delay(self) -> float:
+        with self._lock:
+            self.calls += 1
+            return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def fails(self, prompt: str) -> bool:
+        with self._lock:
+            attempt = self._attempts[prompt] = self._attempts.get(prompt, 0) + 1
+            failed = random.Random(f"{self.seed}:{attempt}:{prompt}").random() < self.failure_rate
+            self.failures += failed
+            return failed
+
+    def response(self, kwargs: dict) -> Any:
+        prompt = kwargs.get("input", "")
+        if self.fails(prompt):
+            raise openai.APIConnectionError(request=httpx.Request("POST", "https://fake.invalid/v1/responses"))
+        items = [
+            CapabilityItem(name=f"Generated {i + 1}", description=f"Synthetic sub-capability {i + 1}.")
+            for i in range(self.items)
+        ]
+        input_tokens = (len(prompt) + len(kwargs.get("instructions", ""))) // 4
+        output_tokens = 40 * self.items
+        return SimpleNamespace(
+            status="completed",
+            model=kwargs.get("model"),
+            output=[],
+            output_parsed=CapabilityResponse(items=items),
+            usage=SimpleNamespace(
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                total_tokens=input_tokens + output_tokens,
+                input_tokens_details=SimpleNamespace(cached_tokens=0),
+                output_tokens_details=SimpleNamespace(reasoning_tokens=0),
+            ),
+        )
+
+
+class FakeClient:
+    """Stand-in for ``OpenAI`` that answers ``responses.parse`` after a simulated latency.
+
+    A ``failure_rate`` share of attempts raises ``APIConnectionError``, so the real retry
+    policy in ``call_openai`` is exercised. Counters are in ``behavior``.
+    """
+
+    def __init__(self, **behavior: Any):
+        self.behavior = _FakeBehavior(**behavior)
+        self.responses = SimpleNamespace(parse=self._parse)
+
+    def _parse(self, **kwargs: Any) -> Any:
+        time.sleep(self.behavior.delay())
+        return self.behavior.response(kwargs)
+
+
+class AsyncFakeClient:
+    """``AsyncOpenAI`` counterpart of ``FakeClient``."""
+
+    def __init__(self, **behavior: Any):
+        self.behavior = _FakeBehavior(**behavior)
+        self.responses = SimpleNamespace(parse=self._parse)
+
+    async def _parse(self, **kwargs: Any) -> Any:
+        await asyncio.sleep(self.behavior.delay())
+        return self.behavior.response(kwargs)
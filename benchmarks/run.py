@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import typer
+from rich.console import Console
+from rich.table import Table
+from rich.theme import Theme
+
+from capability_agent import service
+from capability_agent.io_utils import ContextFormat, iter_json_array, parse_context_level, write_json_file
+from capability_agent.models import validate_model
+from capability_agent.prompting import PromptRenderer
+from capability_agent.retry import RetryPolicy
+
+from .fake_client import AsyncFakeClient, FakeClient
+from .synthetic import generate_model
+
+
+BENCH_DIR = Path(__file__).resolve().parent
+TEMPLATE = BENCH_DIR.parent / "examples" / "prompt.j2"
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+
+STAGES = ("generate", "write_input", "load", "render", "augment", "write_output")
+
+app = typer.Typer(help="Timed augment_model scenarios against a fake LLM client.")
+console = Console(theme=Theme({"error": "bold red", "info": "cyan", "success": "bold green"}))
+
+
+@dataclass(frozen=True)
+class Scenario:
+    nodes: int
+    context_format: str = "markdown"
+    context: str = "parent,siblings"
+    restart: bool = False
+    tasks: int = 8
+    engine: str = "sync"
+
+    @property
+    def name(self) -> str:
+        context = self.context.replace(",", "+") or "none"
+        mode = "-restart" if self.restart else ""
+        return f"{self.nodes}n-{self.context_format}-{context}{mode}-t{self.tasks}-{self.engine}"
+
+
+def _profile(sizes, formats, full_tree_max, tasks, restart=(False, True)) -> List[Scenario]:
+    scenarios = []
+    for nodes in sizes:
+        context = "full_tree,parent,siblings" if nodes <= full_tree_max else "parent,siblings"
+        for fmt in formats:
+            scenarios.append(Scenario(nodes, fmt, context))
+        for flag in restart:
+            if flag:
+                scenarios.append(Scenario(nodes, "markdown", context, restart=True))
+        for n in tasks:
+            if n != 8:
+                scenarios.append(Scenario(nodes, "markdown", context, tasks=n))
+        scenarios.append(Scenario(nodes, "markdown", context, tasks=64, engine="async"))
+    return scenarios
+
+
+_FORMATS = tuple(f.value for f in ContextFormat)
+
+PROFILES: Dict[str, List[Scenario]] = {
+    "quick": _profile((1_000,), _FORMATS, 1_000, (1, 64)),
+    # The full tree is only rendered into prompts up to 10k nodes; beyond that it is
+    # per-leaf context only, as in real runs on models that size
+    "full": _profile((1_000, 10_000, 100_000), _FORMATS, 10_000, (1, 16, 64)),
+}
+
+
+@contextlib.contextmanager
+def _patched(module: Any, **attrs: Any) -> Iterator[None]:
+    saved = {name: getattr(module, name) for name in attrs}
+    for name, value in attrs.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(module, name, value)
+
+
+def run_scenario(
+    scenario: Scenario,
+    workdir: Path,
+    latency: float = 0.0,
+    failure_rate: float = 0.0,
+    fanout: int = 4,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Run one scenario end to end and return its per-stage timings (seconds) and counters."""
+    stages: Dict[str, float] = {}
+
+    start = time.perf_counter()
+    data = generate_model(scenario.nodes, fanout=fanout, seed=seed)
+    stages["generate"] = time.perf_counter() - start
+
+    input_path = workdir / "model.json"
+    start = time.perf_counter()
+    write_json_file(input_path, data)
+    stages["write_input"] = time.perf_counter() - start
+    del data
+
+    start = time.perf_counter()
+    model = validate_model(iter_json_array(input_path))
+    stages["load"] = time.perf_counter() - start
+
+    renderers: List[PromptRenderer] = []
+
+    class RecordingRenderer(PromptRenderer):
+        def __init__(self, *args: Any, **kwargs: Any):
+            super().__init__(*args, **kwargs)
+            renderers.append(self)
+
+    behavior = dict(latency=latency, failure_rate=failure_rate, seed=seed)
+    client = AsyncFakeClient(**behavior) if scenario.engine == "async" else FakeClient(**behavior)
+    kwargs = dict(
+        model=model,
+        template_path=TEMPLATE,
+        context_opts=parse_context_level(scenario.context),
+        context_format=ContextFormat(scenario.context_format),
+        system_message="You are an enterprise architect.",
+        max_capabilities=5,
+        tasks=scenario.tasks,
+        restart_mode=scenario.restart,
+        input_path=input_path if scenario.restart else None,
+        retry_policy=RetryPolicy(base_delay=0.001, max_delay=0.005),
+    )
+    error: Optional[str] = None
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(_patched(
+            service,
+            ensure_client=lambda *a, **k: client,
+            ensure_async_client=lambda *a, **k: client,
+            PromptRenderer=RecordingRenderer,
+        ))
+        stack.enter_context(_patched(service.console, quiet=True))
+        start = time.perf_counter()
+        try:
+            if scenario.engine == "async":
+                result, _ = asyncio.run(service.augment_model_async(**kwargs))
+            else:
+                result, _ = service.augment_model(**kwargs)
+        except Exception as e:  # noqa: BLE001 - failed leaves are part of the measurement
+            result, error = model, str(e).splitlines()[0] if str(e) else type(e).__name__
+        stages["augment"] = time.perf_counter() - start
+    stages["render"] = sum(r.total_seconds for r in renderers)
+
+    start = time.perf_counter()
+    write_json_file(workdir / "out.json", (c.model_dump() for c in result.root))
+    stages["write_output"] = time.perf_counter() - start
+
+    return {
+        "scenario": asdict(scenario),
+        "stages": {stage: round(seconds, 4) for stage, seconds in stages.items()},
+        "leaves": sum(r.render_count for r in renderers),
+        "calls": client.behavior.calls,
+        "injected_failures": client.behavior.failures,
+        "output_nodes": len(result.root),
+        "error": error,
+    }
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    tolerance: float,
+    min_delta: float,
+) -> List[str]:
+    """Return a description of every stage slower than its baseline beyond the tolerance."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name, {}).get("stages", {})
+        for stage, seconds in result["stages"].items():
+            if stage not in base:
+                continue
+            if seconds > base[stage] * (1 + tolerance) and seconds - base[stage] > min_delta:
+                regressions.append(f"{name} {stage}: {seconds:.3f}s vs baseline {base[stage]:.3f}s")
+    return regressions
+
+
+@app.command()
+def main(
+    profile: str = typer.Option("quick", "--profile", help=f"Scenario set: {', '.join(PROFILES)}"),
+    only: Optional[str] = typer.Option(None, "--only", help="Run only scenarios whose name contains this text"),
+    latency: float = typer.Option(0.0, "--latency", min=0.0, help="Simulated seconds per LLM call"),
+    failure_rate: float = typer.Option(0.0, "--failure-rate", min=0.0, max=1.0, help="Share of LLM attempts that fail with a transient error"),
+    baseline_path: Path = typer.Option(DEFAULT_BASELINE, "--baseline", dir_okay=False, help="Stored baseline to compare against"),
+    save_baseline: bool = typer.Option(False, "--save-baseline", help="Write this run's timings as the new baseline"),
+    tolerance: float = typer.Option(0.25, "--tolerance", min=0.0, help="Allowed slowdown per stage before it counts as a regression (0.25 = 25%)"),
+    min_delta: float = typer.Option(0.05, "--min-delta", min=0.0, help="Ignore slowdowns smaller than this many seconds"),
+    output: Optional[Path] = typer.Option(None, "--output", dir_okay=False, help="Also write the full results as JSON"),
+):
+    """Run benchmark scenarios, print per-stage timings and flag regressions against the baseline."""
+    if profile not in PROFILES:
+        console.print(f"Unknown profile: {profile}. Must be one of: {', '.join(PROFILES)}", style="error")
+        raise typer.Exit(1)
+    scenarios = [s for s in PROFILES[profile] if only is None or only in s.name]
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for scenario in scenarios:
+        console.print(f"Running {scenario.name} ...", style="info")
+        with tempfile.TemporaryDirectory() as tmp:
+            results[scenario.name] = run_scenario(scenario, Path(tmp), latency=latency, failure_rate=failure_rate)
+
+    baseline: Dict[str, Dict[str, Any]] = {}
+    if baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+
+    table = Table(title=f"Benchmark ({profile})")
+    table.add_column("Scenario", style="cyan")
+    for stage in STAGES:
+        table.add_column(stage, justify="right")
+    table.add_column("leaves/s", justify="right", style="green")
+    for name, result in results.items():
+        cells = []
+        base = baseline.get(name, {}).get("stages", {})
+        for stage in STAGES:
+            seconds = result["stages"][stage]
+            cell = f"{seconds:.3f}"
+            if stage in base and base[stage] > 0:
+                cell += f" ({(seconds / base[stage] - 1) * 100:+.0f}%)"
+            cells.append(cell)
+        rate = result["leaves"] / result["stages"]["augment"] if result["stages"]["augment"] else 0.0
+        table.add_row(name, *cells, f"{rate:,.0f}")
+    console.print(table)
+    for name, result in results.items():
+        if result["error"]:
+            console.print(f"{name}: {result['error']}", style="error")
+
+    if output is not None:
+        output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if save_baseline:
+        merged = {**baseline, **results}
+        baseline_path.write_text(json.dumps(merged, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        console.print(f"Saved baseline for {len(results)} scenarios -> {baseline_path}", style="success")
+        return
+
+    regressions = compare(results, baseline, tolerance, min_delta)
+    if regressions:
+        console.print("Regressions:", style="error")
+        for line in regressions:
+            console.print(f"  - {line}", style="error")
+        raise typer.Exit(1)
+    if baseline:
+        console.print("No regressions against the baseline", style="success")
+
+
+if __name__ == "__main__":
+    app()
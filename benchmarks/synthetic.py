@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import random
+import uuid
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+
+_WORDS = (
+    "customer order payment invoice product inventory supplier contract risk compliance "
+    "analytics channel partner service billing claims pricing forecast logistics workforce"
+).split()
+
+
+def _uuid4(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _phrase(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def generate_model(
+    nodes: int,
+    fanout: int = 4,
+    depth: Optional[int] = None,
+    description_words: int = 12,
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """Build a synthetic capability tree of exactly ``nodes`` nodes, breadth first.
+
+    Every node gets ``fanout`` children until ``nodes`` is reached. With ``depth`` no
+    branch goes deeper than that many levels; further roots are started instead, so the
+    node count is still met. Leaves are pending (``capability: 0``). The same seed always
+    yields the same model.
+    """
+    if nodes < 1 or fanout < 1:
+        raise ValueError("nodes and fanout must be at least 1")
+    rng = random.Random(seed)
+    model: List[Dict[str, Any]] = []
+    queue: deque = deque()  # (node id, level) still able to take children
+
+    def add(parent: Optional[str], level: int) -> None:
+        node_id = _uuid4(rng)
+        model.append({
+            "id": node_id,
+            "name": f"{_phrase(rng, 2).title()} {len(model)}",
+            "description": _phrase(rng, description_words).capitalize() + ".",
+            "parent": parent,
+            "capability": 0,
+        })
+        if depth is None or level < depth:
+            queue.append((node_id, level))
+
+    while len(model) < nodes:
+        if not queue:
+            add(None, 1)
+            continue
+        parent_id, level = queue.popleft()
+        for _ in range(min(fanout, nodes - len(model))):
+            add(parent_id, level + 1)
+    # Interior nodes are already decomposed
+    parents = {n["parent"] for n in model}
+    for n in model:
+        if n["id"] in parents:
+            n["capability"] = 1
+    return model
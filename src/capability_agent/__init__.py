@@ -2,8 +2,8 @@
 
 from .cli import main
 from .models import Capability, CapabilityList, validate_model
-from .io_utils import ContextOptions, read_json_file, write_json_file, load_system_message, parse_context_level
-from .service import augment_model
+from .io_utils import ContextOptions, iter_json_array, read_json_file, write_json_file, load_system_message, parse_context_level
+from .service import augment_model, augment_model_async, augment_model_batch
 
 __all__ = [
     "main",
@@ -11,11 +11,14 @@ __all__ = [
     "CapabilityList",
     "validate_model",
     "ContextOptions",
+    "iter_json_array",
     "read_json_file",
     "write_json_file",
     "load_system_message",
     "parse_context_level",
     "augment_model",
+    "augment_model_async",
+    "augment_model_batch",
 ]
 __all__.extend(["__version__"])
 
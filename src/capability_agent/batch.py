@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import itertools
+import json
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from openai import OpenAI
+from pydantic import ValidationError
+
+from .llm import CapabilityResponse, LLMError, UsageStats, default_model, responses_request_body, validate_items
+from .retry import RetryPolicy, RetrySchedule, is_retryable
+
+
+BATCH_ENDPOINT = "/v1/responses"
+
+# Terminal states reported by the Batch API
+_FINISHED = {"completed", "failed", "expired", "cancelled"}
+
+T = TypeVar("T")
+
+
+def _retry_delay(schedule: RetrySchedule, exc: Exception) -> Optional[float]:
+    """Delay before retrying a failed Files/Batches call, or None when it should be raised.
+
+    The SDK's own retries are off (see ``llm._client_kwargs``), so the upload, every
+    poll and the result download retry transient failures per the run's ``RetryPolicy``.
+    """
+    return schedule.next_delay(exc) if is_retryable(exc) else None
+
+
+def _with_retries(call: Callable[[], T], retry_policy: Optional[RetryPolicy]) -> T:
+    schedule = (retry_policy or RetryPolicy()).schedule()
+    while True:
+        try:
+            return call()
+        except Exception as e:
+            delay = _retry_delay(schedule, e)
+            if delay is None:
+                raise
+            time.sleep(delay)
+
+
+def batch_state_path_for(model_path: Path, shard: Optional[Tuple[int, int]] = None) -> Path:
+    """Return the batch state path that sits next to a model file (``model.json.batch``).
+
+    Shards of the same model get their own state file (``model.json.shard-2-of-4.batch``).
+    """
+    if shard is not None:
+        return model_path.with_name(f"{model_path.name}.shard-{shard[0]}-of-{shard[1]}.batch")
+    return model_path.with_name(model_path.name + ".batch")
+
+
+def request_line(
+    leaf_id: str, system_message: str, user_prompt: str, prompt_cache_key: Optional[str] = None
+) -> Dict[str, Any]:
+    """One Batch API request: the same Responses call ``call_openai`` makes for a leaf."""
+    return {
+        "custom_id": leaf_id,
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": responses_request_body(system_message, user_prompt, prompt_cache_key),
+    }
+
+
+def write_requests(path: Path, lines: Iterable[Dict[str, Any]]) -> int:
+    """Write request lines as JSONL; return how many were written."""
+    count = 0
+    with path.open("w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def submit(client: OpenAI, requests_path: Path, retry_policy: Optional[RetryPolicy] = None) -> str:
+    """Upload a request file and create a batch for it; return the batch id."""
+
+    def upload():
+        with requests_path.open("rb") as f:
+            return client.files.create(file=(requests_path.name, f), purpose="batch")
+
+    uploaded = _with_retries(upload, retry_policy)
+    batch = _with_retries(
+        lambda: client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window="24h",
+        ),
+        retry_policy,
+    )
+    return batch.id
+
+
+def wait_for(
+    client: OpenAI,
+    batch_id: str,
+    poll_interval: float = 60.0,
+    on_status: Optional[Callable[[Any], None]] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+):
+    """Poll a batch until it reaches a terminal state and return it."""
+    while True:
+        batch = _with_retries(lambda: client.batches.retrieve(batch_id), retry_policy)
+        if on_status is not None:
+            on_status(batch)
+        if batch.status in _FINISHED:
+            return batch
+        time.sleep(poll_interval)
+
+
+def _file_lines(
+    client: OpenAI, file_id: Optional[str], retry_policy: Optional[RetryPolicy] = None
+) -> Iterator[Dict[str, Any]]:
+    if not file_id:
+        return
+    schedule = (retry_policy or RetryPolicy()).schedule()
+    done = 0
+    while True:
+        try:
+            # Streamed line by line; result files of large batches can be hundreds of MB
+            with client.files.with_streaming_response.content(file_id) as response:
+                lines = (line for line in response.iter_lines() if line.strip())
+                # After a retry, skip the lines already yielded
+                for line in itertools.islice(lines, done, None):
+                    yield json.loads(line)
+                    done += 1
+            return
+        except Exception as e:
+            delay = _retry_delay(schedule, e)
+            if delay is None:
+                raise
+            time.sleep(delay)
+
+
+def _usage_from_body(body: Dict[str, Any], model: str) -> UsageStats:
+    usage = body.get("usage") or {}
+    stats = UsageStats(model_name=body.get("model") or model)
+    stats.input_tokens = usage.get("input_tokens", 0) or 0
+    stats.output_tokens = usage.get("output_tokens", 0) or 0
+    stats.total_tokens = usage.get("total_tokens", stats.input_tokens + stats.output_tokens) or 0
+    stats.cached_tokens = (usage.get("input_tokens_details") or {}).get("cached_tokens", 0) or 0
+    stats.reasoning_tokens = (usage.get("output_tokens_details") or {}).get("reasoning_tokens", 0) or 0
+    return stats
+
+
+def parse_result(body: Dict[str, Any], max_items: int) -> Tuple[List[Dict[str, str]], UsageStats]:
+    """Validate one Responses API body from a batch output file, as ``call_openai`` would."""
+    if body.get("status") == "incomplete":
+        raise LLMError(f"Response incomplete: {body.get('incomplete_details')!r}")
+    text = None
+    for out in body.get("output") or []:
+        for content in out.get("content") or []:
+            if content.get("type") == "refusal":
+                raise LLMError(f"Model refused the request: {content.get('refusal', '')}")
+            if content.get("type") == "output_text":
+                text = content.get("text")
+    if text is None:
+        raise LLMError("No output text found in batch result.")
+    try:
+        parsed = CapabilityResponse.model_validate_json(text)
+    except ValidationError as e:
+        raise LLMError(f"Batch result does not match the response schema: {e}") from e
+    return validate_items(parsed, max_items), _usage_from_body(body, default_model())
+
+
+def results(
+    client: OpenAI, batch, max_items: int, retry_policy: Optional[RetryPolicy] = None
+) -> Iterator[Tuple[str, Optional[Tuple[List[Dict[str, str]], UsageStats]], Optional[Exception]]]:
+    """Yield ``(custom_id, (items, usage), None)`` or ``(custom_id, None, error)`` per request."""
+    for line in _file_lines(client, getattr(batch, "output_file_id", None), retry_policy):
+        custom_id = line.get("custom_id", "")
+        response = line.get("response") or {}
+        if line.get("error") or response.get("status_code", 200) >= 400:
+            error = line.get("error") or (response.get("body") or {}).get("error") or response
+            yield custom_id, None, LLMError(f"Batch request failed: {error}")
+            continue
+        try:
+            yield custom_id, parse_result(response.get("body") or {}, max_items), None
+        except LLMError as e:
+            yield custom_id, None, e
+    for line in _file_lines(client, getattr(batch, "error_file_id", None), retry_policy):
+        error = line.get("error") or (line.get("response") or {}).get("body") or line
+        yield line.get("custom_id", ""), None, LLMError(f"Batch request failed: {error}")
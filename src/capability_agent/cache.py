@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class ResponseCache:
+    """Content-addressed on-disk cache of parsed LLM responses.
+
+    Entries are keyed by a hash of everything that determines the response (model,
+    instructions, rendered prompt, generation kwargs, ``max_items``) and store the parsed
+    items plus the usage of the original call. The directory is bounded by size: once it
+    exceeds ``max_bytes``, least recently used entries (by mtime, refreshed on every hit)
+    are evicted. Safe to share between threads and between runs.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = 1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._size = sum(p.stat().st_size for p in self._entries())
+
+    @staticmethod
+    def key(**parts: Any) -> str:
+        """Stable content hash of the JSON-serializable ``parts`` of a request."""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _entries(self) -> List[Path]:
+        return list(self.directory.glob("*/*.json"))
+
+    def get(self, key: str) -> Optional[Tuple[List[Dict[str, str]], Dict[str, Any]]]:
+        """Return ``(items, usage)`` for a cached response, or ``None`` on a miss."""
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            return None
+        return entry["items"], entry.get("usage", {})
+
+    def put(self, key: str, items: List[Dict[str, str]], usage: Dict[str, Any]) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({"items": items, "usage": usage}, ensure_ascii=False).encode("utf-8")
+        temp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        temp_path.write_bytes(data)
+        temp_path.replace(path)
+        with self._lock:
+            self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the cache is under 90% of its budget."""
+        entries = []
+        for p in self._entries():
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        self._size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, p in entries:
+            if self._size <= target:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            self._size -= size
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from pathlib import Path
 from typing import Optional
 from enum import Enum
@@ -10,15 +11,25 @@ from rich.panel import Panel
 from rich.table import Table
 from rich.theme import Theme
 
+from .cache import ResponseCache
+from .httppool import HttpSettings
 from .io_utils import (
     ContextFormat,
     load_system_message,
     parse_context_level,
-    read_json_file,
+    iter_json_array,
     write_json_file,
 )
+from .llm import shutdown_openai_logging
+from .logwriter import LogSettings
+from .metrics import RunMetrics
 from .models import validate_model
-from .service import augment_model
+from .ratelimit import RateLimiter
+from .retry import CircuitBreaker, RetryPolicy
+from .batch import batch_state_path_for
+from .scheduler import PRIORITIES
+from .service import augment_model, augment_model_async, augment_model_batch
+from .sharding import parse_shard
 
 
 class LogLevel(str, Enum):
@@ -34,14 +45,29 @@ console = Console(theme=Theme({"error": "bold red", "info": "cyan"}))
 
 @app.command()
 def run(
-    input: Path = typer.Option(..., exists=True, dir_okay=False, readable=True, help="Input model JSON path"),
+    input: Path = typer.Option(..., exists=True, dir_okay=False, readable=True, help="Input model JSON path (.json, .json.gz or .json.zst)"),
     template: Path = typer.Option(..., exists=True, dir_okay=False, readable=True, help="Jinja2 template path"),
-    output: Path = typer.Option(..., dir_okay=False, writable=True, help="Output JSON path"),
+    output: Path = typer.Option(..., dir_okay=False, writable=True, help="Output JSON path (.json.gz and .json.zst are compressed)"),
+    compact: bool = typer.Option(False, "--compact", help="Write the output without indentation"),
+    trust_input: bool = typer.Option(False, "--trust-input", help="Skip per-node Pydantic validation of the input (structure, unique ids and parents are still checked)"),
     max_capabilities: int = typer.Option(5, min=1, max=50, help="Max sub-capabilities per leaf"),
     tasks: int = typer.Option(4, min=1, help="Number of concurrent LLM calls"),
+    depth: int = typer.Option(1, "--depth", min=1, help="Levels to generate below each leaf in one run; children are expanded as soon as their parent finishes"),
+    rate_limit: bool = typer.Option(False, "--rate-limit", help="Pace submissions with a shared RPM/TPM limiter that adapts to x-ratelimit-* response headers"),
+    rpm: Optional[int] = typer.Option(None, "--rpm", min=1, help="Initial requests-per-minute limit (implies --rate-limit)"),
+    tpm: Optional[int] = typer.Option(None, "--tpm", min=1, help="Initial tokens-per-minute limit (implies --rate-limit)"),
+    max_attempts: int = typer.Option(5, "--max-attempts", min=1, help="Attempts per LLM call for transient errors (429, 5xx, network)"),
+    breaker_threshold: int = typer.Option(8, "--breaker-threshold", min=0, help="Consecutive transient failures (across all workers) that pause every worker; 0 disables"),
+    breaker_cooldown: float = typer.Option(30.0, "--breaker-cooldown", min=0.0, help="Seconds all workers pause once the circuit breaker opens"),
+    use_async: bool = typer.Option(False, "--async", help="Use the asyncio engine (AsyncOpenAI); --tasks sets the number of in-flight requests and can be in the hundreds"),
+    use_batch: bool = typer.Option(False, "--batch", help="Submit all leaf prompts as one Batch API job and wait for it (cheaper, no rate limits, up to 24h)"),
+    batch_id: Optional[str] = typer.Option(None, "--batch-id", help="Resume polling and ingesting an existing batch (implies --batch)"),
+    batch_poll_interval: float = typer.Option(60.0, "--batch-poll-interval", min=0.0, help="Seconds between batch status checks"),
     override_system_message: Optional[Path] = typer.Option(None, exists=True, dir_okay=False, readable=True, help="Optional system message file"),
     context_level: Optional[str] = typer.Option(None, help="Comma-separated context: full_tree,parent,siblings"),
     context_format: str = typer.Option("markdown", help="Context format: json, markdown, xml, or tree"),
+    context_window: Optional[int] = typer.Option(None, "--context-window", min=1, help="With full_tree context, send full detail only for the leaf's ancestors and nearest relatives, up to this many tokens; other nodes are sent as names"),
+    window_summary_chars: int = typer.Option(0, "--window-summary-chars", min=0, help="With --context-window, keep this many description characters for nodes outside the window (0 = names only)"),
     log_prompts: Optional[Path] = typer.Option(
         None,
         "--log-prompts",
@@ -51,23 +77,62 @@ def run(
         dir_okay=True,
         writable=True,
     ),
-    streaming: bool = typer.Option(False, "--streaming", help="Use streaming API for real-time progress (requires --tasks 1)"),
+    streaming: bool = typer.Option(False, "--streaming", help="Use streaming API and show each in-flight leaf's capabilities as they are generated"),
     restart: bool = typer.Option(False, "--restart", help="Resume generation from input file, ignoring output option"),
+    checkpoint_every: int = typer.Option(200, "--checkpoint-every", min=1, help="In restart mode, compact the checkpoint journal into the input file every N leaves"),
+    cache_layout: bool = typer.Option(False, "--cache-layout", help="Render the template's 'shared' block once as an identical prompt prefix for every leaf, followed by its 'leaf' block, and send a per-run prompt_cache_key"),
+    template_cache_dir: Optional[Path] = typer.Option(
+        None,
+        "--template-cache-dir",
+        help="Directory for a Jinja2 bytecode cache so repeated runs skip template compilation.",
+        file_okay=False,
+        dir_okay=True,
+    ),
+    response_cache_dir: Optional[Path] = typer.Option(
+        None,
+        "--response-cache",
+        help="Directory for an on-disk cache of LLM responses; identical prompts are answered without calling the API.",
+        file_okay=False,
+        dir_okay=True,
+    ),
+    response_cache_max_mb: int = typer.Option(1024, "--response-cache-max-mb", min=1, help="Size limit of the response cache; least recently used entries are evicted"),
     log_dir: Path = typer.Option(Path("./logs"), "--log-dir", help="Directory to write OpenAI request/response logs"),
     log_level: LogLevel = typer.Option(LogLevel.NONE, "--log-level", help="OpenAI logging level: none, basic, or full"),
+    log_max_mb: int = typer.Option(100, "--log-max-mb", min=1, help="Rotate the OpenAI log when it reaches this size; rotated files are gzip-compressed"),
+    log_rotate_minutes: float = typer.Option(0.0, "--log-rotate-minutes", min=0.0, help="Also rotate the OpenAI log after this many minutes (0 disables)"),
+    log_body_max_kb: int = typer.Option(64, "--log-body-max-kb", min=1, help="Truncate logged request/response bodies to this size"),
+    log_only_slow: Optional[float] = typer.Option(None, "--log-only-slow", min=0.0, help="Only log exchanges slower than this many seconds (combine with --log-only-failed)"),
+    log_only_failed: bool = typer.Option(False, "--log-only-failed", help="Only log failed exchanges (HTTP >= 400 or transport errors)"),
+    trace_file: Optional[Path] = typer.Option(None, "--trace-file", dir_okay=False, help="Write every per-leaf stage span (context, render, api, validate, build, lock_wait, checkpoint, ...) as JSONL"),
+    metrics_file: Optional[Path] = typer.Option(None, "--metrics-file", dir_okay=False, help="Prometheus textfile with stage timings, leaves/sec, in-flight calls and lock wait time, rewritten during the run"),
+    metrics_interval: float = typer.Option(15.0, "--metrics-interval", min=0.1, help="Seconds between --metrics-file rewrites"),
+    openmetrics: bool = typer.Option(False, "--openmetrics", help="Write --metrics-file in OpenMetrics format"),
+    max_connections: Optional[int] = typer.Option(None, "--max-connections", min=1, help="HTTP connection pool size (default: --tasks plus a few); all pooled connections are kept alive"),
+    keepalive_expiry: float = typer.Option(60.0, "--keepalive-expiry", min=0.0, help="Seconds an idle pooled connection is kept open"),
+    http2: bool = typer.Option(False, "--http2", help="Multiplex requests over HTTP/2 (requires the 'h2' package)"),
+    connect_timeout: float = typer.Option(10.0, "--connect-timeout", min=0.1, help="Seconds to wait for a connection to the API"),
+    read_timeout: float = typer.Option(600.0, "--read-timeout", min=1.0, help="Seconds to wait for response data (reasoning models can be slow)"),
+    coalesce: bool = typer.Option(False, "--coalesce", help="Let leaves whose prompt is identical to one already in flight share that call"),
+    priority: str = typer.Option("model", "--priority", help="Order in which leaves are submitted: model, longest-prompt, shallowest or failed-last"),
+    shard: Optional[str] = typer.Option(None, "--shard", help="Process only shard i of N (e.g. 2/4): leaves are assigned by a stable hash of their id, whole generated subtrees stay on one shard; recombine outputs with 'bcm-wrench merge'"),
+    max_input_tokens: Optional[int] = typer.Option(None, "--max-input-tokens", min=1, help="Input token budget per call: context sections are trimmed to fit, and prompts still over it fail before being sent"),
 ):
     """Augment INPUT model and write enhanced OUTPUT as JSON array."""
     console.print(Panel.fit("business-capgen: Augmenting capability model", title="capability-agent"))
 
     try:
-        data = read_json_file(input)
-        model = validate_model(data)
+        model = validate_model(iter_json_array(input), trust_input=trust_input)
     except Exception as e:  # noqa: BLE001
         console.print(f"Input model validation failed: {e}", style="error")
         raise typer.Exit(1)
 
     try:
         ctx_opts = parse_context_level(context_level)
+        ctx_opts.window_tokens = context_window
+        ctx_opts.window_summary_chars = window_summary_chars
+        shard_spec = parse_shard(shard) if shard else None
+        if priority not in PRIORITIES:
+            raise ValueError(f"Invalid priority: {priority}. Must be one of: {', '.join(PRIORITIES)}")
     except ValueError as e:
         console.print(str(e), style="error")
         raise typer.Exit(1)
@@ -87,10 +152,57 @@ def run(
     # Resolve log prompts directory
     log_prompts_dir: Optional[Path] = log_prompts
 
+    use_batch = use_batch or batch_id is not None
+    if use_batch and (use_async or streaming or depth > 1):
+        console.print("Warning: --batch submits one level in a single job; ignoring --async, --streaming and --depth.", style="info")
+        use_async = streaming = False
+        depth = 1
+
     # Validate streaming configuration
-    if streaming and tasks > 1:
-        console.print("Warning: Streaming requires --tasks 1. Setting tasks=1 automatically.", style="info")
-        tasks = 1
+    if streaming and use_async:
+        console.print("Warning: Streaming is not available with --async; using non-streaming calls.", style="info")
+        streaming = False
+
+    rate_limiter: Optional[RateLimiter] = None
+    if rate_limit or rpm or tpm:
+        rate_limiter = RateLimiter(requests_per_minute=rpm, tokens_per_minute=tpm)
+
+    breaker = CircuitBreaker(breaker_threshold, breaker_cooldown) if breaker_threshold > 0 else None
+    retry_policy = RetryPolicy(max_attempts=max_attempts, breaker=breaker)
+
+    response_cache: Optional[ResponseCache] = None
+    if response_cache_dir is not None:
+        response_cache = ResponseCache(response_cache_dir, max_bytes=response_cache_max_mb * 1024 * 1024)
+
+    log_settings = LogSettings(
+        max_bytes=log_max_mb * 1024 * 1024,
+        rotate_seconds=log_rotate_minutes * 60 or None,
+        body_limit=log_body_max_kb * 1024,
+        only_slow_seconds=log_only_slow,
+        only_failed=log_only_failed,
+    )
+
+    http_settings = HttpSettings(
+        max_connections=max_connections,
+        keepalive_expiry=keepalive_expiry,
+        http2=http2,
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+    )
+    if http2:
+        try:
+            http_settings.transport_kwargs()
+        except RuntimeError as e:
+            console.print(str(e), style="error")
+            raise typer.Exit(1)
+
+    try:
+        metrics = RunMetrics(trace_file)
+    except OSError as e:
+        console.print(f"Failed to open trace file: {e}", style="error")
+        raise typer.Exit(1)
+    if metrics_file is not None:
+        metrics.export_every(metrics_file, metrics_interval, openmetrics)
 
     # Determine output path - use input path if restart mode
     output_path = input if restart else output
@@ -99,21 +211,50 @@ def run(
         console.print(f"Restart mode: will update {input} in-place", style="info")
 
     try:
-        enhanced, usage_stats = augment_model(
+        # Arguments every engine takes; the online engines add their own below
+        augment_kwargs = dict(
             model=model,
             template_path=template,
             context_opts=ctx_opts,
             context_format=ctx_format,
             system_message=system_message,
             max_capabilities=max_capabilities,
-            tasks=tasks,
             log_prompts_dir=log_prompts_dir,
-            use_streaming=streaming,
             restart_mode=restart,
             input_path=input if restart else None,
             openai_log_dir=log_dir if log_level != LogLevel.NONE else None,
             openai_log_level=log_level.value,
+            openai_log_settings=log_settings,
+            checkpoint_every=checkpoint_every,
+            template_cache_dir=template_cache_dir,
+            cache_layout=cache_layout,
+            metrics=metrics,
+            http_settings=http_settings,
+            max_input_tokens=max_input_tokens,
+            shard=shard_spec,
+            retry_policy=retry_policy,
+        )
+        online_kwargs = dict(
+            tasks=tasks,
+            use_streaming=streaming,
+            rate_limiter=rate_limiter,
+            response_cache=response_cache,
+            depth=depth,
+            priority=priority,
+            coalesce=coalesce,
         )
+        batch_state_path = batch_state_path_for(input, shard_spec)
+        if use_batch:
+            enhanced, usage_stats = augment_model_batch(
+                **augment_kwargs,
+                batch_id=batch_id,
+                state_path=batch_state_path,
+                poll_interval=batch_poll_interval,
+            )
+        elif use_async:
+            enhanced, usage_stats = asyncio.run(augment_model_async(**augment_kwargs, **online_kwargs))
+        else:
+            enhanced, usage_stats = augment_model(**augment_kwargs, **online_kwargs)
     except Exception as e:  # noqa: BLE001
         import traceback
         console.print(f"Augmentation failed: {e}", style="error")
@@ -130,17 +271,29 @@ def run(
         console.print("Full traceback:", style="error")
         console.print(traceback.format_exc(), style="error")
         raise typer.Exit(1)
+    finally:
+        # Flush the background request/response log writer
+        shutdown_openai_logging()
+        # Final metrics file and trace flush
+        metrics.close()
 
-    # Emit as plain list of dicts
+    # Emit as plain list of dicts, one node at a time
     try:
-        write_json_file(output_path, [c.model_dump() for c in enhanced.root])
+        write_json_file(output_path, (c.model_dump() for c in enhanced.root), compact=compact)
     except Exception as e:  # noqa: BLE001
         console.print(f"Failed to write output: {e}", style="error")
         raise typer.Exit(1)
     console.print(f"Wrote {len(enhanced.root)} nodes -> {output_path}", style="info")
+    if use_batch and not restart:
+        # The batch results are saved now; the next run submits a new batch
+        batch_state_path.unlink(missing_ok=True)
+    if breaker is not None and breaker.trips:
+        console.print(f"Circuit breaker paused all workers {breaker.trips} time(s) during the run", style="info")
+    if rate_limiter is not None and rate_limiter.throttled_seconds > 0:
+        console.print(f"Rate limiter paced submissions for {rate_limiter.throttled_seconds:.1f}s in total", style="info")
     
     # Display usage statistics summary
-    if usage_stats.total_tokens > 0:
+    if usage_stats.total_tokens > 0 or usage_stats.response_cache_lookups > 0 or usage_stats.coalesced_calls > 0:
         usage_table = Table(title="📊 Usage Statistics")
         usage_table.add_column("Metric", style="cyan")
         usage_table.add_column("Value", style="green")
@@ -168,6 +321,17 @@ def run(
             usage_table.add_row("  └─ Reasoning Tokens", f"{usage_stats.reasoning_tokens:,}")
             regular_tokens = usage_stats.output_tokens - usage_stats.reasoning_tokens
             usage_table.add_row("  └─ Regular Tokens", f"{regular_tokens:,}")
+
+        if usage_stats.response_cache_lookups > 0:
+            usage_table.add_row("", "")  # Separator
+            usage_table.add_row("Response Cache Hits", f"{usage_stats.response_cache_hits:,} / {usage_stats.response_cache_lookups:,}")
+            usage_table.add_row("  └─ Hit Rate", f"{usage_stats.response_cache_hit_rate:.1f}%")
+            usage_table.add_row("  └─ Tokens Saved", f"{usage_stats.response_cache_saved_tokens:,}")
+
+        if usage_stats.coalesced_calls > 0:
+            usage_table.add_row("", "")  # Separator
+            usage_table.add_row("Coalesced Calls Saved", f"{usage_stats.coalesced_calls:,}")
+            usage_table.add_row("  └─ Tokens Saved", f"{usage_stats.coalesced_saved_tokens:,}")
         
         console.print()
         console.print(usage_table)
@@ -176,6 +340,29 @@ def run(
         if usage_stats.has_caching:
             console.print(f"💡 [bold green]Cost savings:[/bold green] You saved ~50% on {usage_stats.cached_tokens:,} cached tokens!", style="info")
 
+    # Per-stage timing summary
+    stage_rows = metrics.summary()
+    if stage_rows:
+        stage_table = Table(title="⏱ Stage Timings")
+        stage_table.add_column("Stage", style="cyan")
+        stage_table.add_column("Count", justify="right")
+        stage_table.add_column("p50", justify="right", style="green")
+        stage_table.add_column("p95", justify="right", style="green")
+        stage_table.add_column("Max", justify="right", style="green")
+        stage_table.add_column("Total", justify="right")
+        for stage, count, p50, p95, longest, total in stage_rows:
+            stage_table.add_row(
+                stage, f"{count:,}", f"{p50 * 1000:.1f} ms", f"{p95 * 1000:.1f} ms",
+                f"{longest * 1000:.1f} ms", f"{total:.2f} s",
+            )
+        console.print()
+        console.print(stage_table)
+        console.print(
+            f"{metrics.leaves_succeeded:,} leaves in {metrics.elapsed:.1f}s ({metrics.leaves_per_second:.1f}/s), "
+            f"up to {metrics.max_in_flight} calls in flight, {metrics.total_seconds('lock_wait'):.2f}s waiting for the checkpoint lock",
+            style="info",
+        )
+
 
 def main() -> None:
     app()
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .llm import UsageStats
+from .metrics import RunMetrics, span
+
+CallResult = Tuple[List[Dict[str, str]], UsageStats]
+
+
+def _shared_usage(usage: UsageStats) -> UsageStats:
+    """Usage of a leaf answered by another leaf's call: no tokens spent, one call saved."""
+    return UsageStats(model_name=usage.model_name, coalesced_calls=1, coalesced_saved_tokens=usage.total_tokens)
+
+
+class PromptCoalescer:
+    """Share one in-flight LLM call between leaves whose rendered prompts are identical.
+
+    The first leaf with a prompt makes the call; leaves rendering the same prompt while it
+    is in flight wait for it and reuse its items (each still gets its own child nodes and
+    ids). The entry is dropped when the call finishes, so only concurrent duplicates are
+    coalesced; a leader's failure is raised for its followers too. Followers' waits are
+    recorded as the ``coalesce_wait`` stage.
+    """
+
+    def __init__(self, metrics: Optional[RunMetrics] = None):
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._async_calls: Dict[str, asyncio.Future] = {}
+
+    def call(self, prompt: str, fn: Callable[[], CallResult]) -> CallResult:
+        """Run ``fn`` for ``prompt``, or wait for the identical call already in flight."""
+        with self._lock:
+            future = self._calls.get(prompt)
+            leader = future is None
+            if leader:
+                future = self._calls[prompt] = Future()
+        if not leader:
+            with span(self.metrics, "coalesce_wait"):
+                items, usage = future.result()
+            return items, _shared_usage(usage)
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[prompt]
+
+    async def acall(self, prompt: str, fn: Callable[[], Awaitable[CallResult]]) -> CallResult:
+        """Asyncio counterpart of ``call``; must be used from a single event loop."""
+        future = self._async_calls.get(prompt)
+        if future is not None:
+            with span(self.metrics, "coalesce_wait"):
+                items, usage = await asyncio.shield(future)
+            return items, _shared_usage(usage)
+        future = self._async_calls[prompt] = asyncio.get_running_loop().create_future()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieved here so a failure without followers is not reported as unhandled
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._async_calls[prompt]
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import importlib.util
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import httpx
+
+
+# Connections kept beyond the worker count (streams closing, file uploads, ...)
+_POOL_HEADROOM = 4
+
+
+@dataclass
+class HttpSettings:
+    """Connection pool, keep-alive, HTTP/2 and timeouts of the OpenAI HTTP client.
+
+    Without ``max_connections`` the pool is sized to the run's concurrency, and every
+    pooled connection may be kept alive, so workers reuse connections instead of opening
+    and closing them around the default keep-alive limit. ``http2`` multiplexes requests
+    over fewer connections and needs the optional ``h2`` package.
+    """
+
+    max_connections: Optional[int] = None
+    keepalive_expiry: float = 60.0
+    http2: bool = False
+    connect_timeout: float = 10.0
+    read_timeout: float = 600.0
+    write_timeout: float = 60.0
+    pool_timeout: float = 60.0
+
+    def limits(self, concurrency: int = 1) -> httpx.Limits:
+        size = self.max_connections or max(1, concurrency) + _POOL_HEADROOM
+        return httpx.Limits(
+            max_connections=size,
+            max_keepalive_connections=size,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.write_timeout,
+            pool=self.pool_timeout,
+        )
+
+    def transport_kwargs(self, concurrency: int = 1) -> Dict[str, Any]:
+        """Keyword arguments for ``httpx.HTTPTransport`` / ``httpx.AsyncHTTPTransport``."""
+        if self.http2 and importlib.util.find_spec("h2") is None:
+            raise RuntimeError("HTTP/2 requires the 'h2' package (pip install capability-agent[http2])")
+        return {"limits": self.limits(concurrency), "http2": self.http2}
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import gzip
+import io
 import json
 from dataclasses import dataclass
 from enum import Enum
@@ -8,7 +10,7 @@ import re
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import IO, Any, Dict, Iterable, Iterator, Optional
 
 from rich.console import Console
 from rich.theme import Theme
@@ -29,16 +31,142 @@ class ContextOptions:
     full_tree: bool = False
     parent: bool = False
     siblings: bool = False
+    # Windowed full tree: tokens of full detail around the leaf (None sends the whole tree)
+    window_tokens: Optional[int] = None
+    # Description characters kept for nodes outside the window (0 sends names only)
+    window_summary_chars: int = 0
+
+
+_COMPRESSED_SUFFIXES = (".gz", ".zst")
+
+# Read size for the streaming array parser
+_READ_CHUNK = 1 << 16
+# Characters that can continue a JSON number split across reads
+_NUMBER_CHARS = frozenset("0123456789+-.eE")
+
+
+def compression_for(path: Path) -> Optional[str]:
+    """Return ``"gz"``, ``"zst"`` or None, judged by the file extension."""
+    suffix = path.suffix.lower()
+    return suffix[1:] if suffix in _COMPRESSED_SUFFIXES else None
+
+
+def open_text(path: Path, mode: str = "r", compression: Optional[str] = None) -> IO[str]:
+    """Open a UTF-8 text file, transparently (de)compressing ``.gz`` and ``.zst`` files.
+
+    ``compression`` overrides the extension, e.g. for a temporary file that will be
+    renamed to a compressed name. Zstandard needs the optional ``zstandard`` package.
+    """
+    compression = compression if compression is not None else compression_for(path)
+    if compression == "gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if compression == "zst":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise RuntimeError(
+                f"Reading or writing {path.name} requires the 'zstandard' package "
+                "(pip install capability-agent[zstd])"
+            ) from e
+        raw = path.open(mode + "b")
+        if mode == "r":
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        else:
+            stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return path.open(mode, encoding="utf-8")
+
+
+def iter_json_array(path: Path) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array one at a time.
+
+    Only the element being decoded (plus one read chunk) is held in memory, so very
+    large model files can be validated node by node instead of loading the whole list.
+    """
+    decoder = json.JSONDecoder()
+    with open_text(path, "r") as f:
+        buf, pos = "", 0
+
+        def fill() -> bool:
+            nonlocal buf, pos
+            chunk = f.read(_READ_CHUNK)
+            buf, pos = buf[pos:] + chunk, 0
+            return bool(chunk)
+
+        def skip_whitespace() -> None:
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos].isspace():
+                    pos += 1
+                if pos < len(buf) or not fill():
+                    return
+
+        skip_whitespace()
+        if pos >= len(buf) or buf[pos] != "[":
+            raise ValueError(f"{path} does not contain a JSON array")
+        pos += 1
+        first = True
+        while True:
+            skip_whitespace()
+            if pos >= len(buf):
+                raise ValueError(f"{path}: unexpected end of file inside the JSON array")
+            if buf[pos] == "]":
+                return
+            if not first:
+                if buf[pos] != ",":
+                    raise ValueError(f"{path}: expected ',' or ']' between array elements")
+                pos += 1
+                skip_whitespace()
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if fill():
+                        continue
+                    raise
+                # A number cut at the buffer end decodes early ("-4500." + "0"): accept the
+                # value only when a delimiter follows, or when the rest cannot continue it
+                if buf[end:].lstrip()[:1] in (",", "]"):
+                    break
+                if not all(c in _NUMBER_CHARS for c in buf[end:]) or not fill():
+                    break
+            pos = end
+            first = False
+            yield value
 
 
 def read_json_file(path: Path) -> Any:
-    with path.open("r", encoding="utf-8") as f:
+    with open_text(path, "r") as f:
         return json.load(f)
 
 
-def write_json_file(path: Path, data: Any) -> None:
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def write_json_array(path: Path, items: Iterable[Any], compact: bool = False, compression: Optional[str] = None) -> int:
+    """Write items as a JSON array one element at a time; return how many were written.
+
+    The indented layout is byte-for-byte what ``json.dump(..., indent=2)`` produces;
+    ``compact`` drops indentation and spaces.
+    """
+    count = 0
+    with open_text(path, "w", compression) as f:
+        f.write("[")
+        for item in items:
+            if compact:
+                f.write("," if count else "")
+                f.write(json.dumps(item, ensure_ascii=False, separators=(",", ":")))
+            else:
+                f.write(",\n  " if count else "\n  ")
+                f.write(json.dumps(item, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+            count += 1
+        f.write("\n]" if count and not compact else "]")
+    return count
+
+
+def write_json_file(path: Path, data: Any, compact: bool = False) -> None:
+    if isinstance(data, dict) or not isinstance(data, Iterable) or isinstance(data, (str, bytes)):
+        with open_text(path, "w") as f:
+            json.dump(data, f, ensure_ascii=False, indent=None if compact else 2)
+        return
+    write_json_array(path, data, compact=compact)
 
 
 def load_system_message(path: Optional[Path]) -> str:
@@ -97,12 +225,15 @@ def timestamp_for_filename() -> str:
     return datetime.now().strftime("%Y%m%d-%H%M%S")
 
 
-def save_progress(path: Path, model_data: List[Dict[str, Any]]) -> None:
-    """Atomically save progress to the input file."""
+def save_progress(path: Path, model_data: Iterable[Dict[str, Any]], compact: bool = False) -> int:
+    """Atomically save progress to the input file (compressed like the input, if it is).
+
+    Returns the number of nodes written.
+    """
     # Write to temporary file first, then rename for atomicity
     temp_path = path.with_suffix(path.suffix + ".tmp")
     try:
-        write_json_file(temp_path, model_data)
+        count = write_json_array(temp_path, model_data, compact=compact, compression=compression_for(path))
         
         # Windows-compatible atomic file replacement
         if os.name == "nt":  # Windows
@@ -123,6 +254,7 @@ def save_progress(path: Path, model_data: List[Dict[str, Any]]) -> None:
         else:
             # Unix-like systems: use replace for true atomicity
             temp_path.replace(path)
+        return count
             
     except Exception:
         # Clean up temp file if something went wrong
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, TextIO
+
+from .io_utils import save_progress
+from .models import PENDING_LEVEL, Capability, CapabilityIndex
+
+
+def journal_path_for(model_path: Path) -> Path:
+    """Return the journal path that sits next to a model file (``model.json.journal``)."""
+    return model_path.with_name(model_path.name + ".journal")
+
+
+class CheckpointJournal:
+    """Append-only write-ahead journal for ``--restart`` runs.
+
+    Every finished or failed leaf is recorded as one JSON line, so a checkpoint costs
+    O(children) instead of rewriting the whole model. The journal is replayed on restart
+    and periodically compacted into the model file itself.
+
+    Record shapes:
+      - ``{"op": "done", "leaf": <id>, "children": [<node>, ...]}``
+      - ``{"op": "failed", "leaf": <id>, "error": <message>}``
+    """
+
+    def __init__(self, model_path: Path, compact_every: int = 200):
+        self.model_path = model_path
+        self.path = journal_path_for(model_path)
+        self.compact_every = max(1, compact_every)
+        self.records_since_compaction = 0
+        self._handle: Optional[TextIO] = None
+
+    # ---- writing ----
+
+    def append_success(self, leaf_id: str, children: Sequence[Dict[str, Any]]) -> None:
+        self._append({"op": "done", "leaf": leaf_id, "children": list(children)})
+
+    def append_failure(self, leaf_id: str, error: str) -> None:
+        self._append({"op": "failed", "leaf": leaf_id, "error": error})
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        if self._handle is None:
+            self._handle = self.path.open("a", encoding="utf-8")
+        self._handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        self.records_since_compaction += 1
+
+    @property
+    def should_compact(self) -> bool:
+        return self.records_since_compaction >= self.compact_every
+
+    def compact(self, model_data: Iterable[Dict[str, Any]]) -> None:
+        """Atomically write the full model, then drop the journal records it now contains.
+
+        A crash between the two steps is harmless: replay is idempotent.
+        """
+        save_progress(self.model_path, model_data)
+        self.close()
+        if self.path.exists():
+            self.path.unlink()
+        self.records_since_compaction = 0
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    # ---- reading ----
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """Yield journal records in order, skipping a torn final line from a crash."""
+        if not self.path.exists():
+            return
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Only the last write can be partial; anything after it is unreadable anyway
+                    return
+
+    def replay(self, index: CapabilityIndex) -> int:
+        """Apply journal records to the indexed model in place; return how many were applied.
+
+        Children already present (e.g. after a compaction that crashed before truncating
+        the journal) are not added twice.
+        """
+        applied = 0
+        for record in self.records():
+            leaf_id = record.get("leaf")
+            if leaf_id not in index:
+                continue
+            leaf_dict = index[leaf_id].model_dump()
+            if record.get("op") == "done":
+                leaf_dict["capability"] = 1
+                leaf_dict.pop("error", None)
+                leaf_dict.pop(PENDING_LEVEL, None)
+                for child in record.get("children", []):
+                    if child.get("id") not in index:
+                        index.add(Capability.model_construct(**child))
+            elif record.get("op") == "failed":
+                leaf_dict["capability"] = -1
+                leaf_dict["error"] = record.get("error", "")
+            else:
+                continue
+            index.replace(Capability.model_construct(**leaf_dict))
+            applied += 1
+        return applied
+
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+# Run of string characters that need no special handling
+_PLAIN_RE = re.compile(r'[^"\\]+')
+
+_decoder = json.JSONDecoder(strict=False)
+
+
+def _decode_string(raw: str) -> str:
+    try:
+        return _decoder.decode('"' + raw + '"')
+    except ValueError:
+        return raw
+
+
+class ItemStreamParser:
+    """Resumable parser for a streamed ``{"items": [{"name": ..., "description": ...}, ...]}``.
+
+    ``feed`` consumes only the new delta and returns the items whose objects closed in it.
+    The container stack, the partial string and the pending key carry over between calls,
+    so total work is linear in the response length no matter how it is split. Strings are
+    decoded once they close, so escaped quotes and ``\\uXXXX`` escapes are handled, even
+    when an escape sequence is split across deltas.
+    """
+
+    def __init__(self) -> None:
+        self.items: List[Dict[str, str]] = []
+        # Open containers as (bracket, key the container is the value of)
+        self._stack: List[Tuple[str, Optional[str]]] = []
+        self._key: Optional[str] = None  # key awaiting its value in the current object
+        self._in_string = False
+        self._escape = False
+        self._raw: List[str] = []
+        self._current: Optional[Dict[str, str]] = None  # item object being read
+
+    def feed(self, delta: str) -> List[Dict[str, str]]:
+        completed: List[Dict[str, str]] = []
+        i, n = 0, len(delta)
+        while i < n:
+            if self._in_string:
+                if self._escape:
+                    self._raw.append(delta[i])
+                    self._escape = False
+                    i += 1
+                    continue
+                m = _PLAIN_RE.match(delta, i)
+                if m:
+                    self._raw.append(m.group())
+                    i = m.end()
+                    continue
+                ch = delta[i]
+                i += 1
+                if ch == "\\":
+                    self._raw.append(ch)
+                    self._escape = True
+                else:  # closing quote
+                    self._in_string = False
+                    self._string_done(_decode_string("".join(self._raw)))
+                continue
+
+            ch = delta[i]
+            i += 1
+            if ch == '"':
+                self._in_string = True
+                self._raw = []
+            elif ch == "{" or ch == "[":
+                if ch == "{" and self._at_items_array():
+                    self._current = {}
+                self._stack.append((ch, self._key))
+                self._key = None
+            elif ch == "}" or ch == "]":
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                self._key = None
+                if ch == "}" and self._current is not None and self._at_items_array():
+                    item = self._current
+                    self._current = None
+                    if item.get("name") and item.get("description"):
+                        self.items.append(item)
+                        completed.append(item)
+            elif ch == ",":
+                self._key = None
+        return completed
+
+    def _at_items_array(self) -> bool:
+        """True when the innermost open container is the root object's ``items`` array."""
+        return len(self._stack) == 2 and self._stack[0][0] == "{" and self._stack[1] == ("[", "items")
+
+    def _string_done(self, value: str) -> None:
+        if not self._stack or self._stack[-1][0] != "{":
+            return  # array element
+        if self._key is None:
+            self._key = value
+            return
+        if self._current is not None and len(self._stack) == 3 and self._key in ("name", "description"):
+            self._current[self._key] = value
+        self._key = None
@@ -1,23 +1,33 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import os
-import re
+import threading
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Iterable, Mapping
+from typing import Callable, Dict, List, Optional, Tuple, Mapping
 
 import httpx
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from pydantic import BaseModel, Field, ValidationError
-from rich.console import Console
+from rich.console import Console, Group, RenderableType
 from rich.live import Live
 from rich.panel import Panel
+from rich.progress import Progress
 from rich.table import Table
 from rich.text import Text
 
+from .cache import ResponseCache
+from .httppool import HttpSettings
+from .jsonstream import ItemStreamParser
+from .logwriter import ExchangeLog, LogSettings, start_background_writer, stop_background_writer
+from .metrics import RunMetrics, api_call, span
+from .ratelimit import RateLimiter, estimate_tokens
+from .retry import RetryPolicy, RetrySchedule, is_retryable
+
 
 # =========================
 # Exceptions & Data Models
@@ -55,6 +65,15 @@ class UsageStats(BaseModel):
     # Model information
     model_name: str = Field(default="", description="Model used")
 
+    # Response cache (see ResponseCache); tokens of hits are counted as saved, not used
+    response_cache_hits: int = Field(default=0, description="Calls answered from the response cache")
+    response_cache_misses: int = Field(default=0, description="Calls that missed the response cache")
+    response_cache_saved_tokens: int = Field(default=0, description="Tokens the cached responses originally cost")
+
+    # Request coalescing (see PromptCoalescer): leaves answered by an identical in-flight call
+    coalesced_calls: int = Field(default=0, description="Calls saved by sharing an identical in-flight call")
+    coalesced_saved_tokens: int = Field(default=0, description="Tokens the shared calls cost")
+
     def __add__(self, other: "UsageStats") -> "UsageStats":
         """Add two UsageStats together."""
         return UsageStats(
@@ -64,6 +83,11 @@ class UsageStats(BaseModel):
             cached_tokens=self.cached_tokens + other.cached_tokens,
             reasoning_tokens=self.reasoning_tokens + other.reasoning_tokens,
             model_name=self.model_name or other.model_name,
+            response_cache_hits=self.response_cache_hits + other.response_cache_hits,
+            response_cache_misses=self.response_cache_misses + other.response_cache_misses,
+            response_cache_saved_tokens=self.response_cache_saved_tokens + other.response_cache_saved_tokens,
+            coalesced_calls=self.coalesced_calls + other.coalesced_calls,
+            coalesced_saved_tokens=self.coalesced_saved_tokens + other.coalesced_saved_tokens,
         )
 
     @property
@@ -88,6 +112,18 @@ class UsageStats(BaseModel):
         """Check if reasoning tokens were used."""
         return self.reasoning_tokens > 0
 
+    @property
+    def response_cache_lookups(self) -> int:
+        """Number of calls that consulted the response cache."""
+        return self.response_cache_hits + self.response_cache_misses
+
+    @property
+    def response_cache_hit_rate(self) -> float:
+        """Calculate response cache hit rate as percentage."""
+        if self.response_cache_lookups <= 0:
+            return 0.0
+        return (self.response_cache_hits / self.response_cache_lookups) * 100.0
+
 
 # =========================
 # Logging Infrastructure
@@ -104,23 +140,42 @@ class LoggingResponse(httpx.Response):
         log_body: bool = False,
         request: Optional[httpx.Request] = None,
         start_time: Optional[float] = None,
+        settings: Optional[LogSettings] = None,
+        request_entry: Optional[ExchangeLog] = None,
         **kwargs,
     ):
         super().__init__(*args, request=request, **kwargs)
         self.logger = logger
         self.log_level = log_level
         self.log_body = log_body
-        self._response_body = b""
+        self.settings = settings or LogSettings()
+        # Request entry held back until sampling has seen the outcome
+        self._request_entry = request_entry
+        self._capture = bool(logger) and log_level == "full" and log_body
+        self._response_body = bytearray()
+        self._body_truncated = False
         self._start_time = start_time
         self._logged = False
 
+    def _capture_chunk(self, chunk: bytes) -> None:
+        room = self.settings.body_limit - len(self._response_body)
+        if len(chunk) > room:
+            self._body_truncated = True
+            chunk = chunk[:max(0, room)]
+        self._response_body += chunk
+
     def _log_response_if_needed(self) -> None:
         if not self.logger or self._logged:
             return
+        self._logged = True
 
         duration = 0.0
         if self._start_time is not None:
             duration = round(time.time() - self._start_time, 3)
+        if not self.settings.selects(self.status_code, duration):
+            return
+        if self._request_entry is not None:
+            self.logger.info(self._request_entry)
 
         req = getattr(self, "request", None)
         log_data = {
@@ -131,6 +186,7 @@ class LoggingResponse(httpx.Response):
             "url": str(req.url) if req else "",
         }
 
+        body = None
         if self.log_level == "basic":
             if "openai-processing-ms" in self.headers:
                 log_data["openai_processing_ms"] = self.headers["openai-processing-ms"]
@@ -141,30 +197,23 @@ class LoggingResponse(httpx.Response):
         elif self.log_level == "full":
             log_data["headers"] = _sanitize_headers(self.headers)
             if self.log_body and self._response_body:
-                try:
-                    content = json.loads(self._response_body.decode("utf-8"))
-                    log_data["body"] = content
-                except (json.JSONDecodeError, UnicodeDecodeError):
-                    log_data["body"] = self._response_body.decode("utf-8", errors="replace")
+                body = bytes(self._response_body)
 
-        self.logger.info(json.dumps(log_data, ensure_ascii=False))
-        self._logged = True
+        # JSON encoding happens when the (background) handler formats the entry
+        self.logger.info(ExchangeLog(log_data, body, self._body_truncated))
 
     def iter_bytes(self, *args, **kwargs):
-        """Override to capture response data for logging."""
+        """Override to capture response data for logging (``read`` goes through here too)."""
         try:
             for chunk in super().iter_bytes(*args, **kwargs):
-                if self.logger and self.log_level == "full" and self.log_body:
-                    self._response_body += chunk
+                if self._capture:
+                    self._capture_chunk(chunk)
                 yield chunk
         finally:
             self._log_response_if_needed()
 
     def read(self):
-        """Override to capture response data for logging."""
         content = super().read()
-        if self.logger and self.log_level == "full" and self.log_body:
-            self._response_body = content
         self._log_response_if_needed()
         return content
 
@@ -174,9 +223,35 @@ class LoggingResponse(httpx.Response):
         finally:
             self._log_response_if_needed()
 
+    async def aiter_bytes(self, *args, **kwargs):
+        """Async counterpart of ``iter_bytes`` for ``AsyncLoggingTransport``."""
+        try:
+            async for chunk in super().aiter_bytes(*args, **kwargs):
+                if self._capture:
+                    self._capture_chunk(chunk)
+                yield chunk
+        finally:
+            self._log_response_if_needed()
+
+    async def aread(self):
+        content = await super().aread()
+        self._log_response_if_needed()
+        return content
+
+    async def aclose(self) -> None:
+        try:
+            await super().aclose()
+        finally:
+            self._log_response_if_needed()
+
 
 class LoggingTransport(httpx.BaseTransport):
-    """Custom transport that logs OpenAI requests and responses."""
+    """Custom transport that logs OpenAI requests and responses.
+
+    Only cheap bookkeeping happens on the request path: entries are handed to the logger
+    unencoded (see ``ExchangeLog``) and bodies are capped at ``settings.body_limit``.
+    With sampling enabled the request entry is held until the outcome is known.
+    """
     
     def __init__(
         self,
@@ -184,25 +259,33 @@ class LoggingTransport(httpx.BaseTransport):
         logger: Optional[logging.Logger] = None,
         log_level: str = "basic",
         log_body: bool = False,
+        settings: Optional[LogSettings] = None,
     ):
         self.transport = transport
         self.logger = logger
         self.log_level = log_level
         self.log_body = log_body
+        self.settings = settings or LogSettings()
         
     def handle_request(self, request: httpx.Request) -> httpx.Response:
         """Handle request with logging."""
         start_time = time.time()
-        
-        # Log request
-        if self.logger:
-            self._log_request(request, start_time)
-            
-        # Execute request
-        response = self.transport.handle_request(request)
-        
-        # Create logging response wrapper
-        logging_response = LoggingResponse(
+        request_entry = self._request_entry(request, start_time)
+        try:
+            response = self.transport.handle_request(request)
+        except Exception as exc:
+            self._log_failure(request_entry, request, start_time, exc)
+            raise
+        return self._wrap(response, request, start_time, request_entry)
+
+    def _wrap(
+        self,
+        response: httpx.Response,
+        request: httpx.Request,
+        start_time: float,
+        request_entry: Optional[ExchangeLog],
+    ) -> LoggingResponse:
+        return LoggingResponse(
             status_code=response.status_code,
             headers=response.headers,
             stream=response.stream,
@@ -212,12 +295,14 @@ class LoggingTransport(httpx.BaseTransport):
             log_level=self.log_level,
             log_body=self.log_body,
             start_time=start_time,
+            settings=self.settings,
+            request_entry=request_entry if self.settings.sampling else None,
         )
 
-        return logging_response
-    
-    def _log_request(self, request: httpx.Request, timestamp: float):
-        """Log the outgoing request."""
+    def _request_entry(self, request: httpx.Request, timestamp: float) -> Optional[ExchangeLog]:
+        """Build the request entry; logged now, or later by the response when sampling."""
+        if not self.logger:
+            return None
         log_data = {
             "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
             "type": "request",
@@ -226,18 +311,79 @@ class LoggingTransport(httpx.BaseTransport):
             "headers": _sanitize_headers(request.headers) if self.log_level == "full" else {"content-type": request.headers.get("content-type")},
         }
 
+        body = None
+        truncated = False
         if self.log_level == "full" and self.log_body and request.content:
-            try:
-                # Try to parse as JSON for better readability
-                content = json.loads(request.content.decode("utf-8"))
-                log_data["body"] = content
-            except (json.JSONDecodeError, UnicodeDecodeError):
-                log_data["body"] = request.content.decode("utf-8", errors="replace")
-        
-        self.logger.info(json.dumps(log_data, ensure_ascii=False))
-    
-def setup_openai_logging(log_dir: Path, log_level: str) -> Optional[logging.Logger]:
-    """Set up logging for OpenAI requests and responses."""
+            limit = self.settings.body_limit
+            body = request.content[:limit]
+            truncated = len(request.content) > limit
+
+        entry = ExchangeLog(log_data, body, truncated)
+        if not self.settings.sampling:
+            self.logger.info(entry)
+        return entry
+
+    def _log_failure(
+        self,
+        request_entry: Optional[ExchangeLog],
+        request: httpx.Request,
+        start_time: float,
+        exc: Exception,
+    ) -> None:
+        """Log a request that raised before any response (always a 'failed' exchange)."""
+        if not self.logger:
+            return
+        duration = round(time.time() - start_time, 3)
+        if not self.settings.selects(None, duration):
+            return
+        if self.settings.sampling and request_entry is not None:
+            self.logger.info(request_entry)
+        self.logger.info(ExchangeLog({
+            "timestamp": datetime.now().isoformat(),
+            "type": "error",
+            "duration_seconds": duration,
+            "url": str(request.url),
+            "error": f"{type(exc).__name__}: {exc}",
+        }))
+
+
+class AsyncLoggingTransport(LoggingTransport, httpx.AsyncBaseTransport):
+    """Async variant of ``LoggingTransport`` for ``AsyncOpenAI`` clients."""
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        logger: Optional[logging.Logger] = None,
+        log_level: str = "basic",
+        log_body: bool = False,
+        settings: Optional[LogSettings] = None,
+    ):
+        super().__init__(transport, logger, log_level, log_body, settings)  # type: ignore[arg-type]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Handle request with logging."""
+        start_time = time.time()
+        request_entry = self._request_entry(request, start_time)
+        try:
+            response = await self.transport.handle_async_request(request)  # type: ignore[attr-defined]
+        except Exception as exc:
+            self._log_failure(request_entry, request, start_time, exc)
+            raise
+        return self._wrap(response, request, start_time, request_entry)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()  # type: ignore[attr-defined]
+
+
+def setup_openai_logging(
+    log_dir: Path, log_level: str, settings: Optional[LogSettings] = None
+) -> Optional[logging.Logger]:
+    """Set up logging for OpenAI requests and responses.
+
+    Records go through a queue to a background writer thread that encodes them and
+    writes a rotating, gzip-compressed log file; call ``shutdown_openai_logging`` (also
+    registered at exit) to flush it.
+    """
     if log_level == "none":
         return None
         
@@ -256,25 +402,49 @@ def setup_openai_logging(log_dir: Path, log_level: str) -> Optional[logging.Logg
     for handler in logger.handlers[:]:
         logger.removeHandler(handler)
     
-    # Add file handler
-    handler = logging.FileHandler(log_file, encoding="utf-8")
-    handler.setLevel(logging.INFO)
-    
-    # Use simple format since we're logging JSON
-    formatter = logging.Formatter("%(message)s")
-    handler.setFormatter(formatter)
-    
-    logger.addHandler(handler)
+    start_background_writer(logger, log_file, settings or LogSettings())
     logger.propagate = False  # Don't propagate to root logger
     
     return logger
 
 
+def shutdown_openai_logging() -> None:
+    """Flush pending request/response log records and stop the writer thread."""
+    stop_background_writer()
+
+
 # =========================
 # Client & Config
 # =========================
 
-def ensure_client(log_dir: Optional[Path] = None, log_level: str = "none") -> OpenAI:
+def _client_kwargs() -> dict:
+    """Build OpenAI client kwargs from environment variables (shared by sync and async clients)."""
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise LLMError("Environment variable OPENAI_API_KEY is not set.")
+
+    # Retries are owned by RetryPolicy (jitter, Retry-After, circuit breaker), not the SDK
+    kwargs = {"api_key": api_key, "max_retries": 0}
+    base_url = os.getenv("OPENAI_BASE_URL")
+    if base_url:
+        kwargs["base_url"] = base_url
+    org = os.getenv("OPENAI_ORG_ID")
+    if org:
+        kwargs["organization"] = org
+    project = os.getenv("OPENAI_PROJECT_ID")
+    if project:
+        kwargs["project"] = project
+    return kwargs
+
+
+def ensure_client(
+    log_dir: Optional[Path] = None,
+    log_level: str = "none",
+    rate_limiter: Optional[RateLimiter] = None,
+    log_settings: Optional[LogSettings] = None,
+    http_settings: Optional[HttpSettings] = None,
+    concurrency: int = 1,
+) -> OpenAI:
     """
     Instantiate an OpenAI client using environment variables.
 
@@ -287,43 +457,78 @@ def ensure_client(log_dir: Optional[Path] = None, log_level: str = "none") -> Op
     Args:
         log_dir: Directory to write request/response logs (if logging enabled)
         log_level: Logging level ("none", "basic", or "full")
+        rate_limiter: Optional shared limiter fed with each response's rate-limit headers
+        log_settings: Rotation, body cap and sampling of the request log
+        http_settings: Pool, keep-alive, HTTP/2 and timeouts of the HTTP client
+        concurrency: Number of workers sharing the client; sizes the connection pool
     """
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise LLMError("Environment variable OPENAI_API_KEY is not set.")
+    kwargs = _client_kwargs()
+    http_settings = http_settings or HttpSettings()
+    kwargs["timeout"] = http_settings.timeout()
 
-    kwargs = {"api_key": api_key}
-    base_url = os.getenv("OPENAI_BASE_URL")
-    if base_url:
-        kwargs["base_url"] = base_url
-    org = os.getenv("OPENAI_ORG_ID")
-    if org:
-        kwargs["organization"] = org
-    project = os.getenv("OPENAI_PROJECT_ID")
-    if project:
-        kwargs["project"] = project
+    # The pool is configured on the innermost transport, so it applies with or without logging
+    transport: httpx.BaseTransport = httpx.HTTPTransport(**http_settings.transport_kwargs(concurrency))
 
     # Add custom transport for logging if enabled
     if log_dir and log_level != "none":
-        logger = setup_openai_logging(log_dir, log_level)
+        logger = setup_openai_logging(log_dir, log_level, log_settings)
         if logger:
-            # Create base transport (HTTP or async)
-            base_transport = httpx.HTTPTransport()
-            logging_transport = LoggingTransport(
-                base_transport,
+            transport = LoggingTransport(
+                transport,
                 logger,
                 log_level,
                 log_body=_should_log_body(),
+                settings=log_settings,
             )
-            
-            # Create custom HTTP client with logging transport
-            http_client = httpx.Client(transport=logging_transport)
-            kwargs["http_client"] = http_client
 
+    # Feed rate-limit headers of every response to the shared limiter
+    event_hooks: Dict[str, list] = {}
+    if rate_limiter is not None:
+        event_hooks["response"] = [rate_limiter.on_response]
+
+    kwargs["http_client"] = httpx.Client(
+        transport=transport, event_hooks=event_hooks, timeout=kwargs["timeout"]
+    )
     return OpenAI(**kwargs)
 
 
-def _default_model() -> str:
+def ensure_async_client(
+    log_dir: Optional[Path] = None,
+    log_level: str = "none",
+    rate_limiter: Optional[RateLimiter] = None,
+    log_settings: Optional[LogSettings] = None,
+    http_settings: Optional[HttpSettings] = None,
+    concurrency: int = 1,
+) -> AsyncOpenAI:
+    """Instantiate an ``AsyncOpenAI`` client; same env vars, logging and pool as ``ensure_client``."""
+    kwargs = _client_kwargs()
+    http_settings = http_settings or HttpSettings()
+    kwargs["timeout"] = http_settings.timeout()
+
+    transport: httpx.AsyncBaseTransport = httpx.AsyncHTTPTransport(**http_settings.transport_kwargs(concurrency))
+
+    if log_dir and log_level != "none":
+        logger = setup_openai_logging(log_dir, log_level, log_settings)
+        if logger:
+            transport = AsyncLoggingTransport(
+                transport,
+                logger,
+                log_level,
+                log_body=_should_log_body(),
+                settings=log_settings,
+            )
+
+    event_hooks: Dict[str, list] = {}
+    if rate_limiter is not None:
+        event_hooks["response"] = [rate_limiter.on_response_async]
+
+    kwargs["http_client"] = httpx.AsyncClient(
+        transport=transport, event_hooks=event_hooks, timeout=kwargs["timeout"]
+    )
+    return AsyncOpenAI(**kwargs)
+
+
+def default_model() -> str:
     """
     Prefer GPT-5 series if not overridden:
       OPENAI_MODEL, else "gpt-5".
@@ -331,6 +536,10 @@ def _default_model() -> str:
     return os.getenv("OPENAI_MODEL") or "gpt-5"
 
 
+# Built-in tools offered to the model on every call
+_TOOLS = [{"type": "web_search_preview"}]
+
+
 def _common_generation_kwargs() -> dict:
     """
     Centralized generation defaults tuned for reliability + reproducibility.
@@ -363,6 +572,51 @@ def _common_generation_kwargs() -> dict:
     return kwargs
 
 
+def _strict_schema(node):
+    """Close every object schema (no extra keys, all properties required), as strict mode requires."""
+    if isinstance(node, list):
+        return [_strict_schema(v) for v in node]
+    if not isinstance(node, dict):
+        return node
+    node = {k: _strict_schema(v) for k, v in node.items()}
+    if node.get("type") == "object" and "properties" in node:
+        node["additionalProperties"] = False
+        node["required"] = list(node["properties"])
+    return node
+
+
+def response_json_schema() -> dict:
+    """Strict JSON schema of ``CapabilityResponse``, the structured output every call asks for."""
+    return _strict_schema(CapabilityResponse.model_json_schema())
+
+
+def responses_request_body(
+    system_message: str, user_prompt: str, prompt_cache_key: Optional[str] = None
+) -> dict:
+    """Responses API request body equivalent to the one ``call_openai`` sends for a prompt.
+
+    Used where the request is not sent through the SDK's ``responses.parse`` (the Batch API).
+    """
+    body = {
+        "model": default_model(),
+        "instructions": system_message,
+        "tools": _TOOLS,
+        "input": user_prompt,
+        "text": {
+            "format": {
+                "type": "json_schema",
+                "name": CapabilityResponse.__name__,
+                "strict": True,
+                "schema": response_json_schema(),
+            }
+        },
+        **_common_generation_kwargs(),
+    }
+    if prompt_cache_key:
+        body["prompt_cache_key"] = prompt_cache_key
+    return body
+
+
 # =========================
 # Internal helpers
 # =========================
@@ -373,7 +627,7 @@ def _extract_usage(obj) -> UsageStats:
     Handles variations in SDK fields gracefully.
     """
     usage = getattr(obj, "usage", None)
-    model_name = getattr(obj, "model", None) or _default_model()
+    model_name = getattr(obj, "model", None) or default_model()
     stats = UsageStats(model_name=model_name)
 
     if not usage:
@@ -384,13 +638,21 @@ def _extract_usage(obj) -> UsageStats:
     stats.output_tokens = getattr(usage, "output_tokens", getattr(usage, "completion_tokens", 0)) or 0
     stats.total_tokens = getattr(usage, "total_tokens", stats.input_tokens + stats.output_tokens) or 0
 
-    # Prompt caching (cached tokens live under input_token_details or prompt_tokens_details)
-    itd = getattr(usage, "input_token_details", None) or getattr(usage, "prompt_tokens_details", None)
+    # Prompt caching (cached tokens live under input_tokens_details or prompt_tokens_details)
+    itd = (
+        getattr(usage, "input_tokens_details", None)
+        or getattr(usage, "input_token_details", None)
+        or getattr(usage, "prompt_tokens_details", None)
+    )
     if itd:
         stats.cached_tokens = getattr(itd, "cached_tokens", 0) or 0
 
-    # Reasoning tokens (can appear under completion_tokens_details or output_token_details)
-    ctd = getattr(usage, "completion_tokens_details", None) or getattr(usage, "output_token_details", None)
+    # Reasoning tokens (output_tokens_details in the Responses API, completion_tokens_details in Chat)
+    ctd = (
+        getattr(usage, "output_tokens_details", None)
+        or getattr(usage, "completion_tokens_details", None)
+        or getattr(usage, "output_token_details", None)
+    )
     if ctd:
         stats.reasoning_tokens = getattr(ctd, "reasoning_tokens", 0) or 0
 
@@ -437,7 +699,7 @@ def _ensure_parsed_output(response) -> CapabilityResponse:
     )
 
 
-def _validate_items(parsed: CapabilityResponse, max_items: int) -> List[Dict[str, str]]:
+def validate_items(parsed: CapabilityResponse, max_items: int) -> List[Dict[str, str]]:
     if not parsed:
         raise LLMError("No parsed output received from model.")
     
@@ -490,92 +752,292 @@ def _progress_panel(capabilities: List[Dict[str, str]], leaf_name: str) -> Panel
     )
 
 
-def _extract_capabilities_incremental(partial_json: str) -> List[Dict[str, str]]:
-    """
-    Extract completed capability items from a (possibly broken) incremental JSON stream.
-    Tolerant, but only returns fully closed objects containing 'name' and 'description'.
+class StreamingDashboard:
+    """One shared ``rich.Live`` view for concurrent streaming calls.
+
+    Shows the run's overall ``progress`` bar above one ``_progress_panel`` per in-flight
+    leaf. Workers report partial capabilities from any thread through ``update``; the
+    display refreshes on its own schedule, so a burst of deltas costs one redraw.
     """
-    capabilities: List[Dict[str, str]] = []
-    # Match any closed object with both keys; tolerant to ordering/whitespace
-    pattern = r'\{[^{}]*"name"\s*:\s*"([^"]+)"[^{}]*"description"\s*:\s*"([^"]+)"[^{}]*\}'
-    for name, description in re.findall(pattern, partial_json):
-        capabilities.append({"name": name, "description": description})
-    return capabilities
+
+    def __init__(self, progress: Progress, console: Optional[Console] = None, refresh_per_second: float = 6):
+        self.progress = progress
+        self._panels: Dict[str, Tuple[str, List[Dict[str, str]]]] = {}
+        self._lock = threading.Lock()
+        self._live = Live(
+            console=console or progress.console,
+            get_renderable=self._render,
+            refresh_per_second=refresh_per_second,
+            transient=True,
+        )
+
+    def _render(self) -> RenderableType:
+        with self._lock:
+            panels = [_progress_panel(caps, name) for name, caps in self._panels.values()]
+        return Group(self.progress.get_renderable(), *panels)
+
+    def start(self, key: str, leaf_name: str) -> None:
+        with self._lock:
+            self._panels[key] = (leaf_name, [])
+
+    def update(self, key: str, capabilities: List[Dict[str, str]]) -> None:
+        with self._lock:
+            if key in self._panels:
+                self._panels[key] = (self._panels[key][0], capabilities)
+
+    def finish(self, key: str) -> None:
+        with self._lock:
+            self._panels.pop(key, None)
+
+    def __enter__(self) -> "StreamingDashboard":
+        self._live.start(refresh=True)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._live.stop()
+
+
+def _response_cache_key(
+    model: str, system_message: str, user_prompt: str, gen_kwargs: dict, max_items: int
+) -> str:
+    """Cache key covering every input that shapes the response."""
+    return ResponseCache.key(
+        model=model,
+        instructions=system_message,
+        input=user_prompt,
+        tools=_TOOLS,
+        generation=gen_kwargs,
+        max_items=max_items,
+    )
+
+
+def _cached_response(
+    cache: ResponseCache, key: str, model: str
+) -> Optional[Tuple[List[Dict[str, str]], UsageStats]]:
+    """Return a cache hit as (items, usage) where usage only records the hit and tokens saved."""
+    hit = cache.get(key)
+    if hit is None:
+        return None
+    items, usage = hit
+    return items, UsageStats(
+        model_name=model,
+        response_cache_hits=1,
+        response_cache_saved_tokens=int(usage.get("total_tokens", 0)),
+    )
 
 
-def _backoff_iter(attempts: int = 5, base: float = 0.5) -> Iterable[float]:
-    """Simple jittered exponential backoff sequence."""
-    for i in range(attempts):
-        # cap to a sane ceiling
-        yield min(8.0, base * (2 ** i))
+def _store_response(
+    cache: ResponseCache, key: str, items: List[Dict[str, str]], usage_stats: UsageStats
+) -> None:
+    cache.put(key, items, usage_stats.model_dump(exclude={"response_cache_hits", "response_cache_misses", "response_cache_saved_tokens"}))
+    usage_stats.response_cache_misses = 1
+
+
+def _consume_stream(stream, report: Optional[Callable[[List[Dict[str, str]]], None]]) -> None:
+    """Drain a Responses stream, raising on refusals/errors and reporting partial capabilities."""
+    parser = ItemStreamParser()
+    for event in stream:
+        etype = getattr(event, "type", "")
+        # Explicit refusals
+        if etype == "response.refusal.delta":
+            delta = getattr(event, "delta", "") or "Request refused by model."
+            raise LLMError(f"Model refused: {delta}")
+        # Text deltas: only the new text is parsed; report when an item completes
+        if etype == "response.output_text.delta" and report is not None:
+            if parser.feed(getattr(event, "delta", "")):
+                report(list(parser.items))
+        # Hard errors mid-stream
+        if etype == "response.error":
+            err = getattr(event, "error", "unknown streaming error")
+            raise LLMError(f"Stream error: {err}")
+    # The caller still calls get_final_response() for structured output + usage
+
+
+def _next_retry_delay(policy: RetryPolicy, schedule: RetrySchedule, exc: Exception, what: str) -> float:
+    """Classify a failed attempt: return the delay before retrying, or raise ``LLMError``."""
+    if not is_retryable(exc):
+        raise LLMError(f"{what} (not retryable): {exc}") from exc
+    policy.record_failure()
+    delay = schedule.next_delay(exc)
+    if delay is None:
+        raise LLMError(f"{what} after retries: {exc}") from exc
+    return delay
+
+
+def _finalize_response(response, model: str, max_items: int) -> Tuple[List[Dict[str, str]], UsageStats]:
+    """Check status/refusal, then extract validated items and usage from a parse() response."""
+    # Handle incomplete/filtered cases if provided by SDK
+    status = getattr(response, "status", "complete")
+    if status == "incomplete":
+        details = getattr(response, "incomplete_details", None)
+        reason = getattr(details, "reason", "unknown") if details else "unknown"
+        if reason == "max_output_tokens":
+            raise LLMError("Response incomplete: reached max output tokens limit.")
+        if reason == "content_filter":
+            raise LLMError("Response incomplete: content was filtered.")
+        raise LLMError(f"Response incomplete: {details!r}")
+
+    # Detect explicit refusal in content stream (defensive)
+    out = getattr(response, "output", None) or []
+    if out:
+        first = out[0]
+        for c in getattr(first, "content", []) or []:
+            if getattr(c, "type", None) == "refusal":
+                msg = getattr(c, "refusal", "Request refused by model.")
+                raise LLMError(f"Model refused the request: {msg}")
+
+    parsed = _ensure_parsed_output(response)
+    items = validate_items(parsed, max_items)
+    usage_stats = _extract_usage(response)
+    usage_stats.model_name = model
+    return items, usage_stats
 
 
 # =========================
 # Public (drop-in) API
 # =========================
 
+def _estimated_request_tokens(system_message: str, user_prompt: str, gen_kwargs: dict) -> int:
+    """Tokens a request counts against the TPM limit: prompt estimate plus output allowance."""
+    return estimate_tokens(system_message, user_prompt) + int(gen_kwargs.get("max_output_tokens", 0))
+
+
 def call_openai(
     client: OpenAI,
     system_message: str,
     user_prompt: str,
-    max_items: int
+    max_items: int,
+    *,
+    rate_limiter: Optional[RateLimiter] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    cache: Optional[ResponseCache] = None,
+    prompt_cache_key: Optional[str] = None,
+    metrics: Optional[RunMetrics] = None,
 ) -> Tuple[List[Dict[str, str]], UsageStats]:
     """
     Call OpenAI Responses API and return a list of {name, description} dicts with usage stats.
 
     Uses Responses API with structured outputs via Pydantic models (responses.parse).
+    When a ``rate_limiter`` is given, every attempt waits for request and token capacity.
+    Transient failures are retried per ``retry_policy`` (default ``RetryPolicy()``).
+    With a ``cache``, identical requests are answered from disk without any network I/O.
+    ``prompt_cache_key`` routes requests sharing a prompt prefix to the same provider cache.
+    With ``metrics``, limiter waits, API time, validation and retry backoff are timed as stages.
     Returns tuple of (items, usage_stats).
     """
-    model = _default_model()
+    model = default_model()
     gen_kwargs = _common_generation_kwargs()
-
-    last_exc: Optional[Exception] = None
-    for delay in _backoff_iter():
+    if prompt_cache_key:
+        gen_kwargs["prompt_cache_key"] = prompt_cache_key
+    estimated = _estimated_request_tokens(system_message, user_prompt, gen_kwargs)
+
+    cache_key = None
+    if cache is not None:
+        cache_key = _response_cache_key(model, system_message, user_prompt, gen_kwargs, max_items)
+        cached = _cached_response(cache, cache_key, model)
+        if cached is not None:
+            return cached
+
+    policy = retry_policy or RetryPolicy()
+    schedule = policy.schedule()
+    while True:
         try:
+            policy.before_attempt()
+            if rate_limiter is not None:
+                with span(metrics, "rate_limit_wait"):
+                    rate_limiter.acquire(estimated)
             # responses.parse enforces the Pydantic schema on the return path
-            response = client.responses.parse(
-                model=model,
-                instructions=system_message,  # treated like a system/developer message
-                tools=[{"type": "web_search_preview"}],
-                input=user_prompt,
-                text_format=CapabilityResponse,
-                **gen_kwargs,
-            )
-
-            # Handle incomplete/filtered cases if provided by SDK
-            status = getattr(response, "status", "complete")
-            if status == "incomplete":
-                details = getattr(response, "incomplete_details", None)
-                reason = getattr(details, "reason", "unknown") if details else "unknown"
-                if reason == "max_output_tokens":
-                    raise LLMError("Response incomplete: reached max output tokens limit.")
-                if reason == "content_filter":
-                    raise LLMError("Response incomplete: content was filtered.")
-                raise LLMError(f"Response incomplete: {details!r}")
-
-            # Detect explicit refusal in content stream (defensive)
-            out = getattr(response, "output", None) or []
-            if out:
-                first = out[0]
-                for c in getattr(first, "content", []) or []:
-                    if getattr(c, "type", None) == "refusal":
-                        msg = getattr(c, "refusal", "Request refused by model.")
-                        raise LLMError(f"Model refused the request: {msg}")
-
-            parsed = _ensure_parsed_output(response)
-            items = _validate_items(parsed, max_items)
-            usage_stats = _extract_usage(response)
-            usage_stats.model_name = model
+            with api_call(metrics):
+                response = client.responses.parse(
+                    model=model,
+                    instructions=system_message,  # treated like a system/developer message
+                    tools=_TOOLS,
+                    input=user_prompt,
+                    text_format=CapabilityResponse,
+                    **gen_kwargs,
+                )
+
+            with span(metrics, "validate"):
+                items, usage_stats = _finalize_response(response, model, max_items)
+            policy.record_success()
+            if rate_limiter is not None:
+                rate_limiter.reconcile(estimated, usage_stats.total_tokens)
+            if cache is not None:
+                _store_response(cache, cache_key, items, usage_stats)
             return items, usage_stats
 
         except (LLMError, ValidationError):
             # Non-retryable schema/refusal/incomplete errors bubble immediately
             raise
         except Exception as e:  # network/5xx/rate limits => retry with backoff
-            last_exc = e
-            time.sleep(delay)
+            delay = _next_retry_delay(policy, schedule, e, "OpenAI API error")
+            with span(metrics, "retry_wait"):
+                time.sleep(delay)
+
+
+async def call_openai_async(
+    client: AsyncOpenAI,
+    system_message: str,
+    user_prompt: str,
+    max_items: int,
+    *,
+    rate_limiter: Optional[RateLimiter] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    cache: Optional[ResponseCache] = None,
+    prompt_cache_key: Optional[str] = None,
+    metrics: Optional[RunMetrics] = None,
+) -> Tuple[List[Dict[str, str]], UsageStats]:
+    """
+    Async counterpart of ``call_openai`` for ``AsyncOpenAI`` clients.
+
+    Same request, retry and validation behavior; waits without blocking the event loop.
+    """
+    model = default_model()
+    gen_kwargs = _common_generation_kwargs()
+    if prompt_cache_key:
+        gen_kwargs["prompt_cache_key"] = prompt_cache_key
+    estimated = _estimated_request_tokens(system_message, user_prompt, gen_kwargs)
+
+    cache_key = None
+    if cache is not None:
+        cache_key = _response_cache_key(model, system_message, user_prompt, gen_kwargs, max_items)
+        cached = _cached_response(cache, cache_key, model)
+        if cached is not None:
+            return cached
+
+    policy = retry_policy or RetryPolicy()
+    schedule = policy.schedule()
+    while True:
+        try:
+            await policy.before_attempt_async()
+            if rate_limiter is not None:
+                with span(metrics, "rate_limit_wait"):
+                    await rate_limiter.acquire_async(estimated)
+            with api_call(metrics):
+                response = await client.responses.parse(
+                    model=model,
+                    instructions=system_message,
+                    tools=_TOOLS,
+                    input=user_prompt,
+                    text_format=CapabilityResponse,
+                    **gen_kwargs,
+                )
+
+            with span(metrics, "validate"):
+                items, usage_stats = _finalize_response(response, model, max_items)
+            policy.record_success()
+            if rate_limiter is not None:
+                rate_limiter.reconcile(estimated, usage_stats.total_tokens)
+            if cache is not None:
+                _store_response(cache, cache_key, items, usage_stats)
+            return items, usage_stats
 
-    raise LLMError(f"OpenAI API error after retries: {last_exc}") from last_exc
+        except (LLMError, ValidationError):
+            raise
+        except Exception as e:  # network/5xx/rate limits => retry with backoff
+            delay = _next_retry_delay(policy, schedule, e, "OpenAI API error")
+            with span(metrics, "retry_wait"):
+                await asyncio.sleep(delay)
 
 
 def call_openai_streaming(
@@ -584,90 +1046,90 @@ def call_openai_streaming(
     user_prompt: str,
     max_items: int,
     show_progress: bool = True,
-    leaf_name: str = ""
+    leaf_name: str = "",
+    *,
+    on_progress: Optional[Callable[[List[Dict[str, str]]], None]] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    cache: Optional[ResponseCache] = None,
+    prompt_cache_key: Optional[str] = None,
+    metrics: Optional[RunMetrics] = None,
 ) -> Tuple[List[Dict[str, str]], UsageStats]:
     """
     Call OpenAI Responses API with streaming support and live capability display.
 
     Uses Responses API with structured outputs and shows capabilities as they're generated.
+    With ``on_progress`` the partial capabilities are reported to the callback (e.g. a
+    shared ``StreamingDashboard``) instead of a Live display owned by this call.
     Returns tuple of (items, usage_stats).
     """
-    model = _default_model()
+    model = default_model()
     gen_kwargs = _common_generation_kwargs()
+    if prompt_cache_key:
+        gen_kwargs["prompt_cache_key"] = prompt_cache_key
+    estimated = _estimated_request_tokens(system_message, user_prompt, gen_kwargs)
+
+    cache_key = None
+    if cache is not None:
+        cache_key = _response_cache_key(model, system_message, user_prompt, gen_kwargs, max_items)
+        cached = _cached_response(cache, cache_key, model)
+        if cached is not None:
+            return cached
     console = Console()
 
-    last_exc: Optional[Exception] = None
-    for delay in _backoff_iter():
+    policy = retry_policy or RetryPolicy()
+    schedule = policy.schedule()
+    while True:
         try:
-            with client.responses.stream(
+            policy.before_attempt()
+            if rate_limiter is not None:
+                with span(metrics, "rate_limit_wait"):
+                    rate_limiter.acquire(estimated)
+            with api_call(metrics), client.responses.stream(
                 model=model,
                 instructions=system_message,
-                tools=[{"type": "web_search_preview"}],
+                tools=_TOOLS,
                 input=user_prompt,
                 text_format=CapabilityResponse,
                 **gen_kwargs,
             ) as stream:
-
-                partial_text: str = ""
-                last_snapshot: List[Dict[str, str]] = []
-
-                if show_progress:
+                if on_progress is not None:
+                    _consume_stream(stream, on_progress)
+                elif show_progress:
                     with Live(
                         _progress_panel([], leaf_name),
                         console=console,
                         refresh_per_second=6,
                         transient=True,
                     ) as live:
-                        for event in stream:
-                            etype = getattr(event, "type", "")
-                            # Explicit refusals
-                            if etype == "response.refusal.delta":
-                                delta = getattr(event, "delta", "") or "Request refused by model."
-                                raise LLMError(f"Model refused: {delta}")
-                            # Text deltas (we parse incrementally for preview)
-                            if etype == "response.output_text.delta":
-                                partial_text += getattr(event, "delta", "")
-                                snapshot = _extract_capabilities_incremental(partial_text)
-                                # Update only when something changes to reduce flicker
-                                if snapshot and snapshot != last_snapshot:
-                                    live.update(_progress_panel(snapshot, leaf_name))
-                                    last_snapshot = snapshot
-                            # Hard errors mid-stream
-                            if etype == "response.error":
-                                err = getattr(event, "error", "unknown streaming error")
-                                raise LLMError(f"Stream error: {err}")
-                            # No action needed on created/finished unless we want timestamps
-                            # etype == "response.completed" handled after loop
-
-                        # After stream iteration completes, we’ll still call get_final_response()
-                        # to obtain structured output + usage.
+                        _consume_stream(stream, lambda snapshot: live.update(_progress_panel(snapshot, leaf_name)))
                 else:
                     # Consume events without UI (still surface refusal/errors)
-                    for event in stream:
-                        etype = getattr(event, "type", "")
-                        if etype == "response.refusal.delta":
-                            raise LLMError(f"Model refused: {getattr(event, 'delta', '')}")
-                        if etype == "response.error":
-                            raise LLMError(f"Stream error: {getattr(event, 'error', '')}")
+                    _consume_stream(stream, None)
 
                 # Finalize + parse
                 final = stream.get_final_response()
-                if not final:
-                    raise LLMError("No final response received from streaming.")
+            if not final:
+                raise LLMError("No final response received from streaming.")
 
+            with span(metrics, "validate"):
                 parsed = _ensure_parsed_output(final)
-                items = _validate_items(parsed, max_items)
+                items = validate_items(parsed, max_items)
                 usage_stats = _extract_usage(final)
                 usage_stats.model_name = model
-                return items, usage_stats
+            policy.record_success()
+            if rate_limiter is not None:
+                rate_limiter.reconcile(estimated, usage_stats.total_tokens)
+            if cache is not None:
+                _store_response(cache, cache_key, items, usage_stats)
+            return items, usage_stats
 
         except (LLMError, ValidationError):
             raise
         except Exception as e:
-            last_exc = e
-            time.sleep(delay)
-
-    raise LLMError(f"Streaming error after retries: {last_exc}") from last_exc
+            delay = _next_retry_delay(policy, schedule, e, "Streaming error")
+            with span(metrics, "retry_wait"):
+                time.sleep(delay)
 
 
 # =========================
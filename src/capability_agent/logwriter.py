@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class LogSettings:
+    """How the OpenAI request/response log is written.
+
+    The file rotates when it reaches ``max_bytes`` or, with ``rotate_seconds``, when it
+    gets that old; rotated files are gzip-compressed and ``backup_count`` are kept.
+    Bodies are capped at ``body_limit`` bytes. Setting ``only_slow_seconds`` and/or
+    ``only_failed`` samples the log down to slow or failed exchanges. At most
+    ``queue_size`` entries wait for the background writer; beyond that (a slow or stalled
+    disk) entries are dropped and counted rather than held in memory or blocking calls.
+    """
+
+    max_bytes: int = 100 * 1024 * 1024
+    backup_count: int = 5
+    rotate_seconds: Optional[float] = None
+    body_limit: int = 64 * 1024
+    only_slow_seconds: Optional[float] = None
+    only_failed: bool = False
+    queue_size: int = 10_000
+
+    @property
+    def sampling(self) -> bool:
+        return self.only_slow_seconds is not None or self.only_failed
+
+    def selects(self, status_code: Optional[int], duration: float) -> bool:
+        """Whether an exchange is logged (``status_code`` is None when the request raised)."""
+        if not self.sampling:
+            return True
+        if self.only_failed and (status_code is None or status_code >= 400):
+            return True
+        return self.only_slow_seconds is not None and duration >= self.only_slow_seconds
+
+
+class ExchangeLog:
+    """A request or response log entry, rendered to JSON only when a handler formats it.
+
+    The transport builds these on the request path; with the background writer the
+    JSON encoding (and body decoding) happens on the writer thread instead.
+    """
+
+    __slots__ = ("data", "body", "truncated")
+
+    def __init__(self, data: Dict[str, Any], body: Optional[bytes] = None, truncated: bool = False):
+        self.data = data
+        self.body = body
+        self.truncated = truncated
+
+    def __str__(self) -> str:
+        data = self.data
+        if self.body:
+            data = dict(data)
+            if self.truncated:
+                data["body"] = self.body.decode("utf-8", errors="replace")
+                data["body_truncated"] = True
+            else:
+                try:
+                    data["body"] = json.loads(self.body.decode("utf-8"))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    data["body"] = self.body.decode("utf-8", errors="replace")
+        return json.dumps(data, ensure_ascii=False)
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotate on size or age, gzip-compressing rotated files (``name.1.gz``, ...)."""
+
+    def __init__(self, filename: Path, settings: LogSettings):
+        super().__init__(
+            filename,
+            maxBytes=settings.max_bytes,
+            backupCount=max(1, settings.backup_count),
+            encoding="utf-8",
+            delay=True,
+        )
+        self.rotate_seconds = settings.rotate_seconds
+        self._opened_at = time.time()
+        self.namer = lambda name: name + ".gz"
+        self.rotator = _gzip_rotator
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.rotate_seconds and time.time() - self._opened_at >= self.rotate_seconds:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self._opened_at = time.time()
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records as-is; formatting happens on the listener thread.
+
+    When the bounded queue is full the record is dropped and counted in ``dropped``.
+    """
+
+    def __init__(self, records: queue.Queue):
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Wait for room instead of failing when the queue is full at shutdown
+        self.queue.put(self._sentinel)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[_DeferredQueueHandler] = None
+_atexit_registered = False
+
+
+def start_background_writer(logger: logging.Logger, log_file: Path, settings: LogSettings) -> None:
+    """Route ``logger`` through a queue to a rotating file written by a background thread."""
+    global _listener, _queue_handler, _atexit_registered
+    stop_background_writer()
+
+    file_handler = CompressingRotatingFileHandler(log_file, settings)
+    file_handler.setFormatter(logging.Formatter("%(message)s"))
+    records: queue.Queue = queue.Queue(maxsize=max(1, settings.queue_size))
+    _queue_handler = _DeferredQueueHandler(records)
+    logger.addHandler(_queue_handler)
+    _listener = _QueueListener(records, file_handler)
+    _listener.start()
+    if not _atexit_registered:
+        atexit.register(stop_background_writer)
+        _atexit_registered = True
+
+
+def stop_background_writer() -> None:
+    """Flush queued records and stop the writer thread (safe to call repeatedly)."""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    dropped = _queue_handler.dropped if _queue_handler is not None else 0
+    _queue_handler = None
+    listener.stop()
+    for handler in listener.handlers:
+        if dropped:
+            # Entries discarded while the queue was full are accounted for in the log itself
+            handler.handle(logging.makeLogRecord({"msg": json.dumps({"type": "dropped", "entries": dropped})}))
+        handler.close()
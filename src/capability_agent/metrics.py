@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+
+# Leaf being processed by the current thread / asyncio task; attached to its trace spans
+_current_leaf: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_leaf", default=None)
+
+_PREFIX = "capability_agent"
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class RunMetrics:
+    """Per-stage timings and run gauges for one augmentation run.
+
+    Stages are timed with ``span``; each span is kept for the p50/p95/max summary and,
+    with ``trace_path``, appended to a JSONL trace (``{"stage", "leaf", "start",
+    "seconds"}``). ``leaf`` scopes spans to a leaf across threads and asyncio tasks.
+    ``export_every`` rewrites a Prometheus textfile (or OpenMetrics) periodically so
+    dashboards can follow leaves/sec, in-flight calls and lock wait time during the run.
+    """
+
+    def __init__(self, trace_path: Optional[Path] = None):
+        self._lock = threading.Lock()
+        self.durations: Dict[str, List[float]] = {}
+        self.started = time.monotonic()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.leaves_succeeded = 0
+        self.leaves_failed = 0
+        self._trace: Optional[TextIO] = trace_path.open("w", encoding="utf-8") if trace_path else None
+        self._export_stop = threading.Event()
+        self._exporter: Optional[threading.Thread] = None
+        self._export_target: Optional[Tuple[Path, bool]] = None
+
+    # ---- recording ----
+
+    @contextlib.contextmanager
+    def leaf(self, leaf_id: str) -> Iterator[None]:
+        """Attribute spans recorded inside the block to ``leaf_id``."""
+        token = _current_leaf.set(leaf_id)
+        try:
+            yield
+        finally:
+            _current_leaf.reset(token)
+
+    @contextlib.contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        wall = time.time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, wall)
+
+    def record(self, stage: str, seconds: float, start: Optional[float] = None) -> None:
+        with self._lock:
+            self.durations.setdefault(stage, []).append(seconds)
+            if self._trace is not None:
+                entry = {
+                    "stage": stage,
+                    "leaf": _current_leaf.get(),
+                    "start": round(start if start is not None else time.time() - seconds, 6),
+                    "seconds": round(seconds, 6),
+                }
+                self._trace.write(json.dumps(entry) + "\n")
+
+    @contextlib.contextmanager
+    def api_call(self) -> Iterator[None]:
+        """Time an API request as the ``api`` stage and count it as in flight meanwhile."""
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            with self.span("api"):
+                yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def leaf_finished(self, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self.leaves_succeeded += 1
+            else:
+                self.leaves_failed += 1
+
+    # ---- reporting ----
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def leaves_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.leaves_succeeded / elapsed if elapsed > 0 else 0.0
+
+    def total_seconds(self, stage: str) -> float:
+        with self._lock:
+            return sum(self.durations.get(stage, ()))
+
+    def summary(self) -> List[Tuple[str, int, float, float, float, float]]:
+        """``(stage, count, p50, p95, max, total)`` per stage, in first-seen order."""
+        with self._lock:
+            snapshot = {stage: sorted(values) for stage, values in self.durations.items()}
+        return [
+            (stage, len(v), _percentile(v, 0.5), _percentile(v, 0.95), v[-1], sum(v))
+            for stage, v in snapshot.items()
+            if v
+        ]
+
+    def render_metrics(self, openmetrics: bool = False) -> str:
+        """Prometheus text exposition (or OpenMetrics, with ``# EOF``) of the current state."""
+        lines: List[str] = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[Tuple[str, str, float]]) -> None:
+            lines.append(f"# HELP {_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {_PREFIX}_{name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{_PREFIX}_{name}{suffix}{labels} {value:.6g}")
+
+        stage_samples: List[Tuple[str, str, float]] = []
+        for stage, count, p50, p95, _, total in self.summary():
+            stage_samples += [
+                ("", f'{{stage="{stage}",quantile="0.5"}}', p50),
+                ("", f'{{stage="{stage}",quantile="0.95"}}', p95),
+                ("_sum", f'{{stage="{stage}"}}', total),
+                ("_count", f'{{stage="{stage}"}}', count),
+            ]
+        metric("stage_seconds", "summary", "Time spent per leaf in each stage.", stage_samples)
+        with self._lock:
+            succeeded, failed = self.leaves_succeeded, self.leaves_failed
+            in_flight, max_in_flight = self.in_flight, self.max_in_flight
+        # OpenMetrics names counters without the _total suffix in metadata
+        leaves = "leaves" if openmetrics else "leaves_total"
+        metric(leaves, "counter", "Leaves processed, by outcome.", [
+            ("_total" if openmetrics else "", '{outcome="success"}', succeeded),
+            ("_total" if openmetrics else "", '{outcome="failure"}', failed),
+        ])
+        metric("leaves_per_second", "gauge", "Successful leaves per second since the run started.", [("", "", self.leaves_per_second)])
+        metric("in_flight_calls", "gauge", "API calls currently in flight.", [("", "", in_flight)])
+        metric("in_flight_calls_max", "gauge", "Most API calls in flight at once.", [("", "", max_in_flight)])
+        metric("lock_wait_seconds", "gauge", "Total time workers waited for the checkpoint lock.", [("", "", self.total_seconds("lock_wait"))])
+        metric("run_seconds", "gauge", "Seconds since the run started.", [("", "", self.elapsed)])
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, path: Path, openmetrics: bool = False) -> None:
+        """Atomically (re)write the metrics file, as the node_exporter textfile collector expects."""
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(self.render_metrics(openmetrics), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def export_every(self, path: Path, interval: float, openmetrics: bool = False) -> None:
+        """Rewrite ``path`` every ``interval`` seconds until ``close``, which writes it once more."""
+        self._export_target = (path, openmetrics)
+
+        def loop() -> None:
+            while not self._export_stop.wait(interval):
+                self.write_metrics(path, openmetrics)
+
+        self._exporter = threading.Thread(target=loop, name="metrics-export", daemon=True)
+        self._exporter.start()
+
+    def close(self) -> None:
+        """Stop the exporter (writing the final metrics) and close the trace file."""
+        self._export_stop.set()
+        if self._exporter is not None:
+            self._exporter.join()
+            self._exporter = None
+        if self._export_target is not None:
+            self.write_metrics(*self._export_target)
+        with self._lock:
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
+
+
+def leaf(metrics: Optional[RunMetrics], leaf_id: str) -> contextlib.AbstractContextManager:
+    """``metrics.leaf(leaf_id)``, or a no-op when metrics are not collected."""
+    return metrics.leaf(leaf_id) if metrics is not None else contextlib.nullcontext()
+
+
+def span(metrics: Optional[RunMetrics], stage: str) -> contextlib.AbstractContextManager:
+    """``metrics.span(stage)``, or a no-op when metrics are not collected."""
+    return metrics.span(stage) if metrics is not None else contextlib.nullcontext()
+
+
+def api_call(metrics: Optional[RunMetrics]) -> contextlib.AbstractContextManager:
+    """``metrics.api_call()``, or a no-op when metrics are not collected."""
+    return metrics.api_call() if metrics is not None else contextlib.nullcontext()
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+import threading
 import uuid
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from pydantic import BaseModel, RootModel, ValidationError, field_validator
 
@@ -27,7 +28,168 @@ class Capability(BaseModel):
         return v
 
 
+# Set on generated nodes that a --depth run still has to expand: their level below the
+# run's input leaves (which are level 1), so a --restart run stops at the same depth
+PENDING_LEVEL = "pending_level"
+
+
+def needs_generation(cap: Capability) -> bool:
+    """True if a leaf still needs generation (capability is 0, missing, or -1 for error retry)."""
+    return getattr(cap, "capability", 0) <= 0
+
+
+class CapabilityIndex:
+    """Incrementally maintained lookups over a flat capability list.
+
+    Built once per run and updated in place as children are added (``add``) and leaves
+    change state (``replace``), so lookups by id, children, parent and pending-leaf status
+    are O(1) instead of rebuilding dicts from ``model.root`` on every call.
+
+    The index keeps a reference to the list it was built from: ``add`` appends to it and
+    ``replace`` swaps the node in place, so ``CapabilityList.root`` stays in sync.
+    """
+
+    def __init__(self, nodes: List[Capability]):
+        self._nodes = nodes
+        self._position: Dict[str, int] = {}
+        self._children: Dict[str, List[str]] = {}
+        # Ordered set (dict keys) of leaf ids that still need generation
+        self._pending: Dict[str, None] = {}
+        # id -> ancestor ids from the root down to the parent, filled lazily. Parents never
+        # change in place, so entries stay valid as nodes are added.
+        self._paths: Dict[str, Tuple[str, ...]] = {}
+        self._lock = threading.RLock()
+        # Bumped when nodes are added or a node's name/description changes, so derived
+        # caches (e.g. rendered context) can tell when they are stale. State-only
+        # replacements (``capability``/``error``) leave it untouched.
+        self.version = 0
+        for i, c in enumerate(nodes):
+            self._register(c, i)
+
+    def _register(self, cap: Capability, position: int) -> None:
+        if cap.id in self._position:
+            raise ValueError(f"Duplicate id detected: {cap.id}")
+        self._position[cap.id] = position
+        if cap.parent is not None:
+            self._children.setdefault(cap.parent, []).append(cap.id)
+            self._pending.pop(cap.parent, None)
+        if cap.id not in self._children and needs_generation(cap):
+            self._pending[cap.id] = None
+
+    # ---- mutation ----
+
+    def add(self, cap: Capability) -> None:
+        """Append a new node; its parent (if any) stops being a leaf."""
+        with self._lock:
+            self._register(cap, len(self._nodes))
+            self._nodes.append(cap)
+            self.version += 1
+
+    def replace(self, cap: Capability) -> None:
+        """Swap in an updated copy of an existing node (e.g. a changed ``capability`` state)."""
+        with self._lock:
+            i = self._position.get(cap.id)
+            if i is None:
+                raise KeyError(f"Capability with id '{cap.id}' not found")
+            old = self._nodes[i]
+            if old.parent != cap.parent:
+                raise ValueError(f"Cannot change parent of capability '{cap.id}' in place")
+            self._nodes[i] = cap
+            if cap.id not in self._children and needs_generation(cap):
+                self._pending[cap.id] = None
+            else:
+                self._pending.pop(cap.id, None)
+            if (old.name, old.description) != (cap.name, cap.description):
+                self.version += 1
+
+    # ---- lookups ----
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, cap_id: object) -> bool:
+        return cap_id in self._position
+
+    def __iter__(self) -> Iterator[Capability]:
+        return iter(self._nodes)
+
+    def get(self, cap_id: Optional[str]) -> Optional[Capability]:
+        i = self._position.get(cap_id) if cap_id is not None else None
+        return self._nodes[i] if i is not None else None
+
+    def __getitem__(self, cap_id: str) -> Capability:
+        return self._nodes[self._position[cap_id]]
+
+    def parent(self, cap_id: str) -> Optional[Capability]:
+        return self.get(self[cap_id].parent)
+
+    def ancestor_ids(self, cap_id: str) -> Tuple[str, ...]:
+        """Ids from the root down to the node's parent (empty for roots).
+
+        Paths are memoized per node and built from the parent's path, so a node only walks
+        up to its nearest already-known ancestor, and siblings share their parent's work.
+        """
+        path = self._paths.get(cap_id)
+        if path is not None:
+            return path
+        with self._lock:
+            # Walk up to the first node with a known path (or a root)
+            chain = []
+            current: Optional[str] = cap_id
+            while current is not None and current not in self._paths:
+                chain.append(current)
+                current = self[current].parent
+            path = self._paths[current] + (current,) if current is not None else ()
+            # ...then fill in the paths on the way back down
+            for node_id in reversed(chain):
+                self._paths[node_id] = path
+                path = path + (node_id,)
+            return self._paths[cap_id]
+
+    def ancestors(self, cap_id: str) -> List[Capability]:
+        """Ancestor nodes from the root down to the node's parent."""
+        return [self[a] for a in self.ancestor_ids(cap_id)]
+
+    def depth(self, cap_id: str) -> int:
+        """Number of ancestors (0 for roots)."""
+        return len(self.ancestor_ids(cap_id))
+
+    def children(self, cap_id: str) -> List[Capability]:
+        return [self._nodes[self._position[c]] for c in self._children.get(cap_id, [])]
+
+    def siblings(self, cap_id: str) -> List[Capability]:
+        """Other children of the node's parent (empty for roots)."""
+        parent_id = self[cap_id].parent
+        if parent_id is None:
+            return []
+        return [c for c in self.children(parent_id) if c.id != cap_id]
+
+    def is_leaf(self, cap_id: str) -> bool:
+        return cap_id not in self._children
+
+    def is_pending(self, cap_id: str) -> bool:
+        return cap_id in self._pending
+
+    def roots(self) -> List[Capability]:
+        return [c for c in self._nodes if c.parent is None]
+
+    def leaves(self) -> List[Capability]:
+        return [c for c in self._nodes if c.id not in self._children]
+
+    def pending_leaves(self) -> List[Capability]:
+        """Leaves that need generation, in model order."""
+        ids = sorted(self._pending, key=self._position.__getitem__)
+        return [self._nodes[self._position[i]] for i in ids]
+
+    def by_id(self) -> Dict[str, Capability]:
+        return {c.id: c for c in self._nodes}
+
+
 class CapabilityList(RootModel[List[Capability]]):
+    def index(self) -> CapabilityIndex:
+        """Build a ``CapabilityIndex`` sharing (and keeping in sync) this list's nodes."""
+        return CapabilityIndex(self.root)
+
     def by_id(self) -> Dict[str, Capability]:
         return {c.id: c for c in self.root}
 
@@ -42,44 +204,33 @@ class CapabilityList(RootModel[List[Capability]]):
         return [c for c in self.root if c.parent is None]
 
     def leaves(self) -> List[Capability]:
-        children = self.children_map()
-        return [c for c in self.root if len(children.get(c.id, [])) == 0]
+        return self.index().leaves()
 
     def leaves_for_generation(self) -> List[Capability]:
         """Return leaf nodes that need generation (capability attribute is 0 or missing)."""
-        children = self.children_map()
-        leaves = [c for c in self.root if len(children.get(c.id, [])) == 0]
-        
-        # Filter leaves that need generation (capability is 0, missing, or -1 for error retry)
-        return [
-            leaf for leaf in leaves 
-            if getattr(leaf, 'capability', 0) <= 0  # Include 0 (unprocessed) and -1 (error)
-        ]
+        return self.index().pending_leaves()
 
     def extract_subtree(self, root_id: str) -> "CapabilityList":
         """Extract a subtree starting from the given root capability ID."""
-        by_id = self.by_id()
-        children = self.children_map()
-        
-        if root_id not in by_id:
+        index = self.index()
+
+        if root_id not in index:
             raise ValueError(f"Capability with id '{root_id}' not found")
-        
-        # Collect all descendants recursively
+
+        # Collect all descendants (iteratively, to cope with deep trees)
         result = []
-        
-        def collect_descendants(node_id: str) -> None:
-            if node_id in by_id:
-                result.append(by_id[node_id])
-                for child in children.get(node_id, []):
-                    collect_descendants(child.id)
-        
-        collect_descendants(root_id)
-        
+        stack = [root_id]
+        while stack:
+            node_id = stack.pop()
+            result.append(index[node_id])
+            stack.extend(reversed([c.id for c in index.children(node_id)]))
+
         # Set the root node's parent to null since it's now the root of the subtree
         if result:
             result[0] = result[0].model_copy(update={"parent": None})
         
-        return CapabilityList.model_validate(result)
+        # Nodes come from an already validated list
+        return CapabilityList.model_construct(result)
 
     @field_validator("root")
     @classmethod
@@ -92,21 +243,40 @@ class CapabilityList(RootModel[List[Capability]]):
         return v
 
 
-def validate_model(data: Any) -> CapabilityList:
+def _trusted_node(data: Any, position: int) -> Capability:
+    """Build a node with structural checks only (no Pydantic validation, no UUID parsing)."""
+    if not isinstance(data, dict):
+        raise ValueError(f"Node {position} is not a JSON object")
+    for key in ("id", "name", "description"):
+        if not isinstance(data.get(key), str):
+            raise ValueError(f"Node {position} is missing a string '{key}'")
+    parent = data.get("parent")
+    if parent is not None and not isinstance(parent, str):
+        raise ValueError(f"Node {position} has a non-string parent: {parent!r}")
+    return Capability.model_construct(**data)
+
+
+def validate_model(data: Iterable[Any], trust_input: bool = False) -> CapabilityList:
     """Parse and validate a raw JSON array of capabilities.
 
     - Ensures UUID4 ids (via field validator)
     - Ensures unique ids (via root validator)
     - Ensures parent references (if present) exist in the set of ids
+
+    With ``trust_input`` nodes only get structural checks and are built with
+    ``model_construct``; ids are not parsed as UUIDs. Uniqueness and parent references
+    are still checked, by the index.
     """
-    try:
-        lst = CapabilityList.model_validate(data)
-    except ValidationError as e:  # re-raise for callers to present nicely
-        raise e
+    if trust_input:
+        lst = CapabilityList.model_construct([_trusted_node(d, i) for i, d in enumerate(data)])
+    else:
+        try:
+            lst = CapabilityList.model_validate(data)
+        except ValidationError as e:  # re-raise for callers to present nicely
+            raise e
 
-    ids = {c.id for c in lst.root}
+    index = lst.index()
     for c in lst.root:
-        if c.parent is not None and c.parent not in ids:
+        if c.parent is not None and c.parent not in index:
             raise ValueError(f"Node '{c.name}' has missing parent id: {c.parent}")
     return lst
-
@@ -1,16 +1,22 @@
 from __future__ import annotations
 
 import json
+import threading
+import time
+from collections import deque
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
 
-from jinja2 import Environment, FileSystemLoader, StrictUndefined
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, StrictUndefined
 
 from .io_utils import ContextFormat, ContextOptions
-from .models import Capability, CapabilityList
+from .models import Capability, CapabilityIndex, CapabilityList
+from .tokens import TokenBudget, TokenCounter
 
 
-def serialize_capability_minimal(cap: Capability, by_id: Dict[str, Capability]) -> Dict[str, Any]:
+def serialize_capability_minimal(
+    cap: Capability, by_id: Union[CapabilityIndex, Dict[str, Capability]]
+) -> Dict[str, Any]:
     """Serialize capability with only essential fields: name, description, parent name."""
     result = {
         "name": cap.name,
@@ -21,6 +27,20 @@ def serialize_capability_minimal(cap: Capability, by_id: Dict[str, Capability])
     return result
 
 
+def summarize_capability(minimal: Dict[str, Any], summary_chars: int = 0) -> Dict[str, Any]:
+    """Outline form of a minimal capability: the description cut to ``summary_chars`` (0 drops it)."""
+    result = {"name": minimal["name"]}
+    if summary_chars > 0:
+        description = " ".join(minimal["description"].split())
+        if len(description) > summary_chars:
+            cut = description[:summary_chars]
+            description = (cut.rsplit(" ", 1)[0] if " " in cut else cut) + "…"
+        result["description"] = description
+    if "parent" in minimal:
+        result["parent"] = minimal["parent"]
+    return result
+
+
 def format_capabilities_as_json(capabilities: List[Dict[str, Any]]) -> str:
     """Format capabilities as clean JSON."""
     return json.dumps(capabilities, ensure_ascii=False, indent=2)
@@ -34,7 +54,8 @@ def format_capabilities_as_markdown(capabilities: List[Dict[str, Any]]) -> str:
     lines = []
     for cap in capabilities:
         lines.append(f"### {cap['name']}")
-        lines.append(f"{cap['description']}")
+        if "description" in cap:
+            lines.append(f"{cap['description']}")
         if "parent" in cap:
             lines.append(f"**Parent:** {cap['parent']}")
         lines.append("")  # Empty line between capabilities
@@ -51,7 +72,8 @@ def format_capabilities_as_xml(capabilities: List[Dict[str, Any]]) -> str:
     for cap in capabilities:
         lines.append("  <capability>")
         lines.append(f"    <name>{cap['name']}</name>")
-        lines.append(f"    <description>{cap['description']}</description>")
+        if "description" in cap:
+            lines.append(f"    <description>{cap['description']}</description>")
         if "parent" in cap:
             lines.append(f"    <parent>{cap['parent']}</parent>")
         lines.append("  </capability>")
@@ -91,66 +113,441 @@ def format_capabilities_as_tree(capabilities: List[Dict[str, Any]]) -> str:
     return "\n".join(tree_lines)
 
 
-def build_prompt_context(model: CapabilityList, node: Capability, ctx: ContextOptions, format: ContextFormat = ContextFormat.MARKDOWN) -> Dict[str, Any]:
-    by_id = {c.id: c for c in model.root}
-    children: Dict[str, List[Capability]] = {}
-    for c in model.root:
-        if c.parent is not None:
-            children.setdefault(c.parent, []).append(c)
+_FORMAT_FUNCS = {
+    ContextFormat.JSON: format_capabilities_as_json,
+    ContextFormat.MARKDOWN: format_capabilities_as_markdown,
+    ContextFormat.XML: format_capabilities_as_xml,
+    ContextFormat.TREE: format_capabilities_as_tree,
+}
+
+
+def _json_fragment(cap: Dict[str, Any]) -> str:
+    return "  " + json.dumps(cap, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+
+
+def _join_json(fragments: List[str]) -> str:
+    return "[\n" + ",\n".join(fragments) + "\n]" if fragments else "[]"
+
+
+def _markdown_fragment(cap: Dict[str, Any]) -> str:
+    lines = [f"### {cap['name']}"]
+    if "description" in cap:
+        lines.append(f"{cap['description']}")
+    if "parent" in cap:
+        lines.append(f"**Parent:** {cap['parent']}")
+    return "\n".join(lines)
+
+
+def _join_markdown(fragments: List[str]) -> str:
+    return "\n\n".join(fragments).rstrip()
+
+
+def _xml_fragment(cap: Dict[str, Any]) -> str:
+    lines = ["  <capability>", f"    <name>{cap['name']}</name>"]
+    if "description" in cap:
+        lines.append(f"    <description>{cap['description']}</description>")
+    if "parent" in cap:
+        lines.append(f"    <parent>{cap['parent']}</parent>")
+    lines.append("  </capability>")
+    return "\n".join(lines)
+
+
+def _join_xml(fragments: List[str]) -> str:
+    if not fragments:
+        return "<capabilities></capabilities>"
+    return "<capabilities>\n" + "\n".join(fragments) + "\n</capabilities>"
+
+
+# Formats whose output is a plain concatenation of per-capability fragments, so a section
+# can be assembled from cached fragments. TREE needs the whole set and is formatted directly.
+_FRAGMENT_FORMATS = {
+    ContextFormat.JSON: (_json_fragment, _join_json),
+    ContextFormat.MARKDOWN: (_markdown_fragment, _join_markdown),
+    ContextFormat.XML: (_xml_fragment, _join_xml),
+}
+
+
+class ContextCache:
+    """Pre-rendered prompt context sections shared by every leaf of a run.
+
+    The formatted full tree is rendered once per format and the sibling list once per
+    parent; per-capability serializations are memoized. Everything is keyed on
+    ``CapabilityIndex.version`` and rebuilt only when the tree actually changes.
+    Safe to share between worker threads.
+    """
+
+    def __init__(self, index: CapabilityIndex, counter: Optional[TokenCounter] = None):
+        self.index = index
+        self._counter = counter
+        self._lock = threading.Lock()
+        # id -> (node, parent node, minimal dict); entries are reused while both objects are current
+        self._minimal: Dict[str, Tuple[Capability, Optional[Capability], Dict[str, Any]]] = {}
+        self._fragments: Dict[Tuple[str, ContextFormat], Tuple[Dict[str, Any], str]] = {}
+        self._full_tree: Dict[Tuple[ContextFormat, bool], Tuple[int, str]] = {}
+        self._full_tree_nodes: Tuple[int, List[Capability]] = (-1, [])
+        self._siblings: Dict[Tuple[str, ContextFormat], Tuple[int, List[Tuple[str, str]]]] = {}
+        self._outlines: Dict[Tuple[str, ContextFormat, int], Tuple[Dict[str, Any], Dict[str, Any], str]] = {}
+
+    @property
+    def counter(self) -> TokenCounter:
+        """Token counter used to size the context window (created on first use)."""
+        if self._counter is None:
+            self._counter = TokenCounter()
+        return self._counter
+
+    def minimal(self, cap: Capability) -> Dict[str, Any]:
+        parent = self.index.get(cap.parent)
+        entry = self._minimal.get(cap.id)
+        if entry is None or entry[0] is not cap or entry[1] is not parent:
+            entry = (cap, parent, serialize_capability_minimal(cap, self.index))
+            self._minimal[cap.id] = entry
+        return entry[2]
+
+    def _fragment(self, cap: Capability, format: ContextFormat) -> str:
+        minimal = self.minimal(cap)
+        key = (cap.id, format)
+        entry = self._fragments.get(key)
+        if entry is None or entry[0] is not minimal:
+            entry = (minimal, _FRAGMENT_FORMATS[format][0](minimal))
+            self._fragments[key] = entry
+        return entry[1]
+
+    def _outline(self, cap: Capability, format: ContextFormat, summary_chars: int) -> Tuple[Dict[str, Any], str]:
+        minimal = self.minimal(cap)
+        key = (cap.id, format, summary_chars)
+        entry = self._outlines.get(key)
+        if entry is None or entry[0] is not minimal:
+            outline = summarize_capability(minimal, summary_chars)
+            fragment = _FRAGMENT_FORMATS[format][0](outline) if format in _FRAGMENT_FORMATS else ""
+            entry = (minimal, outline, fragment)
+            self._outlines[key] = entry
+        return entry[1], entry[2]
+
+    def format(self, caps: Sequence[Capability], format: ContextFormat) -> str:
+        """Format capabilities exactly as the ``format_capabilities_as_*`` functions would."""
+        if format in _FRAGMENT_FORMATS:
+            return _FRAGMENT_FORMATS[format][1]([self._fragment(c, format) for c in caps])
+        return _FORMAT_FUNCS[format]([self.minimal(c) for c in caps])
+
+    def full_tree_nodes(self) -> List[Capability]:
+        with self._lock:
+            version, nodes = self._full_tree_nodes
+            if version != self.index.version:
+                nodes = list(self.index)
+                self._full_tree_nodes = (self.index.version, nodes)
+            return nodes
+
+    def _format_outlines(self, caps: Sequence[Capability], format: ContextFormat) -> str:
+        if format in _FRAGMENT_FORMATS:
+            return _FRAGMENT_FORMATS[format][1]([self._outline(c, format, 0)[1] for c in caps])
+        return _FORMAT_FUNCS[format]([self._outline(c, format, 0)[0] for c in caps])
+
+    def full_tree(self, format: ContextFormat, names_only: bool = False) -> str:
+        """The whole tree in ``format``; ``names_only`` keeps just names and parents."""
+        nodes = self.full_tree_nodes()
+        with self._lock:
+            key = (format, names_only)
+            entry = self._full_tree.get(key)
+            if entry is None or entry[0] != self.index.version:
+                render = self._format_outlines if names_only else self.format
+                entry = (self.index.version, render(nodes, format))
+                self._full_tree[key] = entry
+            return entry[1]
+
+    def _window(self, node: Capability, format: ContextFormat, window_tokens: int) -> Set[str]:
+        """Ids of the nodes sent in full detail for ``node``, nearest first within the budget.
+
+        The node and its ancestors are always included; then the rest of the tree is
+        walked breadth-first by tree distance (siblings, then uncles, then cousins, ...)
+        until the next node's detail no longer fits ``window_tokens``.
+        """
+        detail: Set[str] = set()
+        spent = 0
+        for cap in [node, *self.index.ancestors(node.id)]:
+            detail.add(cap.id)
+            spent += self.counter.count_shared(self._fragment(cap, format))
+        queue = deque([node])
+        seen = {node.id}
+        while queue:
+            current = queue.popleft()
+            neighbours = self.index.children(current.id)
+            parent = self.index.get(current.parent)
+            if parent is not None:
+                neighbours.append(parent)
+            for cap in neighbours:
+                if cap.id in seen:
+                    continue
+                seen.add(cap.id)
+                queue.append(cap)
+                if cap.id in detail:
+                    continue
+                spent += self.counter.count_shared(self._fragment(cap, format))
+                if spent > window_tokens:
+                    return detail
+                detail.add(cap.id)
+        return detail
+
+    def windowed_tree(self, node: Capability, format: ContextFormat, window_tokens: int, summary_chars: int = 0) -> str:
+        """The full tree in model order, with full detail only inside ``node``'s window.
+
+        Nodes outside the window keep their name and parent, plus the first
+        ``summary_chars`` characters of their description.
+        """
+        nodes = self.full_tree_nodes()
+        with self._lock:
+            detail = self._window(node, format, window_tokens)
+            if format in _FRAGMENT_FORMATS:
+                fragments = [
+                    self._fragment(c, format) if c.id in detail else self._outline(c, format, summary_chars)[1]
+                    for c in nodes
+                ]
+                return _FRAGMENT_FORMATS[format][1](fragments)
+            return _FORMAT_FUNCS[format]([
+                self.minimal(c) if c.id in detail else self._outline(c, format, summary_chars)[0]
+                for c in nodes
+            ])
+
+    def siblings(self, node: Capability, format: ContextFormat) -> str:
+        if node.parent is None:
+            return self.format([], format)
+        if format not in _FRAGMENT_FORMATS:
+            with self._lock:
+                return self.format(self.index.siblings(node.id), format)
+        with self._lock:
+            key = (node.parent, format)
+            entry = self._siblings.get(key)
+            if entry is None or entry[0] != self.index.version:
+                children = self.index.children(node.parent)
+                entry = (self.index.version, [(c.id, self._fragment(c, format)) for c in children])
+                self._siblings[key] = entry
+        join = _FRAGMENT_FORMATS[format][1]
+        return join([fragment for cap_id, fragment in entry[1] if cap_id != node.id])
 
-    # Format function mapping
-    format_func = {
-        ContextFormat.JSON: format_capabilities_as_json,
-        ContextFormat.MARKDOWN: format_capabilities_as_markdown,
-        ContextFormat.XML: format_capabilities_as_xml,
-        ContextFormat.TREE: format_capabilities_as_tree,
-    }[format]
+    def section(self, caps: Sequence[Capability], format: ContextFormat) -> str:
+        with self._lock:
+            return self.format(caps, format)
+
+    def outline(self, caps: Sequence[Capability], format: ContextFormat) -> str:
+        """Like ``section``, with only the names and parents of ``caps``."""
+        with self._lock:
+            return self._format_outlines(caps, format)
+
+
+def build_prompt_context(
+    model: Union[CapabilityIndex, CapabilityList],
+    node: Capability,
+    ctx: ContextOptions,
+    format: ContextFormat = ContextFormat.MARKDOWN,
+    cache: Optional[ContextCache] = None,
+    budget: Optional[TokenBudget] = None,
+) -> Dict[str, Any]:
+    # Callers doing many leaves should pass a shared ContextCache (and CapabilityIndex)
+    index = model.index() if isinstance(model, CapabilityList) else model
+    if cache is None:
+        cache = ContextCache(index)
 
     # Build context with pre-formatted strings
     context: Dict[str, Any] = {"node": node}
-    
+
     # Add formatted current capability
-    current_capability_minimal = [serialize_capability_minimal(node, by_id)]
-    context["formatted_capability"] = format_func(current_capability_minimal)
-    
+    context["formatted_capability"] = cache.section([node], format)
+
     # Add formatted context sections
     if ctx.parent and node.parent:
-        parent_cap = by_id[node.parent]
-        parent_minimal = [serialize_capability_minimal(parent_cap, by_id)]
-        context["parent"] = parent_cap
-        context["formatted_parent"] = format_func(parent_minimal)
+        # The whole chain, root first; "parent" stays the immediate parent
+        ancestors = index.ancestors(node.id)
+        context["parent"] = ancestors[-1]
+        context["ancestors"] = ancestors
+        context["formatted_parent"] = cache.section(ancestors, format)
     else:
-        context["formatted_parent"] = format_func([])
-        
+        context["ancestors"] = []
+        context["formatted_parent"] = cache.section([], format)
+
     if ctx.siblings:
-        if node.parent and node.parent in children:
-            sibling_caps = [c for c in children[node.parent] if c.id != node.id]
-            siblings_minimal = [serialize_capability_minimal(c, by_id) for c in sibling_caps]
-            context["siblings"] = sibling_caps
-            context["formatted_siblings"] = format_func(siblings_minimal)
-        else:
-            context["siblings"] = []
-            context["formatted_siblings"] = format_func([])
+        context["siblings"] = index.siblings(node.id) if node.parent else []
+        context["formatted_siblings"] = cache.siblings(node, format)
     else:
-        context["formatted_siblings"] = format_func([])
-        
+        context["formatted_siblings"] = cache.section([], format)
+
     if ctx.full_tree:
-        full_tree_minimal = [serialize_capability_minimal(c, by_id) for c in model.root]
-        context["full_tree"] = model.root
-        context["formatted_full_tree"] = format_func(full_tree_minimal)
+        context["full_tree"] = cache.full_tree_nodes()
+        if ctx.window_tokens is not None and format != ContextFormat.TREE:
+            context["formatted_full_tree"] = cache.windowed_tree(
+                node, format, ctx.window_tokens, ctx.window_summary_chars
+            )
+        else:
+            context["formatted_full_tree"] = cache.full_tree(format)
     else:
-        context["formatted_full_tree"] = format_func([])
-        
+        context["formatted_full_tree"] = cache.section([], format)
+
+    if budget is not None:
+        _fit_budget(context, ctx, format, cache, budget)
     return context
 
 
+# Sections whose tokens count against the budget
+SECTION_KEYS = ("formatted_capability", "formatted_parent", "formatted_siblings", "formatted_full_tree")
+
+
+def _fit_budget(
+    context: Dict[str, Any],
+    ctx: ContextOptions,
+    format: ContextFormat,
+    cache: ContextCache,
+    budget: TokenBudget,
+) -> None:
+    """Count tokens per section and shrink the optional sections until they fit the budget.
+
+    The full tree is reduced to names (in the configured format) first, then dropped;
+    siblings likewise; last, the parent chain is cut down to the immediate parent. The counts
+    end up in ``context["token_counts"]`` and the applied steps in ``context["budget_trimmed"]``.
+    """
+
+    def tree_names() -> str:
+        context["formatted_full_tree"] = cache.full_tree(format, names_only=True)
+        shared.add("formatted_full_tree")
+        return "formatted_full_tree"
+
+    def drop_tree() -> str:
+        context["full_tree"] = []
+        context["formatted_full_tree"] = cache.section([], format)
+        return "formatted_full_tree"
+
+    def sibling_names() -> str:
+        context["formatted_siblings"] = cache.outline(context["siblings"], format)
+        return "formatted_siblings"
+
+    def drop_siblings() -> str:
+        context["siblings"] = []
+        context["formatted_siblings"] = cache.section([], format)
+        return "formatted_siblings"
+
+    def nearest_parent() -> str:
+        context["ancestors"] = context["ancestors"][-1:]
+        context["formatted_parent"] = cache.section(context["ancestors"], format)
+        return "formatted_parent"
+
+    steps = []
+    if ctx.full_tree:
+        if format != ContextFormat.TREE:
+            steps.append(("full_tree:names", tree_names))
+        steps.append(("full_tree:dropped", drop_tree))
+    if ctx.siblings and context.get("siblings"):
+        if format != ContextFormat.TREE:
+            steps.append(("siblings:names", sibling_names))
+        steps.append(("siblings:dropped", drop_siblings))
+    if len(context["ancestors"]) > 1:
+        steps.append(("parent:nearest", nearest_parent))
+
+    # Sections repeated across prompts are counted through the counter's cache; siblings
+    # leave out the leaf itself, and a windowed tree is only shared once reduced to names
+    shared = {"formatted_parent"}
+    if ctx.window_tokens is None or format == ContextFormat.TREE:
+        shared.add("formatted_full_tree")
+    counts = {key: budget.count(context[key], key in shared) for key in SECTION_KEYS}
+    trimmed: List[str] = []
+    for label, apply in steps:
+        if sum(counts.values()) <= budget.section_limit:
+            break
+        key = apply()
+        counts[key] = budget.count(context[key], key in shared)
+        trimmed.append(label)
+    context["token_counts"] = counts
+    context["budget_trimmed"] = trimmed
+
+
+# Template blocks used by the cache-aware layout, and the context the shared one may use
+SHARED_BLOCK = "shared"
+LEAF_BLOCK = "leaf"
+SHARED_CONTEXT_KEYS = ("full_tree", "formatted_full_tree", "max_capabilities")
+
+
+class PromptRenderer:
+    """Compile a Jinja2 template once and render it for every leaf of a run.
+
+    Jinja2 templates are safe to render concurrently, so worker threads share one
+    instance. With ``bytecode_cache_dir`` the compiled template is also cached on disk,
+    letting repeated CLI runs skip compilation. Render times are accumulated so slow
+    template variants show up in the run summary.
+
+    With ``cache_layout`` the template must define a ``shared`` and a ``leaf`` block.
+    Prompts are the shared block (rendered from ``SHARED_CONTEXT_KEYS`` only and reused
+    while that context is unchanged) followed by the leaf block, so every prompt of a run
+    starts with the same bytes and provider prompt caching can reuse the prefix.
+    """
+
+    def __init__(
+        self,
+        template_path: Path,
+        bytecode_cache_dir: Optional[Path] = None,
+        cache_layout: bool = False,
+    ):
+        bytecode_cache = None
+        if bytecode_cache_dir is not None:
+            bytecode_cache_dir.mkdir(parents=True, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(str(bytecode_cache_dir))
+        self.env = Environment(
+            loader=FileSystemLoader(template_path.parent),
+            undefined=StrictUndefined,
+            autoescape=False,
+            trim_blocks=True,
+            lstrip_blocks=True,
+            bytecode_cache=bytecode_cache,
+        )
+        self.template = self.env.get_template(template_path.name)
+        self.cache_layout = cache_layout
+        if cache_layout:
+            missing = {SHARED_BLOCK, LEAF_BLOCK} - set(self.template.blocks)
+            if missing:
+                raise ValueError(
+                    f"Template {template_path} must define {{% block {SHARED_BLOCK} %}} and "
+                    f"{{% block {LEAF_BLOCK} %}} for the cache-aware layout (missing: {', '.join(sorted(missing))})"
+                )
+        self._shared: Optional[Tuple[Tuple[Any, ...], str]] = None
+        self._lock = threading.Lock()
+        self.render_count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def _render_block(self, name: str, context: Dict[str, Any]) -> str:
+        return "".join(self.template.blocks[name](self.template.new_context(context)))
+
+    def shared_prefix(self, context: Dict[str, Any]) -> str:
+        """The shared block for a context; rendered again only when its inputs change."""
+        key = tuple(context.get(k) for k in SHARED_CONTEXT_KEYS)
+        with self._lock:
+            cached = self._shared
+        # Comparison is by identity first: ContextCache hands out the same tree string
+        if cached is not None and all(a is b or a == b for a, b in zip(cached[0], key)):
+            return cached[1]
+        shared = {k: context[k] for k in SHARED_CONTEXT_KEYS if k in context}
+        prefix = self._render_block(SHARED_BLOCK, shared)
+        with self._lock:
+            self._shared = (key, prefix)
+        return prefix
+
+    def render_timed(self, context: Dict[str, Any]) -> Tuple[str, float]:
+        """Render the template and return ``(text, seconds spent rendering)``."""
+        start = time.perf_counter()
+        if self.cache_layout:
+            text = self.shared_prefix(context) + self._render_block(LEAF_BLOCK, context)
+        else:
+            text = self.template.render(**context)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.render_count += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+        return text, elapsed
+
+    def render(self, context: Dict[str, Any]) -> str:
+        return self.render_timed(context)[0]
+
+    @property
+    def average_seconds(self) -> float:
+        return self.total_seconds / self.render_count if self.render_count else 0.0
+
+
 def render_prompt(template_path: Path, context: Dict[str, Any]) -> str:
-    env = Environment(
-        loader=FileSystemLoader(template_path.parent),
-        undefined=StrictUndefined,
-        autoescape=False,
-        trim_blocks=True,
-        lstrip_blocks=True,
-    )
-    template = env.get_template(template_path.name)
-    return template.render(**context)
+    """One-off render; use a shared ``PromptRenderer`` when rendering many prompts."""
+    return PromptRenderer(template_path).render(context)
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import asyncio
+import re
+import threading
+import time
+from typing import Mapping, Optional
+
+
+_DURATION_PART_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Parse OpenAI reset durations such as ``"1s"``, ``"6m0s"`` or ``"20ms"`` into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART_RE.findall(value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(n) * scale[unit] for n, unit in parts)
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough token estimate (~4 characters per token), as the API does for rate limiting."""
+    return sum(len(t) for t in texts) // 4 + 1
+
+
+class _Bucket:
+    """Token bucket refilled continuously at ``capacity`` per minute."""
+
+    def __init__(self, capacity: Optional[float]):
+        self.capacity = capacity
+        self.level = capacity or 0.0
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        if self.capacity is None:
+            return
+        self.level = min(self.capacity, self.level + self.capacity * (now - self.updated) / 60.0)
+        self.updated = now
+
+    def wait_for(self, amount: float) -> float:
+        """Seconds until ``amount`` is available (0 when it already is or the bucket is unlimited)."""
+        if self.capacity is None or self.level >= amount:
+            return 0.0
+        # A request larger than the whole bucket proceeds once the bucket is full
+        needed = min(amount, self.capacity) - self.level
+        return max(0.0, needed * 60.0 / self.capacity)
+
+    def take(self, amount: float) -> None:
+        if self.capacity is not None:
+            self.level -= amount
+
+
+class RateLimiter:
+    """Shared requests-per-minute and tokens-per-minute limiter for all workers of a run.
+
+    Each call reserves one request and its estimated tokens before it is sent. Buckets
+    start from the optional configured limits and adapt to the account's real limits from
+    ``x-ratelimit-limit-*`` / ``x-ratelimit-remaining-*`` response headers; a 429 pauses
+    every worker until the advertised reset instead of letting them all retry at once.
+    Works from threads (``acquire``) and from the event loop (``acquire_async``).
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        headroom: float = 0.9,
+    ):
+        self.headroom = headroom
+        self.requests = _Bucket(requests_per_minute)
+        self.tokens = _Bucket(tokens_per_minute)
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.throttled_seconds = 0.0
+
+    def _reserve(self, tokens: int) -> float:
+        """Take capacity for one request if available; otherwise return how long to wait."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            wait = max(self.requests.wait_for(1), self.tokens.wait_for(tokens))
+            if wait <= 0:
+                self.requests.take(1)
+                self.tokens.take(tokens)
+            return wait
+
+    def acquire(self, tokens: int) -> None:
+        """Block the calling thread until a request of ``tokens`` may be sent."""
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            wait = min(wait, 1.0)  # re-check regularly; headers may raise the limits meanwhile
+            self.throttled_seconds += wait
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int) -> None:
+        """Event-loop friendly ``acquire``."""
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            wait = min(wait, 1.0)
+            self.throttled_seconds += wait
+            await asyncio.sleep(wait)
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the token bucket once the real usage of a call is known."""
+        if actual_tokens <= 0:
+            return
+        with self._lock:
+            self.tokens.level = min(
+                self.tokens.capacity or 0.0, self.tokens.level + estimated_tokens - actual_tokens
+            )
+
+    def observe(self, status_code: int, headers: Mapping[str, str]) -> None:
+        """Adapt to the rate-limit headers of a response."""
+        with self._lock:
+            now = time.monotonic()
+            for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                try:
+                    if limit is not None:
+                        bucket.refill(now)
+                        bucket.capacity = float(limit) * self.headroom
+                    if remaining is not None and bucket.capacity is not None:
+                        bucket.refill(now)
+                        bucket.level = min(bucket.capacity, float(remaining) * self.headroom)
+                        bucket.updated = now
+                except ValueError:
+                    continue
+
+            if status_code == 429:
+                retry_after = parse_reset_duration(headers.get("retry-after"))
+                if retry_after is None:
+                    resets = [
+                        parse_reset_duration(headers.get("x-ratelimit-reset-requests")),
+                        parse_reset_duration(headers.get("x-ratelimit-reset-tokens")),
+                    ]
+                    retry_after = max((r for r in resets if r is not None), default=1.0)
+                self._paused_until = max(self._paused_until, now + retry_after)
+
+    # httpx event hooks (see llm.ensure_client)
+
+    def on_response(self, response) -> None:
+        self.observe(response.status_code, response.headers)
+
+    async def on_response_async(self, response) -> None:
+        self.observe(response.status_code, response.headers)
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import httpx
+import openai
+
+
+# HTTP statuses worth retrying; other 4xx (bad request, auth, not found, ...) are fatal
+_RETRYABLE_STATUS = {408, 409, 429}
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Classify an exception raised while calling the API as transient (retry) or fatal."""
+    if isinstance(exc, openai.APIStatusError):
+        if getattr(exc, "code", None) == "insufficient_quota":
+            return False  # a 429 that waiting will not fix
+        return exc.status_code in _RETRYABLE_STATUS or exc.status_code >= 500
+    if isinstance(exc, (openai.APIConnectionError, httpx.TransportError)):
+        return True
+    # Other SDK errors (e.g. a broken event stream) are transient; programming errors are not
+    return isinstance(exc, openai.APIError)
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Return the server's ``retry-after-ms`` / ``retry-after`` hint for a failed call, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        # Malformed header: fall back to the policy's own backoff
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+class CircuitBreaker:
+    """Run-wide breaker that pauses every worker during an outage.
+
+    After ``failure_threshold`` consecutive retryable failures (from any worker) the
+    breaker opens for ``cooldown`` seconds and all calls wait instead of each burning its
+    own attempts. When the cooldown ends one more failure re-opens it immediately; a
+    success closes it.
+    """
+
+    def __init__(self, failure_threshold: int = 8, cooldown: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self._failures = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+        self.trips = 0
+
+    def _remaining(self) -> float:
+        with self._lock:
+            return self._open_until - time.monotonic()
+
+    def wait(self) -> None:
+        while (remaining := self._remaining()) > 0:
+            time.sleep(remaining)
+
+    async def wait_async(self) -> None:
+        while (remaining := self._remaining()) > 0:
+            await asyncio.sleep(remaining)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._open_until = time.monotonic() + self.cooldown
+                self.trips += 1
+                # Half-open: the next failure after the cooldown trips it again
+                self._failures = self.failure_threshold - 1
+
+
+@dataclass
+class RetryPolicy:
+    """How ``call_openai*`` retries transient failures.
+
+    Delays use decorrelated jitter (``uniform(base_delay, 3 * previous)``, capped at
+    ``max_delay``) so workers that fail together do not retry together. A server
+    ``Retry-After`` hint, when present, replaces the computed delay (plus a little
+    jitter) up to ``max_retry_after``. Fatal errors (bad request, auth, quota) are raised
+    on the first attempt. An optional ``breaker`` is shared by every call of the run.
+    """
+
+    max_attempts: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 20.0
+    max_retry_after: float = 120.0
+    breaker: Optional[CircuitBreaker] = field(default=None)
+
+    def schedule(self) -> "RetrySchedule":
+        return RetrySchedule(self)
+
+    # Breaker hooks; no-ops without a breaker
+
+    def before_attempt(self) -> None:
+        if self.breaker is not None:
+            self.breaker.wait()
+
+    async def before_attempt_async(self) -> None:
+        if self.breaker is not None:
+            await self.breaker.wait_async()
+
+    def record_success(self) -> None:
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+    def record_failure(self) -> None:
+        if self.breaker is not None:
+            self.breaker.record_failure()
+
+
+class RetrySchedule:
+    """Per-call retry state: attempts used so far and the previous jittered delay."""
+
+    def __init__(self, policy: RetryPolicy):
+        self.policy = policy
+        self.attempts = 0
+        self._previous = policy.base_delay
+
+    def next_delay(self, exc: BaseException) -> Optional[float]:
+        """Delay before the next attempt, or ``None`` when attempts are exhausted."""
+        self.attempts += 1
+        if self.attempts >= self.policy.max_attempts:
+            return None
+        jittered = min(self.policy.max_delay, random.uniform(self.policy.base_delay, self._previous * 3))
+        self._previous = jittered
+        hint = retry_after_seconds(exc)
+        if hint is not None:
+            return min(hint, self.policy.max_retry_after) + random.uniform(0, self.policy.base_delay)
+        return jittered
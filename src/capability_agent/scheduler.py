@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+from typing import Any, Callable, Dict, Iterable, List, Tuple, Union
+
+from .io_utils import ContextOptions
+from .models import Capability, CapabilityIndex
+
+
+# Leaves submitted to the workers ahead of those running, per worker. Everything else
+# waits in the priority queue, so a 100k-leaf run does not hold 100k futures.
+SUBMIT_AHEAD = 2
+
+PriorityKey = Callable[[Capability], Any]
+
+PRIORITIES = ("model", "longest-prompt", "shallowest", "failed-last")
+
+
+def _prompt_size_key(index: CapabilityIndex, ctx: ContextOptions) -> PriorityKey:
+    """Longest estimated prompt first: the leaf's own text plus its parent-chain and sibling sections.
+
+    The shared full tree is the same for every leaf and is left out. Per-parent parts are
+    computed once, so leaves with many siblings cost O(1) each.
+    """
+    parent_parts: Dict[str, int] = {}
+
+    def parent_part(parent_id: str) -> int:
+        part = parent_parts.get(parent_id)
+        if part is None:
+            part = 0
+            if ctx.parent:
+                part += sum(len(a.name) + len(a.description) for a in (*index.ancestors(parent_id), index[parent_id]))
+            if ctx.siblings:
+                part += sum(len(c.name) + len(c.description) for c in index.children(parent_id))
+            parent_parts[parent_id] = part
+        return part
+
+    def key(leaf: Capability) -> int:
+        size = len(leaf.name) + len(leaf.description)
+        if leaf.parent is not None:
+            # The sibling section leaves the leaf itself out
+            size += parent_part(leaf.parent) - (size if ctx.siblings else 0)
+        return -size
+
+    return key
+
+
+def leaf_priority(
+    priority: Union[str, PriorityKey], index: CapabilityIndex, ctx: ContextOptions
+) -> PriorityKey:
+    """Resolve a priority name (see ``PRIORITIES``) to a sort key; lower keys run first.
+
+    - ``model``: model order, generated children after their parents' generation
+    - ``longest-prompt``: largest estimated prompt first, so the slowest calls do not start last
+    - ``shallowest``: fewest ancestors first
+    - ``failed-last``: leaves that failed in an earlier run (``capability`` -1) after the rest
+
+    A callable is used as the key as-is.
+    """
+    if callable(priority):
+        return priority
+    if priority == "model":
+        return lambda leaf: 0
+    if priority == "longest-prompt":
+        return _prompt_size_key(index, ctx)
+    if priority == "shallowest":
+        return lambda leaf: index.depth(leaf.id)
+    if priority == "failed-last":
+        return lambda leaf: 1 if getattr(leaf, "capability", 0) == -1 else 0
+    raise ValueError(f"Unknown priority '{priority}'. Must be one of: {', '.join(PRIORITIES)}")
+
+
+class LeafQueue:
+    """Leaves waiting to be submitted, highest priority first.
+
+    Ties keep insertion order, so input leaves run in model order and generated
+    children after them (breadth-first), as with FIFO submission.
+    """
+
+    def __init__(self, key: PriorityKey, leaves: Iterable[Capability] = ()):
+        self._key = key
+        self._heap: List[Tuple[Any, int, Capability]] = []
+        self._counter = itertools.count()
+        self.extend(leaves)
+
+    def push(self, leaf: Capability) -> None:
+        heapq.heappush(self._heap, (self._key(leaf), next(self._counter), leaf))
+
+    def extend(self, leaves: Iterable[Capability]) -> None:
+        for leaf in leaves:
+            self.push(leaf)
+
+    def pop(self) -> Capability:
+        return heapq.heappop(self._heap)[2]
+
+    def __len__(self) -> int:
+        return len(self._heap)
@@ -1,11 +1,20 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import hashlib
+import itertools
+import json
+import os
+import tempfile
 import uuid
+from collections import Counter
 from pathlib import Path
-from typing import List, Sequence, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Optional, Tuple, Union
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 import threading
 
+from openai import AsyncOpenAI
 from rich.console import Console
 from rich.progress import (
     Progress,
@@ -17,15 +26,435 @@ from rich.progress import (
 )
 from rich.theme import Theme
 
-from .io_utils import ContextFormat, ContextOptions, ensure_dir, safe_filename, timestamp_for_filename, save_progress
-from .llm import call_openai, call_openai_streaming, ensure_client, UsageStats
-from .models import Capability, CapabilityList
-from .prompting import build_prompt_context, render_prompt
+from . import batch as batch_api
+from .cache import ResponseCache
+from .coalesce import CallResult, PromptCoalescer
+from .httppool import HttpSettings
+from .io_utils import ContextFormat, ContextOptions, ensure_dir, safe_filename, timestamp_for_filename
+from .journal import CheckpointJournal
+from .logwriter import LogSettings
+from .metrics import RunMetrics, leaf as metrics_leaf, span
+from .llm import (
+    StreamingDashboard,
+    call_openai,
+    call_openai_async,
+    call_openai_streaming,
+    ensure_async_client,
+    ensure_client,
+    UsageStats,
+)
+from .models import PENDING_LEVEL, Capability, CapabilityList
+from .prompting import SECTION_KEYS, ContextCache, PromptRenderer, build_prompt_context
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+from .scheduler import SUBMIT_AHEAD, LeafQueue, PriorityKey, leaf_priority
+from .sharding import claim_shard, shard_of
+from .tokens import TokenBudget
 
 
 console = Console(theme=Theme({"error": "bold red", "info": "cyan"}))
 
 
+def _progress_bar() -> Progress:
+    return Progress(
+        SpinnerColumn(style="info"),
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        TaskProgressColumn(),
+        TimeElapsedColumn(),
+        console=console,
+        transient=True,
+    )
+
+
+def _llm_options(**options: Any) -> Dict[str, Any]:
+    """Optional call policies for ``call_openai*``; only configured ones are passed."""
+    return {name: value for name, value in options.items() if value is not None}
+
+
+class _AugmentRun:
+    """Per-run state shared by the threaded and asyncio execution engines.
+
+    Owns the capability index, context cache, compiled template and checkpoint journal,
+    and turns LLM output into child nodes. The engines only decide how calls are scheduled.
+
+    With ``depth > 1`` generated children join the index as they arrive (so their own
+    prompts see parent and siblings) and children above the last level are created
+    pending (``capability: 0``); ``follow_ups`` hands them back to the engine, which
+    schedules them as soon as their parent finishes.
+    """
+
+    def __init__(
+        self,
+        model: CapabilityList,
+        template_path: Path,
+        context_opts: ContextOptions,
+        context_format: ContextFormat,
+        max_capabilities: int,
+        log_prompts_dir: Optional[Path],
+        restart_mode: bool,
+        input_path: Optional[Path],
+        checkpoint_every: int,
+        template_cache_dir: Optional[Path],
+        depth: int = 1,
+        cache_layout: bool = False,
+        metrics: Optional[RunMetrics] = None,
+        token_budget: Optional[TokenBudget] = None,
+        shard: Optional[Tuple[int, int]] = None,
+        coalesce: bool = False,
+    ):
+        self.model = model
+        self.metrics = metrics
+        self.token_budget = token_budget
+        self.context_opts = context_opts
+        self.context_format = context_format
+        self.max_capabilities = max_capabilities
+        self.log_prompts_dir = log_prompts_dir
+        self.restart_mode = restart_mode
+        self.depth = max(1, depth)
+
+        # Compile the template once; workers render from the same compiled template
+        self.renderer = PromptRenderer(template_path, template_cache_dir, cache_layout)
+        self.total_usage = UsageStats()  # Initialize usage tracking
+        # Share of each call's input tokens served from the provider's prompt cache
+        self.cached_ratios: List[float] = []
+
+        # One index for the whole run: O(1) lookups by id, children, parent and pending status
+        self.index = model.index()
+
+        # Restart progress goes to an append-only journal next to the input file
+        self.journal = CheckpointJournal(input_path, checkpoint_every) if restart_mode and input_path else None
+        # Shards restarting one file would overwrite each other's progress; held until close()
+        self.shard_claim = claim_shard(input_path, shard) if self.journal is not None else None
+        try:
+            if self.journal is not None:
+                replayed = self.journal.replay(self.index)
+                if replayed:
+                    console.print(f"[info]Replayed {replayed} checkpoint journal records from {self.journal.path}[/info]")
+                    # Fold the replayed records into the model file so the journal starts clean
+                    self.journal.compact(c.model_dump() for c in self.index)
+
+            # Use different leaf selection based on restart mode
+            self.leaves = self.index.pending_leaves() if restart_mode else self.index.leaves()
+            # Level of each node still to be expanded in this run (input leaves are level 1).
+            # On restart, nodes generated by an interrupted --depth run keep their saved level
+            self.levels: Dict[str, int] = {
+                leaf.id: (getattr(leaf, PENDING_LEVEL, None) or 1) if restart_mode else 1 for leaf in self.leaves
+            }
+            if shard is not None:
+                # Only this shard's leaves; their generated subtrees stay on the same shard
+                shard_index, shard_count = shard
+                self.leaves = [
+                    leaf for leaf in self.leaves
+                    if shard_of(self._input_leaf_id(leaf), shard_count) == shard_index
+                ]
+                self.levels = {leaf.id: self.levels[leaf.id] for leaf in self.leaves}
+                console.print(f"[info]Shard {shard_index}/{shard_count}: {len(self.leaves)} leaves[/info]")
+            self.original_count = len(self.index)
+            self.scheduled = len(self.leaves)
+
+            self.new_nodes: List[Capability] = []
+            self.progress_lock = threading.Lock()  # Thread-safe progress saving
+            # Leaves whose rendered prompts are identical share one in-flight call
+            self.coalescer = PromptCoalescer(metrics) if coalesce else None
+            # Full-tree and sibling sections are rendered once and shared by every leaf
+            self.context_cache = ContextCache(self.index, token_budget.counter if token_budget is not None else None)
+            # Children already recorded in the journal; needed to compact a consistent snapshot
+            self.checkpointed_nodes: List[Capability] = []
+
+            # Token budget bookkeeping: largest prompt and which trimming steps were applied
+            self._budget_lock = threading.Lock()
+            self.max_prompt_tokens = 0
+            self.budget_trims: Counter = Counter()
+            self.trimmed_leaves = 0
+            if token_budget is not None and self.leaves:
+                self._measure_template_tokens()
+        except BaseException:
+            self._release_shard_claim()
+            raise
+
+    def _input_leaf_id(self, leaf: Capability) -> str:
+        """Id of the input leaf a pending node was generated below (itself at level 1)."""
+        generations = self.levels[leaf.id] - 1
+        if generations <= 0:
+            return leaf.id
+        path = self.index.ancestor_ids(leaf.id)
+        return path[max(0, len(path) - generations)]
+
+    # ---- per-leaf steps ----
+
+    def _measure_template_tokens(self) -> None:
+        """Count the template's own text (everything but the context sections) once per run."""
+        assert self.token_budget is not None
+        leaf = self.leaves[0]
+        context = build_prompt_context(self.index, leaf, self.context_opts, self.context_format, self.context_cache)
+        context.update({key: "" for key in SECTION_KEYS}, max_capabilities=self.max_capabilities)
+        self.token_budget.template_tokens = self.token_budget.count(self.renderer.template.render(**context))
+
+    def _context(self, leaf: Capability) -> Dict[str, Any]:
+        with span(self.metrics, "context"):
+            context = build_prompt_context(
+                self.index, leaf, self.context_opts, self.context_format, self.context_cache,
+                self.token_budget,
+            )
+        context["max_capabilities"] = self.max_capabilities
+        return context
+
+    def prompt_cache_key(self, system_message: str) -> Optional[str]:
+        """Stable ``prompt_cache_key`` for a cache-layout run: a digest of the shared prefix."""
+        if not self.renderer.cache_layout or not self.leaves:
+            return None
+        prefix = self.renderer.shared_prefix(self._context(self.leaves[0]))
+        digest = hashlib.sha256(f"{system_message}\0{prefix}".encode("utf-8")).hexdigest()
+        return f"capability-agent-{digest[:24]}"
+
+    def coalesced(self, prompt: str, call: Callable[[], CallResult]) -> CallResult:
+        return self.coalescer.call(prompt, call) if self.coalescer is not None else call()
+
+    async def coalesced_async(self, prompt: str, call: Callable[[], Awaitable[CallResult]]) -> CallResult:
+        return await (self.coalescer.acall(prompt, call) if self.coalescer is not None else call())
+
+    def leaf_scope(self, leaf: Capability) -> contextlib.AbstractContextManager:
+        """Attribute the stage spans recorded inside the block to ``leaf``."""
+        return metrics_leaf(self.metrics, leaf.id)
+
+    def prepare_prompt(self, leaf: Capability) -> str:
+        """Build prompt context for a leaf and render the template."""
+        context = self._context(leaf)
+        with span(self.metrics, "render"):
+            user_prompt = self.renderer.render(context)
+        if self.token_budget is not None:
+            # Oversized prompts fail here, before any network I/O
+            tokens = self.token_budget.check(user_prompt, leaf.name)
+            with self._budget_lock:
+                self.max_prompt_tokens = max(self.max_prompt_tokens, tokens)
+                if context["budget_trimmed"]:
+                    self.trimmed_leaves += 1
+                    self.budget_trims.update(context["budget_trimmed"])
+
+        # Optionally log the rendered prompt per leaf
+        if self.log_prompts_dir is not None:
+            try:
+                ensure_dir(self.log_prompts_dir)
+                stem = f"{timestamp_for_filename()}_{safe_filename(leaf.name)}"
+                # include short id to avoid collisions
+                short_id = (leaf.id or "")[:8]
+                if short_id:
+                    stem = f"{stem}_{short_id}"
+                out_path = (self.log_prompts_dir / f"{stem}.prompt.txt").resolve()
+                out_path.write_text(user_prompt, encoding="utf-8")
+            except Exception as e:  # noqa: BLE001
+                # Do not fail augmentation if logging fails; surface as info
+                console.print(f"Prompt log failed for {leaf.name}: {e}", style="error")
+
+        return user_prompt
+
+    def build_children(self, leaf: Capability, generated: Sequence[Dict[str, str]]) -> List[Capability]:
+        """Create child nodes for generated items, inheriting the leaf's extra fields."""
+        with span(self.metrics, "build"):
+            return self._build_children(leaf, generated)
+
+    def _build_children(self, leaf: Capability, generated: Sequence[Dict[str, str]]) -> List[Capability]:
+        # Inherit extra fields from parent (leaf) except reserved keys
+        inherited = leaf.model_dump()
+        # Remove reserved and internal fields so they don't propagate to children
+        for key in ("id", "name", "description", "capability", "error", PENDING_LEVEL):
+            inherited.pop(key, None)
+
+        level = self.levels.get(leaf.id, 1)
+        expand = level < self.depth
+
+        children: List[Capability] = []
+        for item in generated:
+            node_data = {
+                **inherited,
+                "id": str(uuid.uuid4()),
+                "name": item["name"],
+                "description": item["description"],
+                "parent": leaf.id,
+                # Mark new nodes as generated, or as pending when this run expands them further
+                "capability": 0 if expand else 1,
+            }
+            if expand:
+                node_data[PENDING_LEVEL] = level + 1
+            # Built from our own fields and validated response items; skip re-validation
+            children.append(Capability.model_construct(**node_data))
+            if expand:
+                self.levels[node_data["id"]] = level + 1
+        return children
+
+    def follow_ups(self, children: Sequence[Capability]) -> List[Capability]:
+        """Children of a finished leaf that this run expands next (empty unless ``depth > 1``)."""
+        pending = [c for c in children if c.id in self.levels]
+        self.scheduled += len(pending)
+        return pending
+
+    # ---- checkpointing ----
+
+    def _update_leaf_state(self, leaf: Capability, **fields) -> None:
+        """Replace a leaf in the model with a copy carrying the given state fields."""
+        leaf_dict = leaf.model_dump()
+        leaf_dict.pop("error", None)
+        if fields.get("capability") == 1:
+            # Expanded, so no longer pending at any level
+            leaf_dict.pop(PENDING_LEVEL, None)
+        leaf_dict.update(fields)
+        self.index.replace(Capability.model_construct(**leaf_dict))
+
+    def _compact_journal(self) -> None:
+        assert self.journal is not None
+        nodes = itertools.chain(self.index, self.checkpointed_nodes)
+        self.journal.compact(c.model_dump() for c in nodes)
+
+    @contextlib.contextmanager
+    def _checkpoint_lock(self):
+        """Hold ``progress_lock``, timing the wait (``lock_wait``) and the hold (``checkpoint``)."""
+        with span(self.metrics, "lock_wait"):
+            self.progress_lock.acquire()
+        try:
+            with span(self.metrics, "checkpoint"):
+                yield
+        finally:
+            self.progress_lock.release()
+
+    def record_success(self, leaf: Capability, children: Sequence[Capability]) -> None:
+        """Mark a leaf as generated and journal its new children."""
+        if self.metrics is not None:
+            self.metrics.leaf_finished(True)
+        if self.journal is None and self.depth == 1:
+            return
+        with self._checkpoint_lock():  # Ensure thread-safe progress saving
+            if self.depth > 1:
+                # Multi-level runs grow the index itself; children are expanded from it
+                for child in children:
+                    self.index.add(child)
+            if self.journal is not None:
+                self.journal.append_success(leaf.id, [c.model_dump() for c in children])
+                self._update_leaf_state(leaf, capability=1)
+                if self.depth == 1:
+                    self.checkpointed_nodes.extend(children)
+                if self.journal.should_compact:
+                    self._compact_journal()
+            elif self.levels.get(leaf.id, 1) > 1:
+                # A generated child expanded in this run is no longer pending
+                self._update_leaf_state(leaf, capability=1)
+
+    def record_failure(self, leaf: Capability, error: Exception) -> None:
+        """Report a failed leaf and mark it (capability -1) so a later --restart retries it."""
+        # Enhanced error logging with leaf context
+        error_msg = f"Failed to generate children for leaf '{leaf.name}' (ID: {leaf.id}): {str(error)}"
+        console.print(f"[error]{error_msg}[/error]")
+        if self.metrics is not None:
+            self.metrics.leaf_finished(False)
+
+        if self.journal is not None:
+            with self._checkpoint_lock():
+                try:
+                    self.journal.append_failure(leaf.id, str(error))
+                    self._update_leaf_state(leaf, capability=-1, error=str(error))
+                    if self.journal.should_compact:
+                        self._compact_journal()
+                except Exception as save_error:
+                    console.print(f"[error]Failed to save error state: {save_error}[/error]")
+
+    def collect(self, children: Sequence[Capability], usage: UsageStats) -> None:
+        if self.depth == 1:
+            self.new_nodes.extend(children)
+        self.total_usage += usage
+        if usage.input_tokens > 0:
+            self.cached_ratios.append(usage.cache_hit_rate)
+
+    def _release_shard_claim(self) -> None:
+        if self.shard_claim is not None:
+            self.shard_claim.unlink(missing_ok=True)
+            self.shard_claim = None
+
+    def close(self) -> None:
+        """Fold the journal into the input file and release the shard claim; call on every exit."""
+        try:
+            if self.journal is not None and self.journal.records_since_compaction:
+                # Final compaction: the input file always reflects every journaled leaf
+                with self.progress_lock:
+                    self._compact_journal()
+        finally:
+            self._release_shard_claim()
+
+    # ---- results ----
+
+    def raise_for_failures(self, failed_leaves: List[tuple[Capability, Exception]], successful_count: int) -> None:
+        """Raise one exception describing every failed leaf (no-op when nothing failed)."""
+        if not failed_leaves:
+            return
+        error_summary = []
+        for leaf, exc in failed_leaves:
+            error_summary.append(f"  - {leaf.name} (ID: {leaf.id}): {str(exc)}")
+
+        failure_msg = (
+            f"\n{len(failed_leaves)} out of {self.scheduled} leaves failed to process:\n" +
+            "\n".join(error_summary) +
+            f"\n\nSuccessfully processed: {successful_count}/{self.scheduled} leaves."
+        )
+
+        if self.restart_mode:
+            failure_msg += (
+                "\n\nIn restart mode: progress has been saved for successful leaves. "
+                "You can re-run with --restart to continue processing the failed leaves."
+            )
+
+        # For now, still fail fast, but with much better error information
+        raise Exception(f"Augmentation failed with detailed errors:{failure_msg}")
+
+    def finish(self) -> tuple[CapabilityList, UsageStats]:
+        renderer = self.renderer
+        if renderer.render_count:
+            console.print(
+                f"[info]Rendered {renderer.render_count} prompts in {renderer.total_seconds:.2f}s "
+                f"(avg {renderer.average_seconds * 1000:.1f} ms, max {renderer.max_seconds * 1000:.1f} ms)[/info]"
+            )
+
+        if self.token_budget is not None and self.max_prompt_tokens:
+            budget = self.token_budget
+            trims = ", ".join(f"{step} x{n}" for step, n in self.budget_trims.most_common())
+            console.print(
+                f"[info]Token budget: largest prompt {self.max_prompt_tokens:,} of {budget.max_input_tokens:,} "
+                f"input tokens ({'tiktoken' if budget.counter.exact else 'estimated'}); "
+                f"context trimmed for {self.trimmed_leaves} leaves{f' ({trims})' if trims else ''}[/info]"
+            )
+
+        if self.cached_ratios:
+            ratios = sorted(self.cached_ratios)
+            uncached = sum(1 for r in ratios if r == 0)
+            console.print(
+                f"[info]Prompt cache: {self.total_usage.cache_hit_rate:.1f}% of "
+                f"{self.total_usage.input_tokens:,} input tokens cached; per call "
+                f"median {ratios[len(ratios) // 2]:.1f}%, min {ratios[0]:.1f}%, max {ratios[-1]:.1f}% "
+                f"({uncached} of {len(ratios)} calls without cached tokens)[/info]"
+            )
+
+        # Every node was validated on ingest or built by this run (ids are unique per the
+        # index and fresh uuid4s), so the output list is assembled without re-validation
+        output = CapabilityList.model_construct([*self.model.root, *self.new_nodes])
+
+        # In restart mode, verify we haven't lost any data
+        if self.restart_mode:
+            original_count = self.original_count
+            final_count = len(output.root)
+            added_count = final_count - original_count
+
+            console.print(
+                f"[info]Restart summary: {original_count} original + {added_count} new = {final_count} total capabilities[/info]"
+            )
+
+            # Sanity check: ensure we didn't lose any original capabilities
+            if final_count < original_count:
+                raise ValueError(
+                    f"Data integrity error: final count ({final_count}) is less than original count ({original_count}). "
+                    "This suggests data loss during processing."
+                )
+
+        return output, self.total_usage
+
+
 def augment_model(
     model: CapabilityList,
     template_path: Path,
@@ -40,230 +469,402 @@ def augment_model(
     input_path: Optional[Path] = None,
     openai_log_dir: Optional[Path] = None,
     openai_log_level: str = "none",
+    openai_log_settings: Optional[LogSettings] = None,
+    checkpoint_every: int = 200,
+    template_cache_dir: Optional[Path] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    response_cache: Optional[ResponseCache] = None,
+    depth: int = 1,
+    cache_layout: bool = False,
+    metrics: Optional[RunMetrics] = None,
+    http_settings: Optional[HttpSettings] = None,
+    max_input_tokens: Optional[int] = None,
+    shard: Optional[Tuple[int, int]] = None,
+    priority: Union[str, PriorityKey] = "model",
+    coalesce: bool = False,
 ) -> tuple[CapabilityList, UsageStats]:
-    client = ensure_client(openai_log_dir, openai_log_level)
-    total_usage = UsageStats()  # Initialize usage tracking
+    client = ensure_client(
+        openai_log_dir, openai_log_level, rate_limiter=rate_limiter, log_settings=openai_log_settings,
+        http_settings=http_settings, concurrency=tasks,
+    )
+    run = _AugmentRun(
+        model, template_path, context_opts, context_format, max_capabilities,
+        log_prompts_dir, restart_mode, input_path, checkpoint_every, template_cache_dir, depth,
+        cache_layout=cache_layout, metrics=metrics,
+        token_budget=TokenBudget(max_input_tokens, system_message) if max_input_tokens else None,
+        shard=shard,
+        coalesce=coalesce,
+    )
+    try:
+        llm_options = _llm_options(
+            rate_limiter=rate_limiter,
+            retry_policy=retry_policy,
+            cache=response_cache,
+            prompt_cache_key=run.prompt_cache_key(system_message),
+            metrics=metrics,
+        )
+        leaves = run.leaves
 
-    # Use different leaf selection based on restart mode
-    if restart_mode:
-        leaves = model.leaves_for_generation()
-        if not leaves:
+        if restart_mode and not leaves:
             console.print("No capabilities need generation. All leaves already generated.", style="info")
-            return model, total_usage
-    else:
-        leaves = model.leaves()
-    
-    new_nodes: List[Capability] = []
-    progress_lock = threading.Lock()  # Thread-safe progress saving
-    
-    def save_leaf_progress(leaf: Capability, children: Sequence[Capability]) -> None:
-        """Mark a leaf as generated and persist progress, including its new children."""
-        if restart_mode and input_path:
-            with progress_lock:  # Ensure thread-safe progress saving
-                # Update the capability attribute for the processed leaf
-                leaf_dict = leaf.model_dump()
-                leaf_dict['capability'] = 1
-                # Clear any previous error marker on success
-                leaf_dict.pop('error', None)
-
-                # Find and update the leaf in the current model
-                for i, c in enumerate(model.root):
-                    if c.id == leaf.id:
-                        # Create updated capability and replace in model
-                        updated_cap = Capability.model_validate(leaf_dict)
-                        model.root[i] = updated_cap
-                        break
-
-                # Save progress with pending new nodes for this leaf
-                current_data = [c.model_dump() for c in model.root]
-                current_data.extend(c.model_dump() for c in new_nodes)
-                current_data.extend(c.model_dump() for c in children)
-                save_progress(input_path, current_data)
-
-    def generate_children(leaf: Capability) -> tuple[Sequence[Capability], UsageStats]:
-        try:
-            # Build prompt context and render
-            context = build_prompt_context(model, leaf, context_opts, context_format)
-            context["max_capabilities"] = max_capabilities
-            user_prompt = render_prompt(template_path, context)
+            return model, run.total_usage
 
-            # Optionally log the rendered prompt per leaf
-            if log_prompts_dir is not None:
-                try:
-                    ensure_dir(log_prompts_dir)
-                    stem = f"{timestamp_for_filename()}_{safe_filename(leaf.name)}"
-                    # include short id to avoid collisions
-                    short_id = (leaf.id or "")[:8]
-                    if short_id:
-                        stem = f"{stem}_{short_id}"
-                    out_path = (log_prompts_dir / f"{stem}.prompt.txt").resolve()
-                    out_path.write_text(user_prompt, encoding="utf-8")
-                except Exception as e:  # noqa: BLE001
-                    # Do not fail augmentation if logging fails; surface as info
-                    console.print(f"Prompt log failed for {leaf.name}: {e}", style="error")
-
-            # Call LLM (one generation per leaf)
-            if use_streaming and tasks <= 1:  # Only use streaming in serial mode
-                generated, usage_stats = call_openai_streaming(
-                    client, system_message, user_prompt, max_capabilities, 
-                    show_progress=True, leaf_name=leaf.name
-                )
-            else:
-                generated, usage_stats = call_openai(
-                    client, system_message, user_prompt, max_capabilities
+        queue = LeafQueue(leaf_priority(priority, run.index, context_opts), leaves)
+        progress = _progress_bar()
+        # Streaming shows every in-flight leaf's partial output below the overall progress bar
+        dashboard = StreamingDashboard(progress) if use_streaming else None
+
+        def call_llm(leaf: Capability, user_prompt: str) -> CallResult:
+            if dashboard is None:
+                return call_openai(client, system_message, user_prompt, max_capabilities, **llm_options)
+            dashboard.start(leaf.id, leaf.name)
+            try:
+                return call_openai_streaming(
+                    client, system_message, user_prompt, max_capabilities,
+                    show_progress=False, leaf_name=leaf.name,
+                    on_progress=lambda snapshot: dashboard.update(leaf.id, snapshot),
+                    **llm_options,
                 )
+            finally:
+                dashboard.finish(leaf.id)
+
+        def generate_children(leaf: Capability) -> tuple[Sequence[Capability], UsageStats]:
+            with run.leaf_scope(leaf):
+                try:
+                    user_prompt = run.prepare_prompt(leaf)
+                    # One generation per leaf; identical prompts in flight share a call
+                    generated, usage_stats = run.coalesced(user_prompt, lambda: call_llm(leaf, user_prompt))
+                    children = run.build_children(leaf, generated)
+
+                    # Save progress after successful generation
+                    run.record_success(leaf, children)
+                    return children, usage_stats
+
+                except Exception as e:
+                    # Mark this leaf as having encountered an error in restart mode
+                    run.record_failure(leaf, e)
+
+                    # Re-raise the original exception
+                    raise e
 
-            # Inherit extra fields from parent (leaf) except reserved keys
-            inherited = leaf.model_dump()
-            # Remove reserved and internal fields so they don't propagate to children
-            for key in ("id", "name", "description", "capability", "error"):
-                inherited.pop(key, None)
-
-            children: List[Capability] = []
-            for item in generated:
-                node_data = {
-                    **inherited,
-                    "id": str(uuid.uuid4()),
-                    "name": item["name"],
-                    "description": item["description"],
-                    "parent": leaf.id,
-                    "capability": 1,  # Mark new nodes as generated
-                }
-                children.append(Capability.model_validate(node_data))
-            
-            # Save progress after successful generation
-            save_leaf_progress(leaf, children)
-            return children, usage_stats
-            
-        except Exception as e:
-            # Enhanced error logging with leaf context
-            error_msg = f"Failed to generate children for leaf '{leaf.name}' (ID: {leaf.id}): {str(e)}"
-            console.print(f"[error]{error_msg}[/error]")
-            
-            # Mark this leaf as having encountered an error in restart mode
-            if restart_mode and input_path:
-                with progress_lock:
-                    try:
-                        # Mark leaf with error state rather than completed
-                        leaf_dict = leaf.model_dump()
-                        leaf_dict['capability'] = -1  # Use -1 to indicate error state
-                        leaf_dict['error'] = str(e)  # Store error message
-                        
-                        # Find and update the leaf in the current model
-                        for i, c in enumerate(model.root):
-                            if c.id == leaf.id:
-                                updated_cap = Capability.model_validate(leaf_dict)
-                                model.root[i] = updated_cap
-                                break
-                        
-                        # Save progress with error state
-                        current_data = [c.model_dump() for c in model.root] + [c.model_dump() for c in new_nodes]
-                        save_progress(input_path, current_data)
-                    except Exception as save_error:
-                        console.print(f"[error]Failed to save error state: {save_error}[/error]")
-            
-            # Re-raise the original exception
-            raise e
-
-    # Handle streaming vs concurrent execution differently
-    if use_streaming and tasks <= 1:
-        # Serial execution with streaming - no outer progress bar to avoid conflicts
-        console.print(f"[info]Streaming generation for {len(leaves)} leaves...[/info]")
-        for i, leaf in enumerate(leaves, 1):
-            console.print(f"[info]Processing leaf {i}/{len(leaves)}: {leaf.name}[/info]")
-            children, usage = generate_children(leaf)
-            new_nodes.extend(children)
-            total_usage += usage
-    else:
-        # Concurrent execution or non-streaming - use overall progress bar
         if restart_mode:
             console.print(f"[info]Restart mode: processing {len(leaves)} remaining leaves with {tasks} workers...[/info]")
-        
-        with Progress(
-            SpinnerColumn(style="info"),
-            TextColumn("[progress.description]{task.description}"),
-            BarColumn(),
-            TaskProgressColumn(),
-            TimeElapsedColumn(),
-            console=console,
-            transient=True,
-        ) as progress:
+
+        with dashboard if dashboard is not None else progress:
             task_description = "Generating sub-capabilities (restart mode)" if restart_mode else "Generating sub-capabilities"
-            overall_task = progress.add_task(task_description, total=len(leaves))
+            overall_task = progress.add_task(task_description, total=run.scheduled)
 
-            if tasks <= 1 or len(leaves) <= 1:
-                for leaf in leaves:
+            if tasks <= 1 or (len(leaves) <= 1 and run.depth == 1):
+                while queue:
+                    leaf = queue.pop()
                     progress.update(overall_task, description=f"Generating: {leaf.name}")
-                    children, usage = generate_children(leaf)
-                    new_nodes.extend(children)
-                    total_usage += usage
-                    progress.advance(overall_task, 1)
+                    children, usage_stats = generate_children(leaf)
+                    run.collect(children, usage_stats)
+                    queue.extend(run.follow_ups(children))
+                    progress.update(overall_task, total=run.scheduled, advance=1)
             else:
                 progress.update(overall_task, description=f"Generating with {tasks} workers…")
                 with ThreadPoolExecutor(max_workers=tasks) as executor:
-                    future_map = {executor.submit(generate_children, leaf): leaf for leaf in leaves}
+                    future_map: Dict[Future, Capability] = {}
                     # Track which leaves failed for better error reporting
                     failed_leaves: List[tuple[Capability, Exception]] = []
                     successful_count = 0
-                    
-                    for fut in as_completed(future_map):
-                        leaf = future_map[fut]
-                        try:
-                            children, usage = fut.result()
-                            new_nodes.extend(children)
-                            total_usage += usage
-                            successful_count += 1
-                        except Exception as e:  # noqa: BLE001
-                            failed_leaves.append((leaf, e))
-                            console.print(f"[error]Error processing leaf '{leaf.name}': {str(e)}[/error]")
-                        finally:
-                            progress.advance(overall_task, 1)
-                    
+
+                    def submit_more() -> None:
+                        # Backpressure: only a few leaves per worker wait in the executor
+                        while queue and len(future_map) < tasks * SUBMIT_AHEAD:
+                            leaf = queue.pop()
+                            future_map[executor.submit(generate_children, leaf)] = leaf
+
+                    # Children join the queue as soon as their parent finishes, keeping
+                    # the pool busy across levels
+                    submit_more()
+                    while future_map:
+                        done, _ = wait(future_map, return_when=FIRST_COMPLETED)
+                        for fut in done:
+                            leaf = future_map.pop(fut)
+                            try:
+                                children, usage_stats = fut.result()
+                                run.collect(children, usage_stats)
+                                successful_count += 1
+                                queue.extend(run.follow_ups(children))
+                            except Exception as e:  # noqa: BLE001
+                                failed_leaves.append((leaf, e))
+                                console.print(f"[error]Error processing leaf '{leaf.name}': {str(e)}[/error]")
+                            finally:
+                                progress.update(overall_task, total=run.scheduled, advance=1)
+                        submit_more()
+
                     # If we have failures, provide detailed information
-                    if failed_leaves:
-                        error_summary = []
-                        for leaf, exc in failed_leaves:
-                            error_summary.append(f"  - {leaf.name} (ID: {leaf.id}): {str(exc)}")
-                        
-                        failure_msg = (
-                            f"\n{len(failed_leaves)} out of {len(leaves)} leaves failed to process:\n" +
-                            "\n".join(error_summary) +
-                            f"\n\nSuccessfully processed: {successful_count}/{len(leaves)} leaves."
-                        )
-                        
-                        if restart_mode:
-                            failure_msg += (
-                                "\n\nIn restart mode: progress has been saved for successful leaves. "
-                                "You can re-run with --restart to continue processing the failed leaves."
-                            )
-                        
-                        # For now, still fail fast, but with much better error information
-                        raise Exception(f"Augmentation failed with detailed errors:{failure_msg}")
-
-    output = CapabilityList.model_validate([*model.root, *new_nodes])
-
-    # Re-validate uniqueness and integrity
-    seen: set[str] = set()
-    for c in output.root:
-        if c.id in seen:
-            raise ValueError(f"Duplicate id detected in output: {c.id}")
-        seen.add(c.id)
-    
-    # In restart mode, verify we haven't lost any data
-    if restart_mode:
-        original_count = len(model.root)
-        final_count = len(output.root)
-        added_count = len(new_nodes)
-        
-        console.print(
-            f"[info]Restart summary: {original_count} original + {added_count} new = {final_count} total capabilities[/info]"
+                    run.raise_for_failures(failed_leaves, successful_count)
+    finally:
+        run.close()
+
+    return run.finish()
+
+
+async def augment_model_async(
+    model: CapabilityList,
+    template_path: Path,
+    context_opts: ContextOptions,
+    context_format: ContextFormat,
+    system_message: str,
+    max_capabilities: int,
+    tasks: int = 64,
+    log_prompts_dir: Optional[Path] = None,
+    use_streaming: bool = False,
+    restart_mode: bool = False,
+    input_path: Optional[Path] = None,
+    openai_log_dir: Optional[Path] = None,
+    openai_log_level: str = "none",
+    openai_log_settings: Optional[LogSettings] = None,
+    checkpoint_every: int = 200,
+    template_cache_dir: Optional[Path] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    response_cache: Optional[ResponseCache] = None,
+    depth: int = 1,
+    cache_layout: bool = False,
+    metrics: Optional[RunMetrics] = None,
+    http_settings: Optional[HttpSettings] = None,
+    max_input_tokens: Optional[int] = None,
+    shard: Optional[Tuple[int, int]] = None,
+    priority: Union[str, PriorityKey] = "model",
+    coalesce: bool = False,
+) -> tuple[CapabilityList, UsageStats]:
+    """Asyncio counterpart of ``augment_model`` built on ``AsyncOpenAI``.
+
+    All requests run on one event loop thread; ``tasks`` bounds the number in flight via
+    an ``asyncio.Semaphore``, so hundreds of concurrent calls do not need hundreds of
+    threads. Restart journaling, progress reporting and usage accounting are shared with
+    the threaded engine.
+    """
+    client = ensure_async_client(
+        openai_log_dir, openai_log_level, rate_limiter=rate_limiter, log_settings=openai_log_settings,
+        http_settings=http_settings, concurrency=tasks,
+    )
+    run = _AugmentRun(
+        model, template_path, context_opts, context_format, max_capabilities,
+        log_prompts_dir, restart_mode, input_path, checkpoint_every, template_cache_dir, depth,
+        cache_layout=cache_layout, metrics=metrics,
+        token_budget=TokenBudget(max_input_tokens, system_message) if max_input_tokens else None,
+        shard=shard,
+        coalesce=coalesce,
+    )
+    try:
+        llm_options = _llm_options(
+            rate_limiter=rate_limiter,
+            retry_policy=retry_policy,
+            cache=response_cache,
+            prompt_cache_key=run.prompt_cache_key(system_message),
+            metrics=metrics,
         )
-        
-        # Sanity check: ensure we didn't lose any original capabilities
-        if final_count < original_count:
-            raise ValueError(
-                f"Data integrity error: final count ({final_count}) is less than original count ({original_count}). "
-                "This suggests data loss during processing."
+        leaves = run.leaves
+
+        if restart_mode and not leaves:
+            console.print("No capabilities need generation. All leaves already generated.", style="info")
+            return model, run.total_usage
+
+        if use_streaming:
+            console.print("[info]Streaming is not available with the asyncio engine; using non-streaming calls.[/info]")
+
+        queue = LeafQueue(leaf_priority(priority, run.index, context_opts), leaves)
+        semaphore = asyncio.Semaphore(max(1, tasks))
+
+        async def generate_children(leaf: Capability) -> tuple[Sequence[Capability], UsageStats]:
+            async with semaphore:
+                with run.leaf_scope(leaf):
+                    try:
+                        user_prompt = run.prepare_prompt(leaf)
+                        generated, usage_stats = await run.coalesced_async(
+                            user_prompt,
+                            lambda: call_openai_async(client, system_message, user_prompt, max_capabilities, **llm_options),
+                        )
+                        children = run.build_children(leaf, generated)
+                        # Journal writes (fsync, periodic compaction) stay off the event loop
+                        await asyncio.to_thread(run.record_success, leaf, children)
+                        return children, usage_stats
+                    except Exception as e:
+                        await asyncio.to_thread(run.record_failure, leaf, e)
+                        raise
+
+        if restart_mode:
+            console.print(f"[info]Restart mode: processing {len(leaves)} remaining leaves with up to {tasks} in-flight requests...[/info]")
+
+        with _progress_bar() as progress:
+            task_description = "Generating sub-capabilities (restart mode)" if restart_mode else "Generating sub-capabilities"
+            overall_task = progress.add_task(task_description, total=run.scheduled)
+            progress.update(overall_task, description=f"Generating with up to {tasks} in-flight requests…")
+
+            pending: Dict[asyncio.Future, Capability] = {}
+            failed_leaves: List[tuple[Capability, Exception]] = []
+            successful_count = 0
+
+            def submit_more() -> None:
+                # Backpressure: only a few tasks per in-flight slot wait on the semaphore
+                while queue and len(pending) < max(1, tasks) * SUBMIT_AHEAD:
+                    leaf = queue.pop()
+                    pending[asyncio.ensure_future(generate_children(leaf))] = leaf
+
+            submit_more()
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for fut in done:
+                    leaf = pending.pop(fut)
+                    try:
+                        children, usage_stats = fut.result()
+                        run.collect(children, usage_stats)
+                        successful_count += 1
+                        queue.extend(run.follow_ups(children))
+                    except Exception as e:  # noqa: BLE001
+                        failed_leaves.append((leaf, e))
+                        console.print(f"[error]Error processing leaf '{leaf.name}': {str(e)}[/error]")
+                    finally:
+                        progress.update(overall_task, total=run.scheduled, advance=1)
+                submit_more()
+
+            run.raise_for_failures(failed_leaves, successful_count)
+    finally:
+        run.close()
+        if isinstance(client, AsyncOpenAI):
+            await client.close()
+
+    return run.finish()
+
+
+def augment_model_batch(
+    model: CapabilityList,
+    template_path: Path,
+    context_opts: ContextOptions,
+    context_format: ContextFormat,
+    system_message: str,
+    max_capabilities: int,
+    log_prompts_dir: Optional[Path] = None,
+    restart_mode: bool = False,
+    input_path: Optional[Path] = None,
+    openai_log_dir: Optional[Path] = None,
+    openai_log_level: str = "none",
+    openai_log_settings: Optional[LogSettings] = None,
+    checkpoint_every: int = 200,
+    template_cache_dir: Optional[Path] = None,
+    batch_id: Optional[str] = None,
+    state_path: Optional[Path] = None,
+    poll_interval: float = 60.0,
+    cache_layout: bool = False,
+    metrics: Optional[RunMetrics] = None,
+    http_settings: Optional[HttpSettings] = None,
+    max_input_tokens: Optional[int] = None,
+    shard: Optional[Tuple[int, int]] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+) -> tuple[CapabilityList, UsageStats]:
+    """Augment every leaf through the Batch API instead of one online call per leaf.
+
+    All prompts are rendered into one JSONL request file and submitted as a single batch
+    (completed within 24 hours, at a discount and outside the online rate limits). The
+    batch id is saved in ``state_path`` so an interrupted run resumes polling the same
+    batch; ``batch_id`` resumes explicitly. Results become children through the same
+    path as online calls, including restart journaling. Transient failures of the upload,
+    the status polls and the result download are retried per ``retry_policy``.
+
+    In restart mode the state file is removed once the results are journaled. Otherwise
+    the results only exist in the returned model, so the state file is left for the
+    caller to remove after saving it (and kept when leaves failed).
+    """
+    client = ensure_client(
+        openai_log_dir, openai_log_level, log_settings=openai_log_settings, http_settings=http_settings
+    )
+    run = _AugmentRun(
+        model, template_path, context_opts, context_format, max_capabilities,
+        log_prompts_dir, restart_mode, input_path, checkpoint_every, template_cache_dir,
+        cache_layout=cache_layout, metrics=metrics,
+        token_budget=TokenBudget(max_input_tokens, system_message) if max_input_tokens else None,
+        shard=shard,
+    )
+    try:
+        leaves = run.leaves
+
+        if restart_mode and not leaves:
+            console.print("No capabilities need generation. All leaves already generated.", style="info")
+            return model, run.total_usage
+
+        if batch_id is None and state_path is not None and state_path.exists():
+            batch_id = json.loads(state_path.read_text(encoding="utf-8"))["batch_id"]
+            console.print(f"[info]Resuming batch {batch_id} recorded in {state_path}[/info]")
+
+        if batch_id is None:
+            if state_path is not None:
+                requests_path = state_path.with_name(state_path.name + ".requests.jsonl")
+            else:
+                fd, name = tempfile.mkstemp(suffix=".jsonl")
+                os.close(fd)  # reopened by path when the requests are written
+                requests_path = Path(name)
+            prompt_cache_key = run.prompt_cache_key(system_message)
+            count = batch_api.write_requests(
+                requests_path,
+                (
+                    batch_api.request_line(leaf.id, system_message, run.prepare_prompt(leaf), prompt_cache_key)
+                    for leaf in leaves
+                ),
             )
-    
-    return output, total_usage
+            batch_id = batch_api.submit(client, requests_path, retry_policy)
+            requests_path.unlink()
+            if state_path is not None:
+                state_path.write_text(json.dumps({"batch_id": batch_id}), encoding="utf-8")
+            console.print(f"[info]Submitted batch {batch_id} with {count} requests[/info]")
+
+        last_status: Dict[str, Any] = {}
+
+        def report(batch) -> None:
+            counts = getattr(batch, "request_counts", None)
+            status = {
+                "status": batch.status,
+                "done": getattr(counts, "completed", 0) if counts else 0,
+                "failed": getattr(counts, "failed", 0) if counts else 0,
+            }
+            if status != last_status:
+                console.print(
+                    f"[info]Batch {batch_id}: {status['status']} "
+                    f"({status['done']} done, {status['failed']} failed of {len(leaves)})[/info]"
+                )
+                last_status.update(status)
+
+        final = batch_api.wait_for(client, batch_id, poll_interval, on_status=report, retry_policy=retry_policy)
+
+        leaf_by_id = {leaf.id: leaf for leaf in leaves}
+        failed_leaves: List[tuple[Capability, Exception]] = []
+        successful_count = 0
+        for custom_id, result, error in batch_api.results(client, final, max_capabilities, retry_policy):
+            leaf = leaf_by_id.pop(custom_id, None)
+            if leaf is None:
+                continue  # not pending in this run (e.g. finished since the batch was submitted)
+            if error is not None:
+                run.record_failure(leaf, error)
+                failed_leaves.append((leaf, error))
+                continue
+            generated, usage_stats = result
+            children = run.build_children(leaf, generated)
+            run.record_success(leaf, children)
+            run.collect(children, usage_stats)
+            successful_count += 1
+
+        # Leaves without any result line (batch failed, expired or was cancelled)
+        for leaf in leaf_by_id.values():
+            error = Exception(f"No result in batch {batch_id} (status: {final.status})")
+            run.record_failure(leaf, error)
+            failed_leaves.append((leaf, error))
+
+        if state_path is not None and state_path.exists():
+            if restart_mode:
+                # Every result is journaled; failed leaves go into a new batch on the next run
+                state_path.unlink()
+            elif failed_leaves:
+                console.print(
+                    f"[info]Batch {batch_id} stays recorded in {state_path}; re-run with --restart to keep "
+                    "its successful results and resubmit only the failed leaves[/info]"
+                )
+        run.raise_for_failures(failed_leaves, successful_count)
+    finally:
+        run.close()
+
+    return run.finish()
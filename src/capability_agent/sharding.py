@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .io_utils import iter_json_array
+from .models import PENDING_LEVEL
+
+
+# Fields a shard changes on the leaves it processes; any other difference between the
+# copies of a shared node means the shards were not run from the same model
+_STATE_FIELDS = ("capability", "error", PENDING_LEVEL)
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parse ``"i/N"`` (1-based) into ``(i, N)``."""
+    try:
+        index_text, count_text = value.split("/")
+        index, count = int(index_text), int(count_text)
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}': expected i/N, e.g. 2/4") from None
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard '{value}': i must be between 1 and N")
+    return index, count
+
+
+def shard_of(cap_id: str, count: int) -> int:
+    """The 1-based shard a leaf (and everything generated below it) belongs to.
+
+    A stable hash of the id, so every process and every ``--restart`` run agrees on the
+    assignment without coordination.
+    """
+    return zlib.crc32(cap_id.encode("utf-8")) % count + 1
+
+
+def shard_claim_path(model_path: Path) -> Path:
+    """Return the claim file that sits next to a model file (``model.json.shard``)."""
+    return model_path.with_name(model_path.name + ".shard")
+
+
+def claim_shard(model_path: Path, shard: Optional[Tuple[int, int]]) -> Optional[Path]:
+    """Claim a model file for a ``--restart`` run of ``shard``; return the claim file, if any.
+
+    Restart runs update the model and its journal in place, so shards must each restart
+    their own copy. A sharded restart claims the file for as long as it runs (the caller
+    removes the claim file when the run ends); a restart as another shard (or unsharded)
+    raises ``ValueError`` meanwhile.
+    """
+    path = shard_claim_path(model_path)
+    label = None if shard is None else f"{shard[0]}/{shard[1]}"
+    try:
+        claimed: Optional[str] = path.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        claimed = None
+    if claimed is not None and claimed != label:
+        raise ValueError(
+            f"{model_path} is being restarted as shard {claimed or '?'} ({path.name}); give each shard "
+            "its own copy of the model, or delete the claim file if that run is no longer alive"
+        )
+    if label is None:
+        return None
+    if claimed is None:
+        try:
+            with path.open("x", encoding="utf-8") as f:
+                f.write(label)
+        except FileExistsError:
+            # Another process claimed it just now; check whose claim it is
+            return claim_shard(model_path, shard)
+    return path
+
+
+def _state_rank(node: Dict[str, Any]) -> int:
+    """Generated (1) beats failed (-1) beats pending (0 or missing)."""
+    state = node.get("capability", 0)
+    return 2 if state == 1 else 1 if state == -1 else 0
+
+
+def _merge_shared(copies: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Pick the copy of a node present in every shard that carries its processed state."""
+    first = copies[0]
+    content = {k: v for k, v in first.items() if k not in _STATE_FIELDS}
+    for other in copies[1:]:
+        if {k: v for k, v in other.items() if k not in _STATE_FIELDS} != content:
+            raise ValueError(f"Shards disagree on node '{first.get('name')}' ({first.get('id')}); were they run from the same model?")
+    return max(copies, key=_state_rank)
+
+
+def merge_shards(paths: Sequence[Path]) -> Iterator[Dict[str, Any]]:
+    """Recombine shard outputs into one model, streaming every file once.
+
+    Each shard file is the shared input model (same nodes, same order) followed by the
+    nodes that shard generated. The common prefix is read in lockstep and emitted once,
+    taking each leaf's state from the shard that processed it; then each shard's own
+    nodes follow. Duplicate ids raise ``ValueError`` as they are read; parents may come
+    after their children, so parent ids that never appear raise once every file is read.
+    """
+    readers = [iter_json_array(path) for path in paths]
+    heads: List[Optional[Dict[str, Any]]] = [next(reader, None) for reader in readers]
+    seen: Set[str] = set()
+    # Parent id -> (name, path) of a node referring to it before it was seen
+    unresolved: Dict[str, Tuple[Any, Path]] = {}
+
+    def checked(node: Dict[str, Any], path: Path) -> Dict[str, Any]:
+        node_id = node.get("id")
+        if node_id in seen:
+            raise ValueError(f"Duplicate id {node_id} in {path}")
+        seen.add(node_id)
+        unresolved.pop(node_id, None)
+        parent = node.get("parent")
+        if parent is not None and parent not in seen:
+            unresolved.setdefault(parent, (node.get("name"), path))
+        return node
+
+    # Shared prefix: the same id at the head of every shard
+    while all(head is not None for head in heads) and len({head.get("id") for head in heads}) == 1:
+        yield checked(_merge_shared(heads), paths[0])
+        heads = [next(reader, None) for reader in readers]
+
+    # Then what each shard generated
+    for path, head, reader in zip(paths, heads, readers):
+        if head is None:
+            continue
+        yield checked(head, path)
+        for node in reader:
+            yield checked(node, path)
+
+    if unresolved:
+        parent, (name, path) = next(iter(unresolved.items()))
+        raise ValueError(f"Node '{name}' in {path} has missing parent id: {parent}")
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import functools
+import os
+from typing import Optional
+
+from .ratelimit import estimate_tokens
+
+
+# Encoding used by the GPT-4o / GPT-5 families when tiktoken does not know the model
+_DEFAULT_ENCODING = "o200k_base"
+
+
+class PromptBudgetError(Exception):
+    """A rendered prompt does not fit the input token budget (raised before any API call)."""
+
+
+class TokenCounter:
+    """Count tokens locally with tiktoken, or estimate them (~4 characters per token).
+
+    tiktoken is optional; ``exact`` tells which one is in use. ``count_shared`` memoizes
+    its counts, for text that recurs across the prompts of a run (the full tree, tree
+    fragments, a parent chain), so it is only tokenized once. Per-leaf text goes through
+    the uncached ``count``: caching it would only fill memory with strings never seen again.
+    """
+
+    def __init__(self, model: Optional[str] = None):
+        self._encoding = None
+        try:
+            import tiktoken
+        except ImportError:
+            pass
+        else:
+            model = model or os.getenv("OPENAI_MODEL") or "gpt-5"
+            try:
+                self._encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding(_DEFAULT_ENCODING)
+        self.count_shared = functools.lru_cache(maxsize=4096)(self.count)
+
+    @property
+    def exact(self) -> bool:
+        return self._encoding is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return estimate_tokens(text)
+
+
+class TokenBudget:
+    """Input token budget for each call: system message, template text and context sections.
+
+    ``build_prompt_context`` trims context sections to ``section_limit`` (what is left after
+    the system message and the template's own text, set via ``template_tokens``), and
+    ``check`` rejects a rendered prompt that still does not fit.
+    """
+
+    def __init__(self, max_input_tokens: int, system_message: str = "", counter: Optional[TokenCounter] = None):
+        self.max_input_tokens = max_input_tokens
+        self.counter = counter or TokenCounter()
+        self.system_tokens = self.counter.count(system_message)
+        self.template_tokens = 0
+
+    def count(self, text: str, shared: bool = False) -> int:
+        return self.counter.count_shared(text) if shared else self.counter.count(text)
+
+    @property
+    def section_limit(self) -> int:
+        return self.max_input_tokens - self.system_tokens - self.template_tokens
+
+    def check(self, prompt: str, leaf_name: str = "") -> int:
+        """Return the request's input tokens, or raise ``PromptBudgetError`` when over budget."""
+        tokens = self.system_tokens + self.count(prompt)
+        if tokens > self.max_input_tokens:
+            raise PromptBudgetError(
+                f"Prompt for '{leaf_name}' needs {tokens:,} input tokens, over the budget of "
+                f"{self.max_input_tokens:,} even after trimming context"
+            )
+        return tokens
@@ -1,15 +1,16 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 import typer
 from rich.console import Console
 from rich.panel import Panel
 from rich.theme import Theme
 
-from .io_utils import read_json_file, write_json_file
+from .io_utils import iter_json_array, save_progress, write_json_file
 from .models import validate_model
+from .sharding import merge_shards
 
 
 app = typer.Typer(help="Business Capability Model manipulation utilities.")
@@ -33,8 +34,7 @@ def reset(
     output_path = input if in_place else (output or input)
 
     try:
-        data = read_json_file(input)
-        model = validate_model(data)
+        model = validate_model(iter_json_array(input))
     except Exception as e:
         console.print(f"Input model validation failed: {e}", style="error")
         raise typer.Exit(1)
@@ -48,7 +48,7 @@ def reset(
         setattr(capability, 'capability', 0)
 
     try:
-        write_json_file(output_path, [c.model_dump() for c in model.root])
+        write_json_file(output_path, (c.model_dump() for c in model.root))
     except Exception as e:
         console.print(f"Failed to write output: {e}", style="error")
         raise typer.Exit(1)
@@ -66,8 +66,7 @@ def slice(
     console.print(Panel.fit("bcm-wrench: Extracting capability subtree", title="slice"))
 
     try:
-        data = read_json_file(input)
-        model = validate_model(data)
+        model = validate_model(iter_json_array(input))
     except Exception as e:
         console.print(f"Input model validation failed: {e}", style="error")
         raise typer.Exit(1)
@@ -91,7 +90,7 @@ def slice(
         raise typer.Exit(1)
 
     try:
-        write_json_file(output, [c.model_dump() for c in subtree.root])
+        write_json_file(output, (c.model_dump() for c in subtree.root))
     except Exception as e:
         console.print(f"Failed to write output: {e}", style="error")
         raise typer.Exit(1)
@@ -99,6 +98,25 @@ def slice(
     console.print(f"Extracted {len(subtree.root)} nodes from '{capability_name}' -> {output}", style="success")
 
 
+@app.command()
+def merge(
+    shards: List[Path] = typer.Argument(..., exists=True, dir_okay=False, readable=True, help="Shard output files (from business-capgen --shard i/N)"),
+    output: Path = typer.Option(..., dir_okay=False, help="Output JSON path for the merged model"),
+    compact: bool = typer.Option(False, "--compact", help="Write the output without indentation"),
+):
+    """Recombine the outputs of a sharded run into one model."""
+    console.print(Panel.fit("bcm-wrench: Merging shard outputs", title="merge"))
+
+    try:
+        # One streaming pass over every shard; the output is only replaced once it is complete
+        count = save_progress(output, merge_shards(shards), compact=compact)
+    except Exception as e:
+        console.print(f"Merge failed: {e}", style="error")
+        raise typer.Exit(1)
+
+    console.print(f"Merged {len(shards)} shards into {count} nodes -> {output}", style="success")
+
+
 def main() -> None:
     app()
 
@@ -0,0 +1,210 @@
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from capability_agent.io_utils import ContextFormat, ContextOptions
+from capability_agent.models import CapabilityList
+from capability_agent.retry import RetryPolicy
+from capability_agent.service import augment_model_batch
+
+
+class StubBatchAPI(BaseHTTPRequestHandler):
+    """Minimal Files + Batches API: every batch completes on the second poll."""
+
+    state = {}
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, payload, content_type="application/json"):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("content-type", content_type)
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _flaky(self, key):
+        """Fail the first request of each kind listed in ``state["flaky"]`` once."""
+        if key not in self.state.get("flaky", ()) or key in self.state.setdefault("failed", set()):
+            return False
+        self.state["failed"].add(key)
+        self.send_response(503)
+        self.send_header("content-length", "0")
+        self.end_headers()
+        return True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["content-length"]))
+        if self._flaky(self.path.rsplit("/", 1)[-1]):
+            return
+        if self.path.endswith("/files"):
+            self.state["uploads"] += 1
+            self.state["requests"] = [
+                json.loads(line) for line in body.decode("utf-8").splitlines() if line.startswith('{"custom_id"')
+            ]
+            self._send({"id": "file-in", "object": "file", "bytes": len(body), "created_at": 0,
+                        "filename": "requests.jsonl", "purpose": "batch", "status": "processed"})
+        elif self.path.endswith("/batches"):
+            self._send(self._batch("validating"))
+
+    def do_GET(self):
+        if "/batches/" in self.path:
+            if self._flaky("poll"):
+                return
+            self.state["polls"] += 1
+            self._send(self._batch("completed" if self.state["polls"] > 1 else "in_progress"))
+        elif self.path.endswith("/files/file-out/content"):
+            lines = []
+            for request in self.state["requests"]:
+                if "Leaf 2" in request["body"]["input"]:
+                    lines.append({"custom_id": request["custom_id"], "response": {"status_code": 400, "body": {"error": {"message": "bad"}}}})
+                    continue
+                text = json.dumps({"items": [{"name": "Child", "description": "Generated"}]})
+                body = {
+                    "status": "completed",
+                    "model": request["body"]["model"],
+                    "output": [{"type": "message", "content": [{"type": "output_text", "text": text}]}],
+                    "usage": {"input_tokens": 10, "output_tokens": 5, "total_tokens": 15},
+                }
+                lines.append({"custom_id": request["custom_id"], "response": {"status_code": 200, "body": body}})
+            payload = "\n".join(json.dumps(line) for line in lines).encode("utf-8")
+            if "content" in self.state.get("flaky", ()) and "content" not in self.state.setdefault("failed", set()):
+                # Cut the download after the first line
+                self.state["failed"].add("content")
+                self.send_response(200)
+                self.send_header("content-length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload[: payload.index(b"\n") + 1])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            self._send(payload, "application/jsonl")
+
+    def _batch(self, status):
+        return {"id": "batch_1", "object": "batch", "endpoint": "/v1/responses", "input_file_id": "file-in",
+                "completion_window": "24h", "created_at": 0, "status": status,
+                "output_file_id": "file-out" if status == "completed" else None}
+
+
+@pytest.fixture
+def stub_api(monkeypatch):
+    StubBatchAPI.state = {"uploads": 0, "polls": 0, "requests": []}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubBatchAPI)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    yield StubBatchAPI.state
+    server.shutdown()
+
+
+def _setup(tmp_path, leaves):
+    root_id = str(uuid.uuid4())
+    data = [{"id": root_id, "name": "Root", "description": "Root", "parent": None, "capability": 0}]
+    for i in range(leaves):
+        data.append({"id": str(uuid.uuid4()), "name": f"Leaf {i}", "description": "Leaf", "parent": root_id, "capability": 0})
+    input_path = tmp_path / "model.json"
+    input_path.write_text(json.dumps(data), encoding="utf-8")
+    template_path = tmp_path / "template.j2"
+    template_path.write_text("Prompt for {{ node.name }}", encoding="utf-8")
+    return data, input_path, template_path
+
+
+def _run(data, input_path, template_path, restart_mode=True, **kwargs):
+    return augment_model_batch(
+        model=CapabilityList.model_validate(data),
+        template_path=template_path,
+        context_opts=ContextOptions(),
+        context_format=ContextFormat.MARKDOWN,
+        system_message="system",
+        max_capabilities=3,
+        restart_mode=restart_mode,
+        input_path=input_path if restart_mode else None,
+        state_path=input_path.with_name("model.json.batch"),
+        poll_interval=0,
+        **kwargs,
+    )
+
+
+def test_batch_submits_polls_and_ingests(tmp_path, stub_api):
+    data, input_path, template_path = _setup(tmp_path, 2)
+
+    result, usage = _run(data, input_path, template_path)
+
+    assert stub_api["uploads"] == 1
+    request = stub_api["requests"][0]
+    assert request["url"] == "/v1/responses"
+    assert request["body"]["text"]["format"]["type"] == "json_schema"
+    schema = request["body"]["text"]["format"]["schema"]
+    item = schema["$defs"]["CapabilityItem"]
+    assert schema["additionalProperties"] is False and schema["required"] == ["items"]
+    assert item["additionalProperties"] is False and item["required"] == ["name", "description"]
+    assert len(result.root) == 3 + 2
+    assert usage.total_tokens == 30
+    saved = json.loads(input_path.read_text(encoding="utf-8"))
+    assert len(saved) == 5
+    assert not (tmp_path / "model.json.batch").exists()
+
+
+def test_batch_retries_transient_upload_poll_and_download_failures(tmp_path, stub_api):
+    data, input_path, template_path = _setup(tmp_path, 2)
+    stub_api["flaky"] = {"files", "batches", "poll", "content"}
+
+    result, usage = _run(
+        data, input_path, template_path, retry_policy=RetryPolicy(base_delay=0.01, max_delay=0.01)
+    )
+
+    assert stub_api["failed"] == {"files", "batches", "poll", "content"}
+    assert stub_api["uploads"] == 1
+    # Every leaf got its children once, none twice from the re-read result file
+    index = result.index()
+    assert [len(index.children(node["id"])) for node in data[1:]] == [1, 1]
+    assert usage.total_tokens == 30
+
+
+def test_batch_resumes_from_state_and_journals_failures(tmp_path, stub_api):
+    data, input_path, template_path = _setup(tmp_path, 3)
+    # A previous run submitted the batch and was interrupted while polling
+    stub_api["requests"] = [
+        {"custom_id": node["id"], "body": {"model": "gpt-5", "input": f"Prompt for {node['name']}"}}
+        for node in data[1:]
+    ]
+    (tmp_path / "model.json.batch").write_text(json.dumps({"batch_id": "batch_1"}), encoding="utf-8")
+
+    with pytest.raises(Exception, match="1 out of 3 leaves failed"):
+        _run(data, input_path, template_path)
+
+    assert stub_api["uploads"] == 0
+    saved = json.loads(input_path.read_text(encoding="utf-8"))
+    by_name = {n["name"]: n for n in saved}
+    assert by_name["Leaf 2"]["capability"] == -1
+    assert by_name["Leaf 0"]["capability"] == 1
+    assert sum(1 for n in saved if n["name"] == "Child") == 2
+    assert not (tmp_path / "model.json.batch").exists()
+
+
+def test_failed_batch_without_restart_keeps_its_state_for_a_restart(tmp_path, stub_api):
+    data, input_path, template_path = _setup(tmp_path, 3)
+    stub_api["requests"] = [
+        {"custom_id": node["id"], "body": {"model": "gpt-5", "input": f"Prompt for {node['name']}"}}
+        for node in data[1:]
+    ]
+    state_path = tmp_path / "model.json.batch"
+    state_path.write_text(json.dumps({"batch_id": "batch_1"}), encoding="utf-8")
+
+    # Without --restart the results only live in memory: the paid batch must stay recorded
+    with pytest.raises(Exception, match="1 out of 3 leaves failed"):
+        _run(data, input_path, template_path, restart_mode=False)
+    assert state_path.exists()
+
+    # A restart ingests the same batch into the model and journals the failure
+    with pytest.raises(Exception, match="1 out of 3 leaves failed"):
+        _run(data, input_path, template_path)
+    assert stub_api["uploads"] == 0
+    assert not state_path.exists()
+    saved = json.loads(input_path.read_text(encoding="utf-8"))
+    assert sum(1 for n in saved if n["name"] == "Child") == 2
@@ -0,0 +1,28 @@
+from benchmarks.run import Scenario, compare, run_scenario
+from benchmarks.synthetic import generate_model
+from capability_agent.models import validate_model
+
+
+def test_synthetic_model_shape_is_deterministic_and_valid():
+    model = generate_model(100, fanout=3, depth=3, seed=7)
+    assert model == generate_model(100, fanout=3, depth=3, seed=7)
+    assert len(model) == 100
+    index = validate_model(model).index()
+    # depth 3 with fan-out 3 holds 13 nodes per root, so several roots are needed
+    assert len(index.roots()) == 8
+    assert all(c.capability == 0 for c in index.leaves())
+    assert all(c.capability == 1 for c in index if not index.is_leaf(c.id))
+
+
+def test_scenario_with_injected_failures_retries_and_records_stages(tmp_path):
+    result = run_scenario(Scenario(40, "tree", "full_tree,parent", restart=True, tasks=4), tmp_path, failure_rate=0.2)
+    assert result["error"] is None
+    assert result["injected_failures"] > 0
+    assert result["calls"] == result["leaves"] + result["injected_failures"]
+    assert result["output_nodes"] == 40 + 5 * result["leaves"]
+    assert set(result["stages"]) == {"generate", "write_input", "load", "render", "augment", "write_output"}
+
+    slower = {"s": {"stages": {"augment": result["stages"]["augment"] + 1.0}}}
+    baseline = {"s": {"stages": {"augment": result["stages"]["augment"]}}}
+    assert compare(slower, baseline, tolerance=0.25, min_delta=0.05)
+    assert not compare(baseline, baseline, tolerance=0.25, min_delta=0.05)
@@ -0,0 +1,76 @@
+import uuid
+
+import pytest
+
+from capability_agent.models import Capability, CapabilityList
+
+
+def _node(name, parent=None, **extra):
+    return {"id": str(uuid.uuid4()), "name": name, "description": name, "parent": parent, **extra}
+
+
+def test_index_tracks_children_and_pending_leaves_incrementally():
+    root = _node("Root")
+    leaf_a = _node("A", root["id"], capability=0)
+    leaf_b = _node("B", root["id"], capability=1)
+    model = CapabilityList.model_validate([root, leaf_a, leaf_b])
+    index = model.index()
+
+    assert [c.id for c in index.leaves()] == [leaf_a["id"], leaf_b["id"]]
+    assert [c.id for c in index.pending_leaves()] == [leaf_a["id"]]
+    assert index.parent(leaf_a["id"]).id == root["id"]
+    assert [c.id for c in index.siblings(leaf_a["id"])] == [leaf_b["id"]]
+
+    child = Capability.model_validate(_node("A1", leaf_a["id"], capability=0))
+    index.add(child)
+    assert not index.is_leaf(leaf_a["id"])
+    assert [c.id for c in index.pending_leaves()] == [child.id]
+    # The index shares the model's list
+    assert model.root[-1] is child
+
+    index.replace(child.model_copy(update={"capability": 1}))
+    assert index.pending_leaves() == []
+    index.replace(index[leaf_b["id"]].model_copy(update={"capability": -1}))
+    assert [c.id for c in index.pending_leaves()] == [leaf_b["id"]]
+
+    with pytest.raises(ValueError):
+        index.add(child)
+    with pytest.raises(ValueError):
+        index.replace(child.model_copy(update={"parent": None}))
+
+
+def test_trusted_validation_checks_structure_and_integrity_only():
+    from capability_agent.models import validate_model
+
+    root = {"id": "root", "name": "Root", "description": "Root", "parent": None}
+    child = {"id": "child", "name": "Child", "description": "Child", "parent": "root", "capability": 1}
+    model = validate_model(iter([root, child]), trust_input=True)
+    assert [c.id for c in model.root] == ["root", "child"]
+    assert model.root[1].capability == 1
+    assert model.root[1].model_dump() == child
+
+    with pytest.raises(Exception):
+        validate_model([root, child])  # ids are not UUID4 when fully validated
+    with pytest.raises(ValueError, match="Duplicate"):
+        validate_model([root, root], trust_input=True)
+    with pytest.raises(ValueError, match="missing parent"):
+        validate_model([child], trust_input=True)
+    with pytest.raises(ValueError, match="string 'name'"):
+        validate_model([{"id": "x", "description": "d"}], trust_input=True)
+
+
+def test_ancestor_paths_are_memoized_and_follow_added_nodes():
+    nodes = [_node("L0")]
+    for depth in range(1, 12):
+        nodes.append(_node(f"L{depth}", nodes[-1]["id"]))
+    index = CapabilityList.model_validate(nodes).index()
+
+    deepest = nodes[-1]["id"]
+    assert [c.name for c in index.ancestors(deepest)] == [f"L{d}" for d in range(11)]
+    assert index.depth(deepest) == 11 and index.ancestors(nodes[0]["id"]) == []
+    # The walk filled in every ancestor's path on the way down
+    assert index.ancestor_ids(nodes[5]["id"]) == tuple(n["id"] for n in nodes[:5])
+
+    child = Capability.model_validate(_node("L12", deepest))
+    index.add(child)
+    assert index.ancestor_ids(child.id) == tuple(n["id"] for n in nodes)
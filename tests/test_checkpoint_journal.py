@@ -0,0 +1,70 @@
+import json
+import uuid
+
+from capability_agent.journal import CheckpointJournal
+from capability_agent.models import CapabilityList
+
+
+def _model_data():
+    root_id = str(uuid.uuid4())
+    return [
+        {"id": root_id, "name": "Root", "description": "Root", "parent": None, "capability": 0},
+        {"id": str(uuid.uuid4()), "name": "Leaf A", "description": "A", "parent": root_id, "capability": 0},
+        {"id": str(uuid.uuid4()), "name": "Leaf B", "description": "B", "parent": root_id, "capability": 0},
+    ]
+
+
+def test_journal_replay_restores_uncompacted_progress(tmp_path):
+    model_data = _model_data()
+    leaf_a_id, leaf_b_id = model_data[1]["id"], model_data[2]["id"]
+    input_path = tmp_path / "model.json"
+    input_path.write_text(json.dumps(model_data), encoding="utf-8")
+
+    child = {
+        "id": str(uuid.uuid4()),
+        "name": "Child",
+        "description": "Child description",
+        "parent": leaf_a_id,
+        "capability": 1,
+    }
+    journal = CheckpointJournal(input_path, compact_every=100)
+    journal.append_success(leaf_a_id, [child])
+    journal.append_failure(leaf_b_id, "boom")
+    journal.close()
+    # Simulate a crash mid-write: torn trailing record must be ignored
+    with journal.path.open("a", encoding="utf-8") as f:
+        f.write('{"op": "done", "leaf": ')
+
+    # The model file itself was never rewritten
+    assert json.loads(input_path.read_text(encoding="utf-8")) == model_data
+
+    model = CapabilityList.model_validate(model_data)
+    assert CheckpointJournal(input_path).replay(model.index()) == 2
+
+    by_id = model.by_id()
+    assert by_id[leaf_a_id].capability == 1
+    assert by_id[child["id"]].parent == leaf_a_id
+    assert by_id[leaf_b_id].capability == -1
+    assert by_id[leaf_b_id].error == "boom"
+
+    # Replaying again (e.g. compaction crashed before truncating) must not duplicate children
+    assert CheckpointJournal(input_path).replay(model.index()) == 2
+    assert len(model.root) == 4
+
+
+def test_journal_compaction_rewrites_model_and_truncates(tmp_path):
+    model_data = _model_data()
+    input_path = tmp_path / "model.json"
+    input_path.write_text(json.dumps(model_data), encoding="utf-8")
+
+    journal = CheckpointJournal(input_path, compact_every=1)
+    journal.append_failure(model_data[1]["id"], "boom")
+    assert journal.should_compact
+
+    model_data[1]["capability"] = -1
+    journal.compact(model_data)
+
+    assert not journal.path.exists()
+    assert not journal.should_compact
+    saved = json.loads(input_path.read_text(encoding="utf-8"))
+    assert saved[1]["capability"] == -1
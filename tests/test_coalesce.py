@@ -0,0 +1,83 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+
+from capability_agent.coalesce import PromptCoalescer
+from capability_agent.io_utils import ContextFormat, ContextOptions
+from capability_agent.llm import UsageStats
+from capability_agent.models import CapabilityList
+from capability_agent.service import augment_model
+
+
+def _duplicate_leaves_model():
+    sections = [str(uuid.uuid4()), str(uuid.uuid4())]
+    data = [{"id": s, "name": "Section", "description": "Section", "parent": None} for s in sections]
+    for section in sections:
+        for _ in range(2):
+            data.append({"id": str(uuid.uuid4()), "name": "Reporting", "description": "Reports", "parent": section})
+    return CapabilityList.model_validate(data)
+
+
+# None leaves the engine default, which is off
+@pytest.mark.parametrize("coalesce, expected_calls", [(True, 1), (False, 4), (None, 4)])
+def test_identical_prompts_share_one_in_flight_call(tmp_path, monkeypatch, coalesce, expected_calls):
+    template_path = tmp_path / "template.j2"
+    template_path.write_text("Decompose {{ node.name }} under {{ parent.name }}", encoding="utf-8")
+    monkeypatch.setattr("capability_agent.service.ensure_client", lambda *args, **kwargs: object())
+    calls = []
+
+    def fake_call_openai(client, system_message, user_prompt, max_capabilities):
+        calls.append(user_prompt)
+        time.sleep(0.3)  # keep the call in flight while the duplicates render
+        items = [{"name": f"Child {k}", "description": "Generated"} for k in range(2)]
+        return items, UsageStats(model_name="fake", input_tokens=7, output_tokens=3, total_tokens=10)
+
+    monkeypatch.setattr("capability_agent.service.call_openai", fake_call_openai)
+    extra = {} if coalesce is None else {"coalesce": coalesce}
+    result, usage = augment_model(
+        model=_duplicate_leaves_model(),
+        template_path=template_path,
+        context_opts=ContextOptions(parent=True),
+        context_format=ContextFormat.MARKDOWN,
+        system_message="system",
+        max_capabilities=2,
+        tasks=4,
+        **extra,
+    )
+
+    assert len(calls) == expected_calls
+    assert usage.coalesced_calls == 4 - expected_calls
+    assert usage.total_tokens == 10 * expected_calls
+    assert usage.coalesced_saved_tokens == 10 * (4 - expected_calls)
+    # Every leaf still gets its own children with fresh ids
+    index = result.index()
+    assert len(result.root) == 6 + 8 and len({c.id for c in result.root}) == 14
+    assert all(len(index.children(leaf.id)) == 2 for leaf in index if leaf.name == "Reporting")
+
+
+def test_async_followers_share_the_leaders_result_and_failure():
+    coalescer = PromptCoalescer()
+    started = []
+
+    async def call(result):
+        started.append(result)
+        await asyncio.sleep(0.05)
+        if isinstance(result, Exception):
+            raise result
+        return [{"name": "Child", "description": "x"}], UsageStats(model_name="fake", total_tokens=5)
+
+    async def main():
+        ok = await asyncio.gather(*(coalescer.acall("same", lambda: call("ok")) for _ in range(3)))
+        failed = await asyncio.gather(
+            *(coalescer.acall("bad", lambda: call(ValueError("boom"))) for _ in range(2)), return_exceptions=True
+        )
+        return ok, failed
+
+    ok, failed = asyncio.run(main())
+    assert started == ["ok", failed[0]]
+    assert [usage.coalesced_calls for _, usage in ok] == [0, 1, 1]
+    assert all(isinstance(e, ValueError) for e in failed)
+    # Finished calls are not kept: the next identical prompt calls again
+    assert asyncio.run(coalescer.acall("same", lambda: call("ok")))[1].coalesced_calls == 0
@@ -0,0 +1,37 @@
+import importlib.util
+
+import pytest
+
+from capability_agent.httppool import HttpSettings
+from capability_agent.llm import LoggingTransport, ensure_async_client, ensure_client, shutdown_openai_logging
+
+
+def _pool(transport):
+    if isinstance(transport, LoggingTransport):
+        transport = transport.transport
+    return transport._pool
+
+
+def test_pool_is_sized_to_concurrency_with_or_without_logging(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    settings = HttpSettings(connect_timeout=3.0, read_timeout=90.0)
+
+    plain = ensure_client(http_settings=settings, concurrency=64)
+    try:
+        logged = ensure_client(tmp_path, "basic", http_settings=settings, concurrency=64)
+    finally:
+        shutdown_openai_logging()
+    for client in (plain, logged):
+        pool = _pool(client._client._transport)
+        assert pool._max_connections == pool._max_keepalive_connections == 68
+        assert client.timeout.connect == 3.0 and client.timeout.read == 90.0
+    assert isinstance(logged._client._transport, LoggingTransport)
+
+    async_client = ensure_async_client(http_settings=HttpSettings(max_connections=16), concurrency=200)
+    assert async_client._client._transport._pool._max_connections == 16
+
+
+@pytest.mark.skipif(importlib.util.find_spec("h2") is not None, reason="h2 is installed")
+def test_http2_requires_h2():
+    with pytest.raises(RuntimeError, match="h2"):
+        HttpSettings(http2=True).transport_kwargs()
@@ -0,0 +1,35 @@
+import json
+
+from capability_agent.jsonstream import ItemStreamParser
+
+
+ITEMS = [
+    {"name": "Quoted \"name\"", "description": "Line one\nline two with a \\ backslash"},
+    {"name": "Unicode é中", "description": "Braces { and } and [brackets], plus \"quotes\""},
+    {"name": "Plain", "description": "Simple"},
+]
+
+
+def test_items_emitted_as_objects_close_for_any_split():
+    text = json.dumps({"items": ITEMS})
+    ascii_text = json.dumps({"items": ITEMS}, ensure_ascii=True)
+    for payload in (text, ascii_text):
+        for size in (1, 2, 3, 7, len(payload)):
+            parser = ItemStreamParser()
+            emitted = []
+            for start in range(0, len(payload), size):
+                emitted.extend(parser.feed(payload[start:start + size]))
+            assert emitted == ITEMS
+            assert parser.items == ITEMS
+
+
+def test_item_reported_exactly_when_its_object_closes():
+    parser = ItemStreamParser()
+    assert parser.feed('{"items": [{"name": "A", "description": "a"') == []
+    assert parser.feed('}, {"name": "B"') == [{"name": "A", "description": "a"}]
+    assert parser.feed(', "description": "b", "extra": {"name": "nested"}}]}') == [{"name": "B", "description": "b"}]
+
+
+def test_incomplete_items_are_skipped():
+    parser = ItemStreamParser()
+    assert parser.feed('{"items": [{"name": "Only name"}, {"name": "X", "description": ""}]}') == []
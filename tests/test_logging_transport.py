@@ -44,3 +44,117 @@ def test_full_logging_emits_response_body():
     response_log = json.loads(logs[-1])
     assert response_log["type"] == "response"
     assert response_log.get("body") == body
+
+
+def test_async_transport_logs_response_body():
+    import asyncio
+
+    from capability_agent.llm import AsyncLoggingTransport
+
+    body = {"foo": "bar"}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=body, request=request)
+
+    log_stream = StringIO()
+    logger = logging.getLogger("capability_agent.tests.logging.async")
+    logger.setLevel(logging.INFO)
+    logger.handlers = []
+    stream_handler = logging.StreamHandler(log_stream)
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(stream_handler)
+    logger.propagate = False
+
+    transport = AsyncLoggingTransport(httpx.MockTransport(handler), logger=logger, log_level="full", log_body=True)
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.post("https://example.com", json={"hello": "world"})
+            assert response.json() == body
+
+    asyncio.run(run())
+
+    logs = [line for line in log_stream.getvalue().splitlines() if line.strip()]
+    response_log = json.loads(logs[-1])
+    assert response_log["type"] == "response"
+    assert response_log.get("body") == body
+
+
+def test_background_writer_caps_bodies_and_samples_failures(tmp_path):
+    from capability_agent.llm import setup_openai_logging, shutdown_openai_logging
+    from capability_agent.logwriter import LogSettings
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        status = 500 if request.url.path == "/fail" else 200
+        return httpx.Response(status, content=b"x" * 5000, request=request)
+
+    settings = LogSettings(body_limit=100, only_failed=True)
+    logger = setup_openai_logging(tmp_path, "full", settings)
+    transport = LoggingTransport(httpx.MockTransport(handler), logger, "full", log_body=True, settings=settings)
+    with httpx.Client(transport=transport) as client:
+        client.post("https://example.com/ok", content=b"y" * 5000)
+        client.post("https://example.com/fail", content=b"y" * 5000)
+    shutdown_openai_logging()
+
+    (log_file,) = tmp_path.glob("openai-requests-*.log")
+    entries = [json.loads(line) for line in log_file.read_text(encoding="utf-8").splitlines()]
+    assert [e["type"] for e in entries] == ["request", "response"]
+    assert all(e["url"].endswith("/fail") for e in entries)
+    assert entries[1]["status_code"] == 500
+    assert entries[0]["body_truncated"] and len(entries[0]["body"]) == 100
+    assert entries[1]["body_truncated"] and len(entries[1]["body"]) == 100
+
+
+def test_rotated_logs_are_gzipped(tmp_path):
+    import gzip
+
+    from capability_agent.logwriter import CompressingRotatingFileHandler, LogSettings
+
+    handler = CompressingRotatingFileHandler(tmp_path / "requests.log", LogSettings(max_bytes=200, backup_count=2))
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger = logging.getLogger("capability_agent.tests.rotation")
+    logger.handlers = [handler]
+    logger.propagate = False
+    for i in range(10):
+        logger.warning("line %d %s", i, "z" * 50)
+    handler.close()
+
+    backups = sorted(tmp_path.glob("requests.log.*.gz"))
+    assert [p.name for p in backups] == ["requests.log.1.gz", "requests.log.2.gz"]
+    assert gzip.decompress(backups[0].read_bytes()).startswith(b"line")
+
+
+def test_full_log_queue_drops_and_counts_entries(tmp_path, monkeypatch):
+    import threading
+
+    from capability_agent.logwriter import (
+        CompressingRotatingFileHandler,
+        LogSettings,
+        start_background_writer,
+        stop_background_writer,
+    )
+
+    # A stalled disk: the writer thread blocks on its first record
+    released = threading.Event()
+    emit = CompressingRotatingFileHandler.emit
+
+    def stalled_emit(self, record):
+        released.wait(5)
+        emit(self, record)
+
+    monkeypatch.setattr(CompressingRotatingFileHandler, "emit", stalled_emit)
+    logger = logging.getLogger("capability_agent.tests.queue")
+    logger.handlers = []
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    start_background_writer(logger, tmp_path / "requests.log", LogSettings(queue_size=2))
+    for i in range(10):
+        logger.info(json.dumps({"type": "request", "n": i}))
+    released.set()
+    stop_background_writer()
+    logger.handlers = []
+
+    entries = [json.loads(line) for line in (tmp_path / "requests.log").read_text(encoding="utf-8").splitlines()]
+    written = [e for e in entries if e["type"] == "request"]
+    assert 1 <= len(written) <= 3
+    assert entries[-1] == {"type": "dropped", "entries": 10 - len(written)}
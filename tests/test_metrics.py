@@ -0,0 +1,65 @@
+import json
+import uuid
+from types import SimpleNamespace
+
+from capability_agent.io_utils import ContextFormat, ContextOptions
+from capability_agent.llm import CapabilityResponse
+from capability_agent.metrics import RunMetrics
+from capability_agent.models import CapabilityList
+from capability_agent.service import augment_model
+
+
+def _fake_client():
+    def parse(**kwargs):
+        return SimpleNamespace(
+            status="completed",
+            output=[],
+            output_parsed=CapabilityResponse.model_validate({"items": [{"name": "Child", "description": "Generated"}]}),
+            usage=SimpleNamespace(input_tokens=10, output_tokens=5, total_tokens=15),
+        )
+
+    return SimpleNamespace(responses=SimpleNamespace(parse=parse))
+
+
+def test_stage_spans_trace_and_metrics_export(tmp_path, monkeypatch):
+    root_id = str(uuid.uuid4())
+    model_data = [{"id": root_id, "name": "Root", "description": "Root", "parent": None}]
+    leaf_ids = [str(uuid.uuid4()) for _ in range(4)]
+    model_data += [{"id": i, "name": f"Leaf {n}", "description": "Leaf", "parent": root_id} for n, i in enumerate(leaf_ids)]
+    input_path = tmp_path / "model.json"
+    input_path.write_text(json.dumps(model_data), encoding="utf-8")
+    template_path = tmp_path / "template.j2"
+    template_path.write_text("Prompt for {{ node.name }}", encoding="utf-8")
+    monkeypatch.setattr("capability_agent.service.ensure_client", lambda *args, **kwargs: _fake_client())
+
+    trace_path = tmp_path / "trace.jsonl"
+    metrics_path = tmp_path / "metrics.prom"
+    metrics = RunMetrics(trace_path)
+    metrics.export_every(metrics_path, interval=60)
+    augment_model(
+        model=CapabilityList.model_validate(model_data),
+        template_path=template_path,
+        context_opts=ContextOptions(parent=True),
+        context_format=ContextFormat.MARKDOWN,
+        system_message="system",
+        max_capabilities=1,
+        tasks=2,
+        restart_mode=True,
+        input_path=input_path,
+        metrics=metrics,
+    )
+    metrics.close()
+
+    spans = [json.loads(line) for line in trace_path.read_text(encoding="utf-8").splitlines()]
+    for stage in ("context", "render", "api", "validate", "build", "lock_wait", "checkpoint"):
+        assert sorted(s["leaf"] for s in spans if s["stage"] == stage) == sorted(leaf_ids), stage
+    summary = {row[0]: row for row in metrics.summary()}
+    assert summary["api"][1] == 4
+    assert summary["api"][2] <= summary["api"][3] <= summary["api"][4]
+    assert metrics.leaves_succeeded == 4 and metrics.max_in_flight >= 1 and metrics.in_flight == 0
+
+    text = metrics_path.read_text(encoding="utf-8")
+    assert 'capability_agent_stage_seconds_count{stage="api"} 4' in text
+    assert 'capability_agent_leaves_total{outcome="success"} 4' in text
+    assert "capability_agent_lock_wait_seconds " in text
+    assert metrics.render_metrics(openmetrics=True).endswith("# EOF\n")
@@ -0,0 +1,62 @@
+import json
+import uuid
+
+import pytest
+
+from capability_agent import io_utils
+from capability_agent.io_utils import iter_json_array, read_json_file, save_progress, write_json_file
+
+
+NODES = [
+    {"id": str(uuid.uuid4()), "name": f"Node {i}", "description": "Line\nbreak, \"quotes\" and é", "parent": None}
+    for i in range(50)
+]
+
+
+@pytest.mark.parametrize("name", ["model.json", "model.json.gz", "model.json.zst"])
+def test_streaming_round_trip(tmp_path, monkeypatch, name):
+    if name.endswith(".zst"):
+        pytest.importorskip("zstandard")
+    path = tmp_path / name
+    write_json_file(path, iter(NODES))
+    # Tiny reads force elements to straddle chunk boundaries
+    monkeypatch.setattr(io_utils, "_READ_CHUNK", 5)
+    assert list(iter_json_array(path)) == NODES
+    assert read_json_file(path) == NODES
+
+
+@pytest.mark.parametrize("chunk", [1, 2, 3, 4, 5, 7])
+def test_numbers_split_across_reads_are_not_cut_short(tmp_path, monkeypatch, chunk):
+    values = [-4500.0, 12, 1e-7, 3.25E+10, "x", -0.5, 0]
+    path = tmp_path / "numbers.json"
+    for text in ("[-4500.0]", json.dumps(values), json.dumps(values, indent=2)):
+        path.write_text(text, encoding="utf-8")
+        monkeypatch.setattr(io_utils, "_READ_CHUNK", chunk)
+        assert list(iter_json_array(path)) == json.loads(text)
+
+
+def test_indented_output_matches_json_dump_and_compact_is_smaller(tmp_path):
+    path = tmp_path / "model.json"
+    write_json_file(path, iter(NODES))
+    assert path.read_text(encoding="utf-8") == json.dumps(NODES, ensure_ascii=False, indent=2)
+    compact_path = tmp_path / "compact.json"
+    write_json_file(compact_path, iter(NODES), compact=True)
+    assert json.loads(compact_path.read_text(encoding="utf-8")) == NODES
+    assert compact_path.stat().st_size < path.stat().st_size
+
+
+def test_save_progress_keeps_compression(tmp_path):
+    path = tmp_path / "model.json.gz"
+    save_progress(path, iter(NODES))
+    assert path.read_bytes()[:2] == b"\x1f\x8b"
+    assert list(iter_json_array(path)) == NODES
+
+
+def test_iter_json_array_rejects_non_arrays_and_truncation(tmp_path):
+    path = tmp_path / "bad.json"
+    path.write_text('{"a": 1}', encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_json_array(path))
+    path.write_text('[{"a": 1}, {"b"', encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_json_array(path))
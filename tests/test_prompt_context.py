@@ -0,0 +1,188 @@
+import uuid
+
+import pytest
+
+from capability_agent.io_utils import ContextFormat, ContextOptions
+from capability_agent.models import Capability, CapabilityList
+from capability_agent.prompting import (
+    ContextCache,
+    build_prompt_context,
+    format_capabilities_as_json,
+    format_capabilities_as_markdown,
+    format_capabilities_as_tree,
+    format_capabilities_as_xml,
+    serialize_capability_minimal,
+)
+
+FORMAT_FUNCS = {
+    ContextFormat.JSON: format_capabilities_as_json,
+    ContextFormat.MARKDOWN: format_capabilities_as_markdown,
+    ContextFormat.XML: format_capabilities_as_xml,
+    ContextFormat.TREE: format_capabilities_as_tree,
+}
+
+
+def _model():
+    root = {"id": str(uuid.uuid4()), "name": "Root", "description": "Root \"quoted\"\n\ntext  ", "parent": None}
+    nodes = [root]
+    for i in range(3):
+        nodes.append(
+            {"id": str(uuid.uuid4()), "name": f"Leaf {i}", "description": f"Desc {i}\nline", "parent": root["id"]}
+        )
+    return CapabilityList.model_validate(nodes)
+
+
+@pytest.mark.parametrize("fmt", list(ContextFormat))
+def test_cached_sections_match_uncached_formatting(fmt):
+    model = _model()
+    index = model.index()
+    cache = ContextCache(index)
+    by_id = model.by_id()
+    leaf = model.root[2]
+
+    ctx = build_prompt_context(index, leaf, ContextOptions(full_tree=True, parent=True, siblings=True), fmt, cache)
+
+    fmt_func = FORMAT_FUNCS[fmt]
+    expected_tree = fmt_func([serialize_capability_minimal(c, by_id) for c in model.root])
+    expected_siblings = fmt_func(
+        [serialize_capability_minimal(c, by_id) for c in model.root[1:] if c.id != leaf.id]
+    )
+    assert ctx["formatted_full_tree"] == expected_tree
+    assert ctx["formatted_siblings"] == expected_siblings
+    assert ctx["formatted_parent"] == fmt_func([serialize_capability_minimal(model.root[0], by_id)])
+    assert ctx["formatted_capability"] == fmt_func([serialize_capability_minimal(leaf, by_id)])
+    assert cache.section([], fmt) == fmt_func([])
+
+
+def test_full_tree_rendered_once_and_invalidated_on_change():
+    model = _model()
+    index = model.index()
+    cache = ContextCache(index)
+
+    first = cache.full_tree(ContextFormat.MARKDOWN)
+    assert cache.full_tree(ContextFormat.MARKDOWN) is first
+
+    # State-only changes do not invalidate the rendered tree
+    index.replace(model.root[1].model_copy(update={"capability": 1}))
+    assert cache.full_tree(ContextFormat.MARKDOWN) is first
+
+    index.add(Capability(id=str(uuid.uuid4()), name="New", description="New", parent=model.root[1].id))
+    updated = cache.full_tree(ContextFormat.MARKDOWN)
+    assert updated is not first
+    assert "### New" in updated
+
+
+def test_prompt_renderer_compiles_once_and_reports_timing(tmp_path):
+    from capability_agent.prompting import PromptRenderer
+
+    template_path = tmp_path / "prompt.j2"
+    template_path.write_text("Decompose {{ node.name }} into {{ max_capabilities }}", encoding="utf-8")
+    cache_dir = tmp_path / "jinja-cache"
+
+    renderer = PromptRenderer(template_path, bytecode_cache_dir=cache_dir)
+    model = _model()
+    for leaf in model.root[1:]:
+        text, seconds = renderer.render_timed({"node": leaf, "max_capabilities": 3})
+        assert text == f"Decompose {leaf.name} into 3"
+        assert seconds >= 0
+
+    assert renderer.render_count == 3
+    assert renderer.max_seconds <= renderer.total_seconds
+    assert any(cache_dir.iterdir()), "bytecode cache should be written to disk"
+
+
+def test_cache_layout_renders_shared_prefix_once_with_example_template():
+    from pathlib import Path
+
+    from capability_agent.prompting import PromptRenderer
+
+    template_path = Path(__file__).resolve().parents[1] / "examples" / "prompt.j2"
+    plain = PromptRenderer(template_path)
+    layered = PromptRenderer(template_path, cache_layout=True)
+
+    model = _model()
+    index = model.index()
+    cache = ContextCache(index)
+    ctx = ContextOptions(full_tree=True, parent=True, siblings=True)
+    prompts = []
+    for leaf in model.root[1:]:
+        context = build_prompt_context(index, leaf, ctx, ContextFormat.MARKDOWN, cache)
+        context["max_capabilities"] = 4
+        text = layered.render(context)
+        assert text == plain.render(context)
+        prompts.append(text)
+
+    prefix = layered.shared_prefix(context)
+    assert "<capability_tree>" in prefix and "Decompose '" not in prefix
+    assert all(p.startswith(prefix) for p in prompts)
+    assert layered.shared_prefix(context) is prefix  # reused while the tree is unchanged
+
+
+def test_cache_layout_requires_blocks(tmp_path):
+    from capability_agent.prompting import PromptRenderer
+
+    template_path = tmp_path / "prompt.j2"
+    template_path.write_text("Decompose {{ node.name }}", encoding="utf-8")
+    with pytest.raises(ValueError, match="block shared"):
+        PromptRenderer(template_path, cache_layout=True)
+
+
+def _deep_model():
+    """Root -> A, B; A -> A1, A2; B -> B1 -> B1x; every description is distinctive."""
+    ids = {name: str(uuid.uuid4()) for name in ("Root", "A", "B", "A1", "A2", "B1", "B1x")}
+    parents = {"Root": None, "A": "Root", "B": "Root", "A1": "A", "A2": "A", "B1": "B", "B1x": "B1"}
+    return CapabilityList.model_validate([
+        {
+            "id": ids[name],
+            "name": name,
+            "description": f"Details of {name} " + "word " * 10,
+            "parent": ids[parent] if parent else None,
+        }
+        for name, parent in parents.items()
+    ])
+
+
+@pytest.mark.parametrize("fmt", [ContextFormat.JSON, ContextFormat.MARKDOWN, ContextFormat.XML])
+def test_windowed_full_tree_keeps_detail_near_the_leaf(fmt):
+    index = _deep_model().index()
+    leaf = next(c for c in index if c.name == "A1")
+    cache = ContextCache(index)
+    full = build_prompt_context(index, leaf, ContextOptions(full_tree=True), fmt, cache)["formatted_full_tree"]
+
+    # Budget for the leaf, its ancestors and its sibling only
+    near = ("A1", "A", "Root", "A2")
+    tokens = sum(cache.counter.count(cache.format([c], fmt)) for c in index if c.name in near)
+    opts = ContextOptions(full_tree=True, window_tokens=tokens)
+    windowed = build_prompt_context(index, leaf, opts, fmt, cache)["formatted_full_tree"]
+    for name in near:
+        assert f"Details of {name} " in windowed
+    for name in ("B", "B1", "B1x"):
+        assert f"Details of {name} " not in windowed and name in windowed
+    assert len(windowed) < len(full)
+
+    # Outline nodes render exactly as the uncached formatter would
+    expected = FORMAT_FUNCS[fmt]([
+        serialize_capability_minimal(c, index) if c.name in near
+        else {k: v for k, v in serialize_capability_minimal(c, index).items() if k != "description"}
+        for c in index
+    ])
+    assert windowed == expected
+
+    # A large window is the plain full tree; summaries keep the start of each description
+    opts = ContextOptions(full_tree=True, window_tokens=10**6)
+    assert build_prompt_context(index, leaf, opts, fmt, cache)["formatted_full_tree"] == full
+    opts = ContextOptions(full_tree=True, window_tokens=1, window_summary_chars=16)
+    summarized = build_prompt_context(index, leaf, opts, fmt, cache)["formatted_full_tree"]
+    assert "Details of B1x…" in summarized and "Details of A1 word" in summarized
+
+
+@pytest.mark.parametrize("fmt", list(ContextFormat))
+def test_parent_context_is_the_full_ancestor_chain(fmt):
+    model = _deep_model()
+    index = model.index()
+    leaf = next(c for c in index if c.name == "B1x")
+    ctx = build_prompt_context(index, leaf, ContextOptions(parent=True), fmt, ContextCache(index))
+
+    chain = [c for name in ("Root", "B", "B1") for c in index if c.name == name]
+    assert ctx["ancestors"] == chain and ctx["parent"] is chain[-1]
+    assert ctx["formatted_parent"] == FORMAT_FUNCS[fmt]([serialize_capability_minimal(c, index) for c in chain])
@@ -0,0 +1,37 @@
+import pytest
+
+from capability_agent.ratelimit import RateLimiter, parse_reset_duration
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("1s", 1.0), ("6m0s", 360.0), ("20ms", 0.02), ("1h2m3.5s", 3723.5), ("2", 2.0), ("", None)],
+)
+def test_parse_reset_duration(value, expected):
+    assert parse_reset_duration(value) == expected
+
+
+def test_limiter_throttles_and_adapts_to_headers():
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=1000, headroom=1.0)
+
+    assert limiter._reserve(400) == 0
+    assert limiter._reserve(400) == 0
+    # Only ~200 tokens left: the next request must wait for the bucket to refill
+    assert limiter._reserve(400) > 0
+
+    # The account actually allows far more; headers speed submissions back up
+    limiter.observe(200, {"x-ratelimit-limit-tokens": "100000", "x-ratelimit-remaining-tokens": "90000"})
+    assert limiter._reserve(400) == 0
+
+    # Over-estimated calls give tokens back once real usage is known
+    level = limiter.tokens.level
+    limiter.reconcile(estimated_tokens=400, actual_tokens=100)
+    assert limiter.tokens.level == pytest.approx(level + 300, abs=1)
+
+
+def test_429_pauses_all_workers_until_reset():
+    limiter = RateLimiter()
+    assert limiter._reserve(10) == 0  # unlimited until headers arrive
+
+    limiter.observe(429, {"x-ratelimit-reset-requests": "2s", "x-ratelimit-reset-tokens": "500ms"})
+    assert 1.5 < limiter._reserve(10) <= 2.0
@@ -0,0 +1,63 @@
+import os
+from types import SimpleNamespace
+
+from capability_agent.cache import ResponseCache
+from capability_agent.llm import CapabilityItem, CapabilityResponse, call_openai
+
+
+class CountingResponses:
+    def __init__(self):
+        self.calls = 0
+
+    def parse(self, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(
+            status="completed",
+            output=[],
+            output_parsed=CapabilityResponse(items=[CapabilityItem(name="Child", description="Desc")]),
+            usage=SimpleNamespace(input_tokens=10, output_tokens=5, total_tokens=15),
+            model="fake",
+        )
+
+
+def test_call_openai_hit_skips_network(tmp_path):
+    cache = ResponseCache(tmp_path / "cache")
+    responses = CountingResponses()
+    client = SimpleNamespace(responses=responses)
+
+    items, first = call_openai(client, "system", "prompt", 5, cache=cache)
+    again, second = call_openai(client, "system", "prompt", 5, cache=cache)
+    _, other = call_openai(client, "system", "another prompt", 5, cache=cache)
+
+    assert responses.calls == 2
+    assert again == items == [{"name": "Child", "description": "Desc"}]
+    assert (first.response_cache_misses, first.total_tokens) == (1, 15)
+    assert (second.response_cache_hits, second.total_tokens, second.response_cache_saved_tokens) == (1, 0, 15)
+
+    total = first + second + other
+    assert total.response_cache_lookups == 3
+    assert round(total.response_cache_hit_rate, 1) == 33.3
+    assert total.total_tokens == 30
+
+
+def test_cache_key_covers_max_items():
+    base = dict(model="m", instructions="s", input="p", generation={})
+    assert ResponseCache.key(**base, max_items=5) == ResponseCache.key(**base, max_items=5)
+    assert ResponseCache.key(**base, max_items=5) != ResponseCache.key(**base, max_items=6)
+
+
+def test_eviction_removes_least_recently_used(tmp_path):
+    cache = ResponseCache(tmp_path, max_bytes=600)
+    items = [{"name": "x" * 50, "description": "y" * 50}]
+    keys = [ResponseCache.key(n=i) for i in range(3)]
+    for age, key in enumerate(keys):
+        cache.put(key, items, {})
+        path = cache._path(key)
+        os.utime(path, (1000 + age, 1000 + age))
+    assert cache.get(keys[0]) is not None  # refreshes keys[0]; keys[1] is now the oldest
+
+    cache.put(ResponseCache.key(n=3), items, {})
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[2]) is not None
@@ -0,0 +1,77 @@
+import time
+
+import httpx
+import openai
+import pytest
+
+from capability_agent.llm import LLMError, call_openai
+from capability_agent.retry import CircuitBreaker, RetryPolicy, is_retryable, retry_after_seconds
+
+
+def _status_error(status, headers=None, cls=openai.APIStatusError):
+    request = httpx.Request("POST", "https://api.example.com/v1/responses")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return cls("error", response=response, body=None)
+
+
+def test_errors_are_classified():
+    assert is_retryable(_status_error(429, cls=openai.RateLimitError))
+    assert is_retryable(_status_error(503, cls=openai.InternalServerError))
+    assert is_retryable(openai.APIConnectionError(request=httpx.Request("GET", "https://x")))
+    assert not is_retryable(_status_error(400, cls=openai.BadRequestError))
+    assert not is_retryable(_status_error(401, cls=openai.AuthenticationError))
+    assert not is_retryable(ValueError("bug"))
+
+
+def test_retry_after_hint_is_honored():
+    assert retry_after_seconds(_status_error(429, {"retry-after-ms": "1500"})) == 1.5
+    assert retry_after_seconds(_status_error(429, {"retry-after": "3"})) == 3.0
+    assert retry_after_seconds(_status_error(429, {"retry-after": "soon-ish, maybe"})) is None
+    assert retry_after_seconds(_status_error(429, {"retry-after-ms": "n/a", "retry-after": "later"})) is None
+
+    schedule = RetryPolicy(base_delay=0.01, max_retry_after=2.0).schedule()
+    delay = schedule.next_delay(_status_error(429, {"retry-after": "10"}))
+    assert 2.0 <= delay <= 2.01
+
+
+def test_decorrelated_jitter_stays_within_bounds():
+    schedule = RetryPolicy(max_attempts=50, base_delay=0.5, max_delay=4.0).schedule()
+    delays = [schedule.next_delay(RuntimeError()) for _ in range(20)]
+    assert all(0.5 <= d <= 4.0 for d in delays)
+    assert len(set(delays)) > 1
+
+
+class _FakeResponses:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def parse(self, **kwargs):
+        self.calls += 1
+        raise self.errors.pop(0)
+
+
+class _FakeClient:
+    def __init__(self, errors):
+        self.responses = _FakeResponses(errors)
+
+
+def test_fatal_errors_fail_on_first_attempt():
+    client = _FakeClient([_status_error(400, cls=openai.BadRequestError)])
+    with pytest.raises(LLMError, match="not retryable"):
+        call_openai(client, "system", "prompt", 3, retry_policy=RetryPolicy(base_delay=0.0))
+    assert client.responses.calls == 1
+
+
+def test_transient_errors_exhaust_attempts_and_trip_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0.05)
+    policy = RetryPolicy(max_attempts=3, base_delay=0.0, max_delay=0.0, breaker=breaker)
+    client = _FakeClient([_status_error(503, cls=openai.InternalServerError) for _ in range(3)])
+
+    start = time.monotonic()
+    with pytest.raises(LLMError, match="after retries"):
+        call_openai(client, "system", "prompt", 3, retry_policy=policy)
+    assert client.responses.calls == 3
+    assert breaker.trips >= 1
+    # The third attempt waited for the open breaker to cool down
+    assert time.monotonic() - start >= 0.05
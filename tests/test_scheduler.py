@@ -0,0 +1,109 @@
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from capability_agent.io_utils import ContextFormat, ContextOptions
+from capability_agent.llm import UsageStats
+from capability_agent.models import CapabilityList
+from capability_agent.scheduler import SUBMIT_AHEAD, LeafQueue, leaf_priority
+from capability_agent.service import augment_model
+
+
+def _model():
+    """Root -> A (long description) -> A1, A2; Root -> B (failed earlier), C."""
+    ids = {name: str(uuid.uuid4()) for name in ("Root", "A", "A1", "A2", "B", "C")}
+    spec = [
+        ("Root", None, "Root", None),
+        ("A", "Root", "A", None),
+        ("A1", "A", "Short", 0),
+        ("A2", "A", "Much longer description " * 20, 0),
+        ("B", "Root", "B", -1),
+        ("C", "Root", "C", 0),
+    ]
+    data = []
+    for name, parent, description, state in spec:
+        node = {"id": ids[name], "name": name, "description": description, "parent": ids[parent] if parent else None}
+        if state is not None:
+            node["capability"] = state
+        data.append(node)
+    return CapabilityList.model_validate(data)
+
+
+@pytest.mark.parametrize(
+    "priority, expected",
+    [
+        ("model", ["A1", "A2", "B", "C"]),
+        ("longest-prompt", ["A2", "A1", "B", "C"]),
+        ("shallowest", ["B", "C", "A1", "A2"]),
+        ("failed-last", ["A1", "A2", "C", "B"]),
+    ],
+)
+def test_priorities_order_the_queue(priority, expected):
+    index = _model().index()
+    queue = LeafQueue(leaf_priority(priority, index, ContextOptions()), index.leaves())
+    assert [queue.pop().name for _ in range(len(queue))] == expected
+
+
+def test_unknown_priority_is_rejected():
+    index = _model().index()
+    with pytest.raises(ValueError, match="Unknown priority"):
+        leaf_priority("random", index, ContextOptions())
+
+
+def test_submission_is_bounded_and_follows_priority(tmp_path, monkeypatch):
+    template_path = tmp_path / "template.j2"
+    template_path.write_text("{{ node.name }}", encoding="utf-8")
+    root_id = str(uuid.uuid4())
+    data = [{"id": root_id, "name": "Root", "description": "Root", "parent": None}]
+    data += [
+        {"id": str(uuid.uuid4()), "name": f"Leaf {i}", "description": "x" * i, "parent": root_id}
+        for i in range(40)
+    ]
+
+    monkeypatch.setattr("capability_agent.service.ensure_client", lambda *args, **kwargs: object())
+    calls = []
+
+    def fake_call_openai(client, system_message, user_prompt, max_capabilities):
+        calls.append(user_prompt)
+        return [{"name": f"{user_prompt} child", "description": "Generated"}], UsageStats(model_name="fake")
+
+    monkeypatch.setattr("capability_agent.service.call_openai", fake_call_openai)
+
+    outstanding = 0
+    most_outstanding = 0
+    lock = threading.Lock()
+
+    class CountingExecutor(ThreadPoolExecutor):
+        def submit(self, fn, *args, **kwargs):
+            nonlocal outstanding, most_outstanding
+            with lock:
+                outstanding += 1
+                most_outstanding = max(most_outstanding, outstanding)
+            future = super().submit(fn, *args, **kwargs)
+
+            def finished(_):
+                nonlocal outstanding
+                with lock:
+                    outstanding -= 1
+
+            future.add_done_callback(finished)
+            return future
+
+    monkeypatch.setattr("capability_agent.service.ThreadPoolExecutor", CountingExecutor)
+    result, _ = augment_model(
+        model=CapabilityList.model_validate(data),
+        template_path=template_path,
+        context_opts=ContextOptions(),
+        context_format=ContextFormat.MARKDOWN,
+        system_message="system",
+        max_capabilities=1,
+        tasks=2,
+        priority="longest-prompt",
+    )
+
+    assert len(calls) == 40 and len(result.root) == 81
+    assert most_outstanding <= 2 * SUBMIT_AHEAD
+    # The first submissions are the longest prompts
+    assert set(calls[: 2 * SUBMIT_AHEAD]) == {f"Leaf {i}" for i in range(39, 39 - 2 * SUBMIT_AHEAD, -1)}
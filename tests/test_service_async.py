@@ -0,0 +1,79 @@
+import asyncio
+import json
+import uuid
+from types import SimpleNamespace
+
+from capability_agent.io_utils import ContextFormat, ContextOptions
+from capability_agent.llm import CapabilityItem, CapabilityResponse
+from capability_agent.models import CapabilityList
+from capability_agent.service import augment_model_async
+
+
+class FakeAsyncResponses:
+    def __init__(self, fail_for: str):
+        self.fail_for = fail_for
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def parse(self, *, input, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if self.fail_for in input:
+                raise ValueError("bad request")  # not an API error: fails without retries
+            return SimpleNamespace(
+                status="completed",
+                output=[],
+                output_parsed=CapabilityResponse(items=[CapabilityItem(name="Child", description="Desc")]),
+                usage=SimpleNamespace(input_tokens=10, output_tokens=5, total_tokens=15),
+                model="fake",
+            )
+        finally:
+            self.in_flight -= 1
+
+
+def test_async_engine_runs_concurrently_and_journals_progress(tmp_path, monkeypatch):
+    root_id = str(uuid.uuid4())
+    model_data = [{"id": root_id, "name": "Root", "description": "Root", "parent": None, "capability": 0}]
+    for i in range(8):
+        model_data.append(
+            {"id": str(uuid.uuid4()), "name": f"Leaf {i}", "description": "Leaf", "parent": root_id, "capability": 0}
+        )
+    input_path = tmp_path / "model.json"
+    input_path.write_text(json.dumps(model_data), encoding="utf-8")
+    template_path = tmp_path / "template.j2"
+    template_path.write_text("Prompt for {{ node.name }}", encoding="utf-8")
+
+    responses = FakeAsyncResponses(fail_for="Leaf 7")
+    monkeypatch.setattr(
+        "capability_agent.service.ensure_async_client",
+        lambda *args, **kwargs: SimpleNamespace(responses=responses),
+    )
+
+    try:
+        asyncio.run(
+            augment_model_async(
+                model=CapabilityList.model_validate(model_data),
+                template_path=template_path,
+                context_opts=ContextOptions(),
+                context_format=ContextFormat.MARKDOWN,
+                system_message="system",
+                max_capabilities=1,
+                tasks=4,
+                restart_mode=True,
+                input_path=input_path,
+            )
+        )
+    except Exception as e:  # noqa: BLE001
+        assert "1 out of 8 leaves failed" in str(e)
+    else:  # pragma: no cover
+        raise AssertionError("expected the failing leaf to be reported")
+
+    assert 1 < responses.max_in_flight <= 4
+
+    saved = json.loads(input_path.read_text(encoding="utf-8"))
+    by_name = {node["name"]: node for node in saved}
+    assert by_name["Leaf 0"]["capability"] == 1
+    assert by_name["Leaf 7"]["capability"] == -1
+    assert len([node for node in saved if node["name"] == "Child"]) == 7
@@ -0,0 +1,138 @@
+import json
+import threading
+import uuid
+
+import pytest
+
+from capability_agent.io_utils import ContextFormat, ContextOptions
+from capability_agent.llm import UsageStats
+from capability_agent.models import CapabilityList
+from capability_agent import service
+from capability_agent.service import augment_model
+
+
+def _model_data(leaves: int):
+    root_id = str(uuid.uuid4())
+    data = [{"id": root_id, "name": "Root", "description": "Root", "parent": None, "capability": 0}]
+    for i in range(leaves):
+        data.append({"id": str(uuid.uuid4()), "name": f"Leaf {i}", "description": "Leaf", "parent": root_id, "capability": 0})
+    return data
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    monkeypatch.setattr("capability_agent.service.ensure_client", lambda *args, **kwargs: object())
+    calls = []
+    lock = threading.Lock()
+
+    def fake_call_openai(client, system_message, user_prompt, max_capabilities):
+        with lock:
+            calls.append(user_prompt)
+            n = len(calls)
+        items = [{"name": f"Child {n}.{k}", "description": "Generated"} for k in range(2)]
+        return items, UsageStats(model_name="fake", input_tokens=3, output_tokens=2, total_tokens=5)
+
+    monkeypatch.setattr("capability_agent.service.call_openai", fake_call_openai)
+    return calls
+
+
+@pytest.mark.parametrize("tasks", [1, 4])
+def test_depth_expands_generated_children_in_one_run(tmp_path, fake_llm, tasks):
+    template_path = tmp_path / "template.j2"
+    template_path.write_text("Prompt for {{ node.name }} under {{ parent.name }}", encoding="utf-8")
+
+    result, usage = augment_model(
+        model=CapabilityList.model_validate(_model_data(2)),
+        template_path=template_path,
+        context_opts=ContextOptions(parent=True),
+        context_format=ContextFormat.MARKDOWN,
+        system_message="system",
+        max_capabilities=2,
+        tasks=tasks,
+        depth=3,
+    )
+
+    # 2 leaves -> 4 children -> 8 grandchildren -> 16 great-grandchildren
+    assert len(fake_llm) == 2 + 4 + 8
+    assert len(result.root) == 3 + 4 + 8 + 16
+    assert usage.total_tokens == 5 * 14
+    assert len({c.id for c in result.root}) == len(result.root)
+
+    index = result.index()
+    generated = [c for c in result.root if c.model_dump().get("description") == "Generated"]
+    assert all(c.model_dump()["capability"] == 1 for c in generated)
+    assert sum(1 for c in generated if index.is_leaf(c.id)) == 16
+    # Deeper prompts see the generated parent
+    assert any("under Child" in prompt for prompt in fake_llm)
+
+
+def test_depth_checkpoints_whole_run_in_restart_mode(tmp_path, fake_llm):
+    data = _model_data(1)
+    input_path = tmp_path / "model.json"
+    input_path.write_text(json.dumps(data), encoding="utf-8")
+    template_path = tmp_path / "template.j2"
+    template_path.write_text("Prompt for {{ node.name }}", encoding="utf-8")
+
+    result, _ = augment_model(
+        model=CapabilityList.model_validate(data),
+        template_path=template_path,
+        context_opts=ContextOptions(),
+        context_format=ContextFormat.MARKDOWN,
+        system_message="system",
+        max_capabilities=2,
+        tasks=2,
+        restart_mode=True,
+        input_path=input_path,
+        checkpoint_every=1,
+        depth=2,
+    )
+
+    saved = json.loads(input_path.read_text(encoding="utf-8"))
+    assert len(saved) == len(result.root) == 2 + 2 + 4
+    assert len({n["id"] for n in saved}) == len(saved)
+    assert all(n["capability"] == 1 for n in saved if n["parent"] is not None)
+    assert not (tmp_path / "model.journal").exists()
+
+
+def test_restart_of_an_interrupted_depth_run_stops_at_the_requested_depth(tmp_path, fake_llm, monkeypatch):
+    data = _model_data(1)
+    input_path = tmp_path / "model.json"
+    input_path.write_text(json.dumps(data), encoding="utf-8")
+    template_path = tmp_path / "template.j2"
+    template_path.write_text("Prompt for {{ node.name }}", encoding="utf-8")
+    kwargs = dict(
+        template_path=template_path,
+        context_opts=ContextOptions(),
+        context_format=ContextFormat.MARKDOWN,
+        system_message="system",
+        max_capabilities=2,
+        tasks=2,
+        restart_mode=True,
+        input_path=input_path,
+        depth=2,
+    )
+
+    # The first run generates level 2 but fails expanding it
+    fake_call_openai = service.call_openai
+
+    def failing_below_level_1(client, system_message, user_prompt, max_capabilities):
+        if "Child" in user_prompt:
+            raise RuntimeError("interrupted")
+        return fake_call_openai(client, system_message, user_prompt, max_capabilities)
+
+    monkeypatch.setattr("capability_agent.service.call_openai", failing_below_level_1)
+    with pytest.raises(Exception, match="interrupted"):
+        augment_model(model=CapabilityList.model_validate(data), **kwargs)
+    saved = json.loads(input_path.read_text(encoding="utf-8"))
+    pending = [n for n in saved if n["description"] == "Generated"]
+    assert [n["pending_level"] for n in pending] == [2, 2]
+
+    monkeypatch.setattr("capability_agent.service.call_openai", fake_call_openai)
+    fake_llm.clear()
+    result, _ = augment_model(model=CapabilityList.model_validate(saved), **kwargs)
+
+    # Only the two level-2 nodes are expanded; their children are not
+    assert len(fake_llm) == 2
+    assert len(result.root) == 2 + 2 + 4
+    assert all(n.model_dump()["capability"] == 1 for n in result.root if n.parent is not None)
+    assert not any("pending_level" in n.model_dump() for n in result.root)
@@ -0,0 +1,216 @@
+import threading
+import uuid
+
+import pytest
+from typer.testing import CliRunner
+
+from capability_agent.io_utils import ContextFormat, ContextOptions, iter_json_array, write_json_file
+from capability_agent.llm import UsageStats
+from capability_agent.models import CapabilityList, validate_model
+from capability_agent import service
+from capability_agent.service import augment_model
+from capability_agent.sharding import claim_shard, merge_shards, parse_shard, shard_claim_path, shard_of
+from capability_agent.wrench import app
+
+
+def _model_data(leaves: int):
+    root_id = str(uuid.uuid4())
+    data = [{"id": root_id, "name": "Root", "description": "Root", "parent": None, "capability": 0}]
+    for i in range(leaves):
+        data.append({"id": str(uuid.uuid4()), "name": f"Leaf {i}", "description": "Leaf", "parent": root_id, "capability": 0})
+    return data
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    monkeypatch.setattr("capability_agent.service.ensure_client", lambda *args, **kwargs: object())
+    calls = []
+    lock = threading.Lock()
+
+    def fake_call_openai(client, system_message, user_prompt, max_capabilities):
+        with lock:
+            calls.append(user_prompt)
+        items = [{"name": f"{user_prompt} child {k}", "description": "Generated"} for k in range(2)]
+        return items, UsageStats(model_name="fake")
+
+    monkeypatch.setattr("capability_agent.service.call_openai", fake_call_openai)
+    return calls
+
+
+def test_parse_shard():
+    assert parse_shard("2/4") == (2, 4)
+    for value in ("0/4", "5/4", "1/0", "2", "a/b"):
+        with pytest.raises(ValueError):
+            parse_shard(value)
+
+
+def _leaf_ids_per_shard(count: int, per_shard: int):
+    """Random uuid4 leaf ids, exactly ``per_shard`` of them on each of ``count`` shards."""
+    ids = {i: [] for i in range(1, count + 1)}
+    while any(len(shard_ids) < per_shard for shard_ids in ids.values()):
+        leaf_id = str(uuid.uuid4())
+        shard_ids = ids[shard_of(leaf_id, count)]
+        if len(shard_ids) < per_shard:
+            shard_ids.append(leaf_id)
+    return [leaf_id for shard_ids in ids.values() for leaf_id in shard_ids]
+
+
+def test_shards_split_the_leaves_and_merge_back(tmp_path, fake_llm):
+    template_path = tmp_path / "template.j2"
+    template_path.write_text("{{ node.name }}", encoding="utf-8")
+    data = _model_data(12)
+    for node, leaf_id in zip(data[1:], _leaf_ids_per_shard(3, 4)):
+        node["id"] = leaf_id
+    shard_paths = []
+    for i in (1, 2, 3):
+        result, _ = augment_model(
+            model=CapabilityList.model_validate(data),
+            template_path=template_path,
+            context_opts=ContextOptions(),
+            context_format=ContextFormat.MARKDOWN,
+            system_message="system",
+            max_capabilities=2,
+            tasks=2,
+            depth=2,
+            shard=(i, 3),
+        )
+        path = tmp_path / f"shard{i}.json"
+        write_json_file(path, (c.model_dump() for c in result.root))
+        shard_paths.append(path)
+
+    # Every leaf was processed by exactly one shard, with its whole subtree
+    assert len(set(fake_llm)) == len(fake_llm) == 12 + 24
+
+    output = tmp_path / "merged.json"
+    result = CliRunner().invoke(app, ["merge", *map(str, shard_paths), "--output", str(output)])
+    assert result.exit_code == 0, result.output
+    merged = validate_model(iter_json_array(output)).index()
+    assert len(merged) == 13 + 24 + 48
+    assert all(len(merged.children(node["id"])) == 2 for node in data[1:])
+    assert all(c.capability == 1 for c in merged if merged.depth(c.id) >= 2)
+
+
+def test_merge_prefers_processed_state_and_rejects_conflicts(tmp_path):
+    data = _model_data(2)
+    leaf = data[1]
+    processed = [dict(node) for node in data]
+    processed[1] = {**leaf, "capability": 1}
+    child = {"id": str(uuid.uuid4()), "name": "Child", "description": "x", "parent": leaf["id"], "capability": 1}
+    write_json_file(tmp_path / "a.json", data)
+    write_json_file(tmp_path / "b.json", processed + [child])
+
+    merged = list(merge_shards([tmp_path / "a.json", tmp_path / "b.json"]))
+    assert merged == processed + [child]
+
+    other = {**child, "id": str(uuid.uuid4()), "name": "Other child"}
+    write_json_file(tmp_path / "c.json", [*data, other, child])
+    with pytest.raises(ValueError, match="Duplicate id"):
+        list(merge_shards([tmp_path / "b.json", tmp_path / "c.json"]))
+
+    renamed = [dict(node) for node in data]
+    renamed[2]["name"] = "Other"
+    write_json_file(tmp_path / "d.json", renamed)
+    with pytest.raises(ValueError, match="disagree"):
+        list(merge_shards([tmp_path / "a.json", tmp_path / "d.json"]))
+
+    orphan = {**child, "id": str(uuid.uuid4()), "parent": str(uuid.uuid4())}
+    write_json_file(tmp_path / "e.json", [*data, orphan])
+    with pytest.raises(ValueError, match="missing parent"):
+        list(merge_shards([tmp_path / "a.json", tmp_path / "e.json"]))
+
+
+def test_merge_accepts_children_listed_before_their_parents(tmp_path):
+    data = _model_data(2)
+    reordered = [*data[1:], data[0]]
+    child = {"id": str(uuid.uuid4()), "name": "Child", "description": "x", "parent": data[1]["id"], "capability": 1}
+    grandchild = {**child, "id": str(uuid.uuid4()), "name": "Grandchild", "parent": child["id"]}
+    write_json_file(tmp_path / "a.json", reordered)
+    write_json_file(tmp_path / "b.json", [*reordered, grandchild, child])
+
+    merged = list(merge_shards([tmp_path / "a.json", tmp_path / "b.json"]))
+    assert merged == [*reordered, grandchild, child]
+    assert len(validate_model(merged).root) == 5
+
+
+def test_restarted_depth_shard_keeps_generated_subtrees_and_claims_its_copy(tmp_path, fake_llm, monkeypatch):
+    data = _model_data(16)
+    input_path = tmp_path / "model.json"
+    write_json_file(input_path, data)
+    template_path = tmp_path / "template.j2"
+    template_path.write_text("{{ node.name }}", encoding="utf-8")
+    shard = (shard_of(data[1]["id"], 2), 2)
+    mine = [n["id"] for n in data[1:] if shard_of(n["id"], 2) == shard[0]]
+    kwargs = dict(
+        template_path=template_path,
+        context_opts=ContextOptions(),
+        context_format=ContextFormat.MARKDOWN,
+        system_message="system",
+        max_capabilities=2,
+        tasks=2,
+        restart_mode=True,
+        input_path=input_path,
+        depth=2,
+        shard=shard,
+    )
+
+    # Interrupted after the first level: the generated nodes are left pending
+    fake_call_openai = service.call_openai
+    claims = []
+
+    def failing_on_generated(client, system_message, user_prompt, max_capabilities):
+        claims.append(shard_claim_path(input_path).read_text(encoding="utf-8"))
+        if "child" in user_prompt:
+            raise RuntimeError("interrupted")
+        return fake_call_openai(client, system_message, user_prompt, max_capabilities)
+
+    monkeypatch.setattr("capability_agent.service.call_openai", failing_on_generated)
+    with pytest.raises(Exception, match="interrupted"):
+        augment_model(model=CapabilityList.model_validate(data), **kwargs)
+    # Held while the run is in progress, released when it ends (here with failures)
+    assert set(claims) == {f"{shard[0]}/2"}
+    assert not shard_claim_path(input_path).exists()
+
+    # While one shard restarts the file, another cannot
+    saved = list(iter_json_array(input_path))
+    other = (3 - shard[0], 2)
+    claim_shard(input_path, shard)
+    with pytest.raises(ValueError, match="own copy"):
+        augment_model(model=CapabilityList.model_validate(saved), **{**kwargs, "shard": other})
+    shard_claim_path(input_path).unlink()
+
+    # The restart expands every pending node below this shard's leaves, whatever its own id hashes to
+    monkeypatch.setattr("capability_agent.service.call_openai", fake_call_openai)
+    fake_llm.clear()
+    result, _ = augment_model(model=CapabilityList.model_validate(saved), **kwargs)
+    assert len(fake_llm) == 2 * len(mine)
+    index = result.index()
+    for leaf_id in mine:
+        children = index.children(leaf_id)
+        assert len(children) == 2 and all(len(index.children(c.id)) == 2 for c in children)
+    assert not index.pending_leaves() or all(shard_of(c.id, 2) == other[0] for c in index.pending_leaves())
+    assert not shard_claim_path(input_path).exists()
+
+
+def test_restart_with_nothing_to_generate_releases_the_shard_claim(tmp_path, fake_llm):
+    data = _model_data(4)
+    for node in data[1:]:
+        node["capability"] = 1
+    input_path = tmp_path / "model.json"
+    write_json_file(input_path, data)
+    template_path = tmp_path / "template.j2"
+    template_path.write_text("{{ node.name }}", encoding="utf-8")
+    kwargs = dict(
+        template_path=template_path,
+        context_opts=ContextOptions(),
+        context_format=ContextFormat.MARKDOWN,
+        system_message="system",
+        max_capabilities=2,
+        restart_mode=True,
+        input_path=input_path,
+    )
+
+    augment_model(model=CapabilityList.model_validate(data), shard=(1, 2), **kwargs)
+    assert not shard_claim_path(input_path).exists()
+    # A later unsharded restart of the same file is not blocked
+    result, _ = augment_model(model=CapabilityList.model_validate(data), **kwargs)
+    assert len(result.root) == 5 and fake_llm == []
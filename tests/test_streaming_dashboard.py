@@ -0,0 +1,61 @@
+import threading
+import time
+import uuid
+
+from capability_agent.io_utils import ContextFormat, ContextOptions
+from capability_agent.llm import StreamingDashboard, UsageStats
+from capability_agent.models import CapabilityList
+from capability_agent.service import augment_model
+
+
+def test_streaming_runs_concurrently_with_shared_dashboard(tmp_path, monkeypatch):
+    root_id = str(uuid.uuid4())
+    model_data = [{"id": root_id, "name": "Root", "description": "Root", "parent": None}]
+    for i in range(6):
+        model_data.append({"id": str(uuid.uuid4()), "name": f"Leaf {i}", "description": "Leaf", "parent": root_id})
+    template_path = tmp_path / "template.j2"
+    template_path.write_text("Prompt for {{ node.name }}", encoding="utf-8")
+
+    monkeypatch.setattr("capability_agent.service.ensure_client", lambda *args, **kwargs: object())
+    lock = threading.Lock()
+    state = {"in_flight": 0, "max_in_flight": 0, "updates": 0}
+    dashboards = []
+
+    class RecordingDashboard(StreamingDashboard):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            dashboards.append(self)
+
+    monkeypatch.setattr("capability_agent.service.StreamingDashboard", RecordingDashboard)
+
+    def fake_streaming(client, system_message, user_prompt, max_items, show_progress=True, leaf_name="", *, on_progress=None):
+        assert show_progress is False and on_progress is not None
+        with lock:
+            state["in_flight"] += 1
+            state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        items = [{"name": f"{leaf_name} child", "description": "Generated"}]
+        time.sleep(0.02)
+        on_progress(items)
+        state["updates"] += 1
+        with lock:
+            state["in_flight"] -= 1
+        return items, UsageStats(model_name="fake", total_tokens=3)
+
+    monkeypatch.setattr("capability_agent.service.call_openai_streaming", fake_streaming)
+
+    result, usage = augment_model(
+        model=CapabilityList.model_validate(model_data),
+        template_path=template_path,
+        context_opts=ContextOptions(),
+        context_format=ContextFormat.MARKDOWN,
+        system_message="system",
+        max_capabilities=1,
+        tasks=3,
+        use_streaming=True,
+    )
+
+    assert len(result.root) == 7 + 6
+    assert usage.total_tokens == 18
+    assert state["updates"] == 6
+    assert state["max_in_flight"] > 1
+    assert len(dashboards) == 1 and dashboards[0]._panels == {}
@@ -0,0 +1,109 @@
+import json
+import uuid
+
+import pytest
+
+from capability_agent.io_utils import ContextFormat, ContextOptions
+from capability_agent.llm import UsageStats
+from capability_agent.models import CapabilityList
+from capability_agent.prompting import ContextCache, build_prompt_context
+from capability_agent.service import augment_model
+from capability_agent.tokens import PromptBudgetError, TokenBudget
+
+
+def _model():
+    root_id = str(uuid.uuid4())
+    data = [{"id": root_id, "name": "Root", "description": "Root", "parent": None}]
+    for i in range(30):
+        data.append({
+            "id": str(uuid.uuid4()),
+            "name": f"Leaf {i}",
+            "description": "A long description of the capability. " * 20,
+            "parent": root_id,
+        })
+    return CapabilityList.model_validate(data)
+
+
+def test_budget_trims_full_tree_then_siblings_and_records_counts():
+    model = _model()
+    index = model.index()
+    leaf = index.leaves()[0]
+    opts = ContextOptions(full_tree=True, parent=True, siblings=True)
+    full = build_prompt_context(index, leaf, opts, ContextFormat.MARKDOWN, budget=TokenBudget(10**6))
+    assert full["budget_trimmed"] == []
+    assert full["token_counts"]["formatted_full_tree"] > full["token_counts"]["formatted_siblings"] > 0
+
+    # Room for everything but the full tree's descriptions
+    names_tree = ContextCache(index).full_tree(ContextFormat.MARKDOWN, names_only=True)
+    limit = sum(full["token_counts"].values()) - full["token_counts"]["formatted_full_tree"]
+    limit += TokenBudget(limit).count(names_tree)
+    trimmed = build_prompt_context(index, leaf, opts, ContextFormat.MARKDOWN, budget=TokenBudget(limit))
+    assert trimmed["budget_trimmed"] == ["full_tree:names"]
+    assert trimmed["formatted_full_tree"] == names_tree
+    assert "### Leaf 29\n**Parent:** Root" in names_tree and "long description" not in names_tree
+    assert sum(trimmed["token_counts"].values()) <= limit
+
+    tight = build_prompt_context(index, leaf, opts, ContextFormat.MARKDOWN, budget=TokenBudget(60))
+    assert tight["budget_trimmed"] == ["full_tree:names", "full_tree:dropped", "siblings:names", "siblings:dropped"]
+
+
+@pytest.mark.parametrize("format", [ContextFormat.JSON, ContextFormat.XML])
+def test_reduced_sections_keep_the_configured_format(format):
+    model = _model()
+    index = model.index()
+    leaf = index.leaves()[0]
+    opts = ContextOptions(full_tree=True, siblings=True)
+    full = build_prompt_context(index, leaf, opts, format, budget=TokenBudget(10**6))
+    # Enough for the tree dropped and the siblings' names, not their descriptions
+    limit = full["token_counts"]["formatted_capability"] + full["token_counts"]["formatted_siblings"] // 2
+    trimmed = build_prompt_context(index, leaf, opts, format, budget=TokenBudget(limit))
+    assert trimmed["budget_trimmed"] == ["full_tree:names", "full_tree:dropped", "siblings:names"]
+    siblings = trimmed["formatted_siblings"]
+    assert "Leaf 29" in siblings and "long description" not in siblings
+    if format == ContextFormat.JSON:
+        assert json.loads(siblings)[0] == {"name": "Leaf 1", "parent": "Root"}
+    else:
+        assert siblings.startswith("<capabilities>") and "<name>Leaf 1</name>" in siblings
+
+
+def test_only_sections_shared_between_prompts_are_memoized():
+    model = _model()
+    index = model.index()
+    budget = TokenBudget(10**6)
+    opts = ContextOptions(full_tree=True, siblings=True)
+    for leaf in index.leaves():
+        context = build_prompt_context(index, leaf, opts, ContextFormat.MARKDOWN, budget=budget)
+        budget.check(context["formatted_capability"] + context["formatted_siblings"], leaf.name)
+    # The full tree (plus the empty parent section), not one entry per leaf
+    assert budget.counter.count_shared.cache_info().currsize == 2
+
+
+def test_oversized_prompt_fails_before_the_call(tmp_path, monkeypatch):
+    template_path = tmp_path / "template.j2"
+    template_path.write_text("{{ formatted_capability }}\n---\n{{ formatted_siblings }}", encoding="utf-8")
+    monkeypatch.setattr("capability_agent.service.ensure_client", lambda *args, **kwargs: object())
+    calls = []
+
+    def fake_call_openai(client, system_message, user_prompt, max_capabilities):
+        calls.append(user_prompt)
+        return [{"name": "Child", "description": "Generated"}], UsageStats(model_name="fake")
+
+    monkeypatch.setattr("capability_agent.service.call_openai", fake_call_openai)
+    kwargs = dict(
+        template_path=template_path,
+        context_opts=ContextOptions(siblings=True),
+        context_format=ContextFormat.MARKDOWN,
+        system_message="system",
+        max_capabilities=1,
+        tasks=1,
+    )
+
+    # Siblings are trimmed to names so each prompt fits
+    result, _ = augment_model(model=_model(), max_input_tokens=400, **kwargs)
+    assert len(calls) == 30 and len(result.root) == 61
+    assert all("long description" not in prompt.split("---", 1)[1] for prompt in calls)
+
+    calls.clear()
+    with pytest.raises(PromptBudgetError, match="over the budget"):
+        augment_model(model=_model(), max_input_tokens=20, **kwargs)
+    assert calls == []